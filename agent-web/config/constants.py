@@ -8,3 +8,11 @@ TOT_LEVELS = {
     "EXTREME": (5, 5),
 }
 
+# Search budgets for the same presets. Deeper levels may spend more LLM calls
+# and tokens, but every level stops as soon as a path is confident enough.
+TOT_BUDGETS = {
+    "LOW": {"max_llm_calls": 8, "max_tokens": 20000, "stop_score": 0.9, "prune_below": 0.1},
+    "MIDDLE": {"max_llm_calls": 16, "max_tokens": 50000, "stop_score": 0.9, "prune_below": 0.1},
+    "HIGH": {"max_llm_calls": 30, "max_tokens": 100000, "stop_score": 0.95, "prune_below": 0.1},
+    "EXTREME": {"max_llm_calls": 50, "max_tokens": 200000, "stop_score": 0.95, "prune_below": 0.05},
+}
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import os
 import logging
 import sys
+import weakref
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from .logging_utils import setup_logging
+from modules.agents.evaluator import LLMEvaluator, parse_scores
+from modules.utils.http_pool import shared_async_http_client, shared_http_client
 
 from src.agent import ReActAgent, CoTAgent, ToTAgent, PresentationAgent
 from src.tools import get_default_tools
@@ -75,6 +79,11 @@ def read_tot_env() -> tuple[int | None, int | None]:
 def create_llm(*, log_usage: bool = False, model: str | None = None) -> callable:
     """Create an OpenAI completion callable.
 
+    The callable has an ``allm`` attribute, a coroutine function doing the
+    same request asynchronously. Both share the process-wide connection
+    pools instead of opening new connections, and ``allm`` reuses one
+    async client per event loop.
+
     Parameters
     ----------
     log_usage: bool
@@ -97,16 +106,22 @@ def create_llm(*, log_usage: bool = False, model: str | None = None) -> callable
     client_params = {"api_key": api_key}
     if base_url:
         client_params["base_url"] = base_url
-    client = OpenAI(**client_params)
+    client = OpenAI(**client_params, http_client=shared_http_client())
+    # One async client per event loop, as in LLMClient.aclient
+    async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+        weakref.WeakKeyDictionary()
+    )
 
-    def llm(prompt: str) -> str:
+    def _params(prompt: str) -> dict:
         params = {
             "model": model,
             "messages": [{"role": "user", "content": prompt}],
         }
         if timeout is not None:
             params["timeout"] = timeout
-        resp = client.chat.completions.create(**params)
+        return params
+
+    def _log_usage(resp) -> None:
         if log_usage and getattr(resp, "usage", None):
             try:
                 total = resp.usage.total_tokens
@@ -115,13 +130,33 @@ def create_llm(*, log_usage: bool = False, model: str | None = None) -> callable
             else:
                 cost = total * token_price
                 logger.info("Tokens used: %s | Cost: $%.4f", total, cost)
+
+    def llm(prompt: str) -> str:
+        resp = client.chat.completions.create(**_params(prompt))
+        _log_usage(resp)
+        return resp.choices[0].message.content
+
+    async def allm(prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        aclient = async_clients.get(loop)
+        if aclient is None:
+            aclient = AsyncOpenAI(**client_params, http_client=shared_async_http_client())
+            async_clients[loop] = aclient
+        resp = await aclient.chat.completions.create(**_params(prompt))
+        _log_usage(resp)
         return resp.choices[0].message.content
 
+    llm.allm = allm
     return llm
 
 
 def create_evaluator(llm: callable) -> callable:
-    """Create an evaluation function for :class:`ToTAgent`."""
+    """Create an evaluation function for :class:`ToTAgent`.
+
+    The returned function also has an ``evaluate_many(histories)`` attribute
+    that scores a whole depth level with a single prompt returning a JSON
+    array. Items missing from that reply are scored individually.
+    """
 
     def evaluate(history: str) -> float:
         prompt = (
@@ -135,6 +170,17 @@ def create_evaluator(llm: callable) -> callable:
             logger.warning("Failed to parse evaluation score from '%s'", resp)
             return 0.0
 
+    def evaluate_many(histories: list[str]) -> list[float]:
+        if len(histories) < 2:
+            return [evaluate(h) for h in histories]
+        scores = parse_scores(llm(LLMEvaluator.batch_prompt(histories)), len(histories))
+        if None in scores:
+            logger.warning("Batch evaluation incomplete, scoring remaining items individually")
+        return [
+            s if s is not None else evaluate(h) for s, h in zip(scores, histories)
+        ]
+
+    evaluate.evaluate_many = evaluate_many
     return evaluate
 
 
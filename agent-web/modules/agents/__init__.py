@@ -3,14 +3,23 @@ from .react_agent import ReActAgent
 from .tot_agent import ToTAgent
 from .cot_agent import CoTAgent
 from .presentation_agent import PresentationAgent
+from .evaluator import LLMEvaluator
 from ..utils.llm_client import LLMClient
 from ..tools import get_tools_by_name
 
 from ..memory.conversation_memory import BaseMemory
 
-def get_agent(agent_name: str, llm_client: LLMClient, tool_names: List[str], memory: BaseMemory):
+def get_agent(
+    agent_name: str,
+    llm_client: LLMClient,
+    tool_names: List[str],
+    memory: BaseMemory,
+    tot_level: str = "LOW",
+):
     """
     Factory function to get an agent instance by name.
+
+    ``tot_level`` selects the depth, breadth and budget of the ToT agent.
     """
     if agent_name == "react":
         tools = get_tools_by_name(tool_names)
@@ -18,11 +27,20 @@ def get_agent(agent_name: str, llm_client: LLMClient, tool_names: List[str], mem
     elif agent_name == "cot":
         return CoTAgent(llm_client=llm_client, memory=memory)
     elif agent_name == "tot":
-        return ToTAgent(llm_client=llm_client, memory=memory)
+        return ToTAgent.from_level(
+            llm_client, tot_level, evaluator=LLMEvaluator(llm_client), memory=memory
+        )
     else:
         # Fallback or error
         # For now, let's return a default agent
         tools = get_tools_by_name(tool_names)
         return ReActAgent(llm_client=llm_client, tools=tools)
 
-__all__ = ["ReActAgent", "CoTAgent", "ToTAgent", "PresentationAgent", "get_agent"]
+__all__ = [
+    "ReActAgent",
+    "CoTAgent",
+    "ToTAgent",
+    "PresentationAgent",
+    "LLMEvaluator",
+    "get_agent",
+]
@@ -0,0 +1,129 @@
+"""Token-budgeted prompt context shared by the agents."""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+import logging
+
+from ..utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARK = "…(省略)…"
+
+
+@dataclass
+class Context:
+    """Result of :meth:`ContextBuilder.build`."""
+
+    history: str
+    scratchpad: str
+    tokens: int
+    dropped_tokens: int
+
+    def render(self) -> str:
+        """Join history and scratchpad the way the agent prompts expect."""
+        return self.history + "\n" + self.scratchpad if self.history else self.scratchpad
+
+
+class ContextBuilder:
+    """Fit the variable parts of a prompt into a token budget.
+
+    Parts are admitted by priority: the question and fixed template text are
+    always kept, then the most recent end of the scratchpad, then retrieved
+    memory in the order it was returned. Parts that do not fit are truncated
+    and the number of dropped tokens is reported.
+
+    Parameters
+    ----------
+    max_tokens:
+        Budget for the whole prompt.
+    counter:
+        Function returning the token count of a text.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        counter: Callable[[str], int] = count_tokens,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.count = counter
+
+    def _fit(
+        self,
+        text: str,
+        budget: int,
+        *,
+        keep_end: bool,
+        tokens: Optional[int] = None,
+    ) -> Tuple[str, bool]:
+        """Truncate ``text`` to ``budget`` tokens, keeping its start or end.
+
+        Returns the kept text and whether it was truncated. ``tokens`` is
+        the count of ``text`` when the caller already knows it.
+        """
+        if tokens is None:
+            tokens = self.count(text)
+        if tokens <= budget:
+            return text, False
+        if budget <= 0:
+            return "", True
+        size = len(text) * budget // tokens
+        while size > 0:
+            piece = text[-size:] if keep_end else text[:size]
+            piece = TRUNCATION_MARK + piece if keep_end else piece + TRUNCATION_MARK
+            if self.count(piece) <= budget:
+                return piece, True
+            size = size * 9 // 10
+        return "", True
+
+    def build(
+        self,
+        question: str,
+        scratchpad: str = "",
+        memory: Sequence[str] = (),
+        *,
+        fixed: str = "",
+    ) -> Context:
+        """Return the history and scratchpad that fit the budget.
+
+        ``fixed`` is template text, such as tool descriptions, that is sent
+        regardless and only consumes budget.
+        """
+        used = self.count(question) + self.count(fixed)
+        dropped = 0
+
+        pad_tokens = self.count(scratchpad)
+        kept_pad, truncated = self._fit(
+            scratchpad, self.max_tokens - used, keep_end=True, tokens=pad_tokens
+        )
+        kept_pad_tokens = self.count(kept_pad) if truncated else pad_tokens
+        used += kept_pad_tokens
+        dropped += max(pad_tokens - kept_pad_tokens, 0)
+
+        kept_lines: List[str] = []
+        for line in memory:
+            tokens = self.count(line) + 1
+            if used + tokens <= self.max_tokens:
+                kept_lines.append(line)
+                used += tokens
+                continue
+            piece, _ = self._fit(
+                line, self.max_tokens - used - 1, keep_end=False, tokens=tokens - 1
+            )
+            if piece:
+                kept_lines.append(piece)
+                piece_tokens = self.count(piece) + 1
+                used += piece_tokens
+                dropped += max(tokens - piece_tokens, 0)
+            else:
+                dropped += tokens
+
+        if dropped:
+            logger.debug("Context budget %s: dropped %s tokens", self.max_tokens, dropped)
+        return Context(
+            history="\n".join(kept_lines),
+            scratchpad=kept_pad,
+            tokens=used,
+            dropped_tokens=dropped,
+        )
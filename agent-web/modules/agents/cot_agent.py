@@ -1,9 +1,11 @@
 import logging
 import re
-from typing import Iterator, Optional
+from typing import AsyncIterator, Iterator, Optional
 
 from ..memory.conversation_memory import BaseMemory
 from ..utils.llm_client import LLMClient
+from .context_builder import ContextBuilder
+from .effects import Chat, Steps, arun_steps, run_steps
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +32,24 @@ class CoTAgent:
         *,
         max_turns: int = 5,
         verbose: bool = False,
+        context_builder: Optional[ContextBuilder] = None,
     ) -> None:
         self.llm_client = llm_client
         self.memory = memory
         self.max_turns = max_turns
         self.verbose = verbose
+        self.context_builder = context_builder or ContextBuilder()
         if verbose:
             logger.setLevel(logging.DEBUG)
 
     def run_iter(self, question: str) -> Iterator[str]:
+        return run_steps(self._steps(question))
+
+    def arun_iter(self, question: str) -> AsyncIterator[str]:
+        """Async variant of :meth:`run_iter` using ``llm_client.achat``."""
+        return arun_steps(self._steps(question))
+
+    def _steps(self, question: str) -> Steps:
         scratchpad = ""
         if self.memory is not None:
             self.memory.add("user", question)
@@ -46,20 +57,22 @@ class CoTAgent:
                 history_lines = self.memory.search(question, top_k=3)
             except Exception:
                 history_lines = [m["content"] for m in self.memory.messages[:-1]]
-            history = "\n".join(history_lines)
         else:
-            history = ""
+            history_lines = []
 
         for _ in range(self.max_turns):
+            context = self.context_builder.build(
+                question, scratchpad, history_lines, fixed=self.PROMPT_TEMPLATE
+            )
             prompt = self.PROMPT_TEMPLATE.format(
                 input=question,
-                agent_scratchpad=(history + "\n" + scratchpad if history else scratchpad),
+                agent_scratchpad=context.render(),
             )
             messages = [{"role": "user", "content": prompt}]
             if self.verbose:
                 logger.debug("Prompt:\n%s", prompt)
 
-            output = self.llm_client.chat(messages=messages, stream=False)
+            output = yield Chat(self.llm_client, messages)
 
             if self.verbose:
                 logger.debug("LLM output:\n%s", output)
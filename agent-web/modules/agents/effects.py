@@ -0,0 +1,272 @@
+"""Blocking and asyncio drivers for agent step generators.
+
+Agents describe their loop once, as a generator that yields progress
+strings for the caller and :class:`Effect` objects for work that waits on
+I/O. The result of each effect is sent back into the generator.
+:func:`run_steps` performs effects with blocking calls and
+:func:`arun_steps` awaits them, so ``run_iter`` and ``arun_iter`` share all
+agent logic.
+"""
+
+import asyncio
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+Steps = Generator[Union[str, "Effect"], Any, None]
+
+
+class Effect(ABC):
+    """A unit of I/O requested by an agent."""
+
+    @abstractmethod
+    def run(self) -> Any:
+        """Perform the effect with blocking calls and return its result."""
+
+    async def arun(self) -> Any:
+        # Blocking work is moved off the event loop by default
+        return await asyncio.to_thread(self.run)
+
+
+class Chat(Effect):
+    """One non-streaming completion, returning its text.
+
+    ``llm_client.complete`` is preferred when the client has it, so agents
+    never pay for streaming.
+    """
+
+    def __init__(
+        self,
+        llm_client: Any,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+    ) -> None:
+        self.llm_client = llm_client
+        self.messages = messages
+        # None leaves the client's default in place
+        self.options = {} if temperature is None else {"temperature": temperature}
+
+    def run(self) -> str:
+        complete = getattr(self.llm_client, "complete", None)
+        if callable(complete):
+            return complete(self.messages, **self.options)
+        return self.llm_client.chat(messages=self.messages, stream=False)
+
+    async def arun(self) -> str:
+        if not callable(getattr(self.llm_client, "achat", None)):
+            return await super().arun()
+        return await self.llm_client.achat(self.messages, **self.options)
+
+
+class ToolChat(Effect):
+    """One completion offering ``tools`` for function calling.
+
+    Returns the response message, whose ``tool_calls`` may be set.
+    """
+
+    def __init__(
+        self,
+        llm_client: Any,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+    ) -> None:
+        self.llm_client = llm_client
+        self.messages = messages
+        self.tools = tools
+
+    def run(self) -> Any:
+        response = self.llm_client.with_tools(self.messages, self.tools)
+        return response.choices[0].message
+
+    async def arun(self) -> Any:
+        if not callable(getattr(self.llm_client, "awith_tools", None)):
+            return await super().arun()
+        response = await self.llm_client.awith_tools(self.messages, self.tools)
+        return response.choices[0].message
+
+
+class _LineWatcher:
+    """Accumulate deltas and report when a finished line matches ``pattern``."""
+
+    def __init__(self, pattern: "re.Pattern[str]") -> None:
+        self.pattern = pattern
+        self.parts: List[str] = []
+        self.size = 0
+        self.checked = 0
+        self.end: Optional[int] = None
+
+    def feed(self, delta: str) -> bool:
+        self.parts.append(delta)
+        self.size += len(delta)
+        if "\n" not in delta:
+            return False
+        text = self.text
+        line_end = text.rindex("\n")
+        # Only lines completed since the last check are searched
+        match = self.pattern.search(text, self.checked, line_end)
+        self.checked = line_end + 1
+        if match is None:
+            return False
+        self.end = match.end()
+        return True
+
+    @property
+    def text(self) -> str:
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def result(self) -> str:
+        text = self.text
+        return text if self.end is None else text[: self.end]
+
+
+class StreamChat(Chat):
+    """Streaming completion that is cancelled at the first line matching ``stop_at``.
+
+    The returned text ends with that line, so nothing the model generates
+    afterwards is waited for. Clients without ``stream`` fall back to a
+    regular completion.
+    """
+
+    def __init__(
+        self,
+        llm_client: Any,
+        messages: List[Dict[str, str]],
+        stop_at: "re.Pattern[str]",
+    ) -> None:
+        super().__init__(llm_client, messages)
+        self.stop_at = stop_at
+
+    def run(self) -> str:
+        stream = getattr(self.llm_client, "stream", None)
+        if not callable(stream):
+            return super().run()
+        watcher = _LineWatcher(self.stop_at)
+        deltas = stream(self.messages)
+        try:
+            for delta in deltas:
+                if watcher.feed(delta):
+                    break
+        finally:
+            close = getattr(deltas, "close", None)
+            if callable(close):
+                close()
+        return watcher.result()
+
+    async def arun(self) -> str:
+        astream = getattr(self.llm_client, "astream", None)
+        if not callable(astream):
+            return await super().arun()
+        watcher = _LineWatcher(self.stop_at)
+        deltas = astream(self.messages)
+        try:
+            async for delta in deltas:
+                if watcher.feed(delta):
+                    break
+        finally:
+            aclose = getattr(deltas, "aclose", None)
+            if callable(aclose):
+                await aclose()
+        return watcher.result()
+
+
+class Call(Effect):
+    """A blocking function with an optional coroutine function doing the same."""
+
+    def __init__(
+        self,
+        func: Callable[[], Any],
+        afunc: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        self.func = func
+        self.afunc = afunc
+
+    def run(self) -> Any:
+        return self.func()
+
+    async def arun(self) -> Any:
+        if self.afunc is None:
+            return await super().arun()
+        return await self.afunc()
+
+
+class Gather(Effect):
+    """Run several effects concurrently and return their results in order.
+
+    The blocking driver uses ``pool`` if one is given and runs the effects
+    one after another otherwise.
+    """
+
+    def __init__(
+        self, effects: Sequence[Effect], pool: Optional[ThreadPoolExecutor] = None
+    ) -> None:
+        self.effects = list(effects)
+        self.pool = pool
+
+    def run(self) -> List[Any]:
+        if self.pool is None or len(self.effects) < 2:
+            return [effect.run() for effect in self.effects]
+        return list(self.pool.map(lambda effect: effect.run(), self.effects))
+
+    async def arun(self) -> List[Any]:
+        return list(await asyncio.gather(*(effect.arun() for effect in self.effects)))
+
+
+def run_steps(steps: Steps) -> Iterator[str]:
+    """Drive ``steps`` with blocking calls, yielding its progress strings.
+
+    An exception raised by an effect is thrown into ``steps`` at the point
+    where the effect was yielded.
+    """
+    send, value = steps.send, None
+    try:
+        while True:
+            try:
+                item = send(value)
+            except StopIteration:
+                return
+            if isinstance(item, Effect):
+                try:
+                    send, value = steps.send, item.run()
+                except Exception as exc:
+                    send, value = steps.throw, exc
+            else:
+                send, value = steps.send, None
+                yield item
+    finally:
+        steps.close()
+
+
+async def arun_steps(steps: Steps) -> AsyncIterator[str]:
+    """Drive ``steps`` on the running event loop."""
+    send, value = steps.send, None
+    try:
+        while True:
+            try:
+                item = send(value)
+            except StopIteration:
+                return
+            if isinstance(item, Effect):
+                try:
+                    send, value = steps.send, await item.arun()
+                except Exception as exc:
+                    send, value = steps.throw, exc
+            else:
+                send, value = steps.send, None
+                yield item
+    finally:
+        steps.close()
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..utils.llm_client import LLMClient
+from .effects import Chat
+
+logger = logging.getLogger(__name__)
+
+_ARRAY_RE = re.compile(r"\[.*?\]", re.DOTALL)
+
+
+def parse_score(text: str) -> Optional[float]:
+    """Return the score in a single-item reply or ``None``."""
+    try:
+        return float(text.strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_scores(text: str, count: int) -> List[Optional[float]]:
+    """Extract ``count`` scores from a reply containing a JSON array.
+
+    Items that are missing or not numeric are returned as ``None`` so the
+    caller can score them individually.
+    """
+    scores: List[Optional[float]] = [None] * count
+    match = _ARRAY_RE.search(text or "")
+    if not match:
+        return scores
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return scores
+    for i, item in enumerate(items[:count]):
+        if isinstance(item, bool):
+            continue
+        try:
+            scores[i] = float(item)
+        except (TypeError, ValueError):
+            pass
+    return scores
+
+
+def model_name(obj: object) -> Optional[str]:
+    """Return the model an LLM client or evaluator uses, if it tells."""
+    model = getattr(obj, "model", None)
+    if isinstance(model, str):
+        return model
+    resolve = getattr(obj, "_model", None)
+    if callable(resolve):
+        try:
+            return resolve()
+        except Exception:
+            return None
+    return None
+
+
+class LLMEvaluator:
+    """Score Tree-of-Thoughts histories with the LLM.
+
+    ``evaluate_many`` rates all candidates of a depth level with one
+    request that asks for a JSON array. Items the reply does not cover are
+    re-scored one by one. ``aevaluate`` and ``aevaluate_many`` do the same
+    through ``llm_client.achat``. Requests use temperature 0, so a client
+    with a response cache answers repeated evaluations without the API.
+    """
+
+    SINGLE_PROMPT = (
+        "以下の思考の有用性を0から1の数値で評価してください。数値のみ回答してください。\n"
+        "{history}\nスコア:"
+    )
+    BATCH_PROMPT = (
+        "以下の{count}個の思考の有用性をそれぞれ0から1の数値で評価してください。\n"
+        "候補の順番どおりに、数値だけを含むJSON配列で回答してください。例: [0.2, 0.8]\n"
+        "{candidates}\nスコア:"
+    )
+
+    def __init__(self, llm_client: LLMClient) -> None:
+        self.llm_client = llm_client
+
+    @property
+    def model(self) -> Optional[str]:
+        return model_name(self.llm_client)
+
+    def _ask(self, prompt: str) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        return Chat(self.llm_client, messages, temperature=0.0).run()
+
+    async def _aask(self, prompt: str) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        return await Chat(self.llm_client, messages, temperature=0.0).arun()
+
+    @staticmethod
+    def _single_score(resp: str) -> float:
+        score = parse_score(resp)
+        if score is None:
+            logger.warning("Failed to parse evaluation score from '%s'", resp)
+            return 0.0
+        return score
+
+    @classmethod
+    def batch_prompt(cls, histories: Sequence[str]) -> str:
+        """Prompt asking for the scores of ``histories`` as a JSON array."""
+        candidates = "\n".join(
+            f"候補{i + 1}:\n{h}" for i, h in enumerate(histories)
+        )
+        return cls.BATCH_PROMPT.format(count=len(histories), candidates=candidates)
+
+    @staticmethod
+    def _missing(scores: List[Optional[float]]) -> List[int]:
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            logger.warning(
+                "Batch evaluation covered %s of %s candidates",
+                len(scores) - len(missing),
+                len(scores),
+            )
+        return missing
+
+    def __call__(self, history: str) -> float:
+        return self._single_score(self._ask(self.SINGLE_PROMPT.format(history=history)))
+
+    async def aevaluate(self, history: str) -> float:
+        resp = await self._aask(self.SINGLE_PROMPT.format(history=history))
+        return self._single_score(resp)
+
+    def evaluate_many(self, histories: Sequence[str]) -> List[float]:
+        if not histories:
+            return []
+        if len(histories) == 1:
+            return [self(histories[0])]
+        resp = self._ask(self.batch_prompt(histories))
+        scores = parse_scores(resp, len(histories))
+        for i in self._missing(scores):
+            scores[i] = self(histories[i])
+        return scores
+
+    async def aevaluate_many(self, histories: Sequence[str]) -> List[float]:
+        if not histories:
+            return []
+        if len(histories) == 1:
+            return [await self.aevaluate(histories[0])]
+        resp = await self._aask(self.batch_prompt(histories))
+        scores = parse_scores(resp, len(histories))
+        missing = self._missing(scores)
+        retried = await asyncio.gather(*(self.aevaluate(histories[i]) for i in missing))
+        for i, score in zip(missing, retried):
+            scores[i] = score
+        return scores
+
+
+def normalize_history(history: str) -> str:
+    """Collapse whitespace so trivially different histories share a key.
+
+    Whitespace is collapsed within each thought while the line breaks
+    between thoughts are kept, so ``"A B"`` and ``"A\nB"`` stay distinct.
+    """
+    lines = (" ".join(line.split()) for line in history.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class CachedEvaluator:
+    """Bounded LRU cache in front of a ToT evaluator.
+
+    Keys combine the normalised history text with ``model`` so scores from
+    different models never mix. ``evaluate_many`` is only offered when the
+    wrapped evaluator has one. It removes duplicates and cached entries
+    before forwarding the rest as one batch. ``aevaluate`` and
+    ``aevaluate_many`` are likewise offered when the wrapped evaluator has
+    async counterparts. ``hits`` and ``misses`` count lookups.
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[str], float],
+        *,
+        maxsize: int = 1024,
+        model: Optional[str] = None,
+    ) -> None:
+        self.evaluate = evaluate
+        self.maxsize = maxsize
+        self.model = model if model is not None else model_name(evaluate)
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[Optional[str], str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, history: str) -> Tuple[Optional[str], str]:
+        return self.model, normalize_history(history)
+
+    def __contains__(self, history: str) -> bool:
+        """Return whether ``history`` is cached, without counting a lookup."""
+        with self._lock:
+            return self._key(history) in self._cache
+
+    def _get(self, key) -> Optional[float]:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            return None
+
+    def _put(self, key, score: float) -> None:
+        with self._lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def __call__(self, history: str) -> float:
+        key = self._key(history)
+        score = self._get(key)
+        if score is None:
+            score = self.evaluate(history)
+            self._put(key, score)
+        return score
+
+    @property
+    def evaluate_many(self) -> Optional[Callable[[Sequence[str]], List[float]]]:
+        if callable(getattr(self.evaluate, "evaluate_many", None)):
+            return self._evaluate_many
+        return None
+
+    @property
+    def aevaluate(self) -> Optional[Callable[[str], Awaitable[float]]]:
+        if callable(getattr(self.evaluate, "aevaluate", None)):
+            return self._aevaluate
+        return None
+
+    @property
+    def aevaluate_many(
+        self,
+    ) -> Optional[Callable[[Sequence[str]], Awaitable[List[float]]]]:
+        if callable(getattr(self.evaluate, "aevaluate_many", None)):
+            return self._aevaluate_many
+        return None
+
+    def _lookup(self, histories: Sequence[str]):
+        """Split ``histories`` into cached scores and unique pending items."""
+        keys = [self._key(h) for h in histories]
+        known: Dict[Tuple[Optional[str], str], float] = {}
+        pending: Dict[Tuple[Optional[str], str], str] = {}
+        for key, history in zip(keys, histories):
+            if key in known or key in pending:
+                continue
+            score = self._get(key)
+            if score is None:
+                pending[key] = history
+            else:
+                known[key] = score
+        return keys, known, pending
+
+    def _store(self, known, pending, scores: Sequence[float]) -> None:
+        for key, score in zip(pending, scores):
+            self._put(key, score)
+            known[key] = score
+
+    def _evaluate_many(self, histories: Sequence[str]) -> List[float]:
+        keys, known, pending = self._lookup(histories)
+        if pending:
+            self._store(known, pending, self.evaluate.evaluate_many(list(pending.values())))
+        return [known[key] for key in keys]
+
+    async def _aevaluate(self, history: str) -> float:
+        key = self._key(history)
+        score = self._get(key)
+        if score is None:
+            score = await self.evaluate.aevaluate(history)
+            self._put(key, score)
+        return score
+
+    async def _aevaluate_many(self, histories: Sequence[str]) -> List[float]:
+        keys, known, pending = self._lookup(histories)
+        if pending:
+            scores = await self.evaluate.aevaluate_many(list(pending.values()))
+            self._store(known, pending, scores)
+        return [known[key] for key in keys]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
@@ -1,9 +1,13 @@
 import re
 import logging
 import json
-from typing import Dict, List, Optional, Iterator
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Iterator, Tuple
 
-from ..tools.base import Tool, execute_tool
+from ..tools.base import Tool, execute_tool, tool_schema
+from ..tools.executor import ToolExecutor
+from .context_builder import ContextBuilder
+from .effects import Call, Chat, Steps, StreamChat, ToolChat, arun_steps, run_steps
 from ..memory.conversation_memory import BaseMemory
 from ..utils.llm_client import LLMClient
 
@@ -12,7 +16,24 @@ logger = logging.getLogger(__name__)
 
 
 class ReActAgent:
-    """Minimal implementation of the ReAct loop."""
+    """Minimal implementation of the ReAct loop.
+
+    Only the last ``keep_observations`` tool observations are resent
+    verbatim. Older ones longer than ``digest_chars`` are replaced by a
+    short digest that the model can expand again with the
+    ``recall_observation`` action.
+
+    With ``stream=True`` the completion is streamed and cancelled as soon as
+    a complete ``行動:`` line has arrived, so the tool starts without waiting
+    for the rest of the generation.
+
+    With ``function_calling=True`` tools are offered as OpenAI function
+    schemas derived from their ``args_schema`` and invoked through
+    structured ``tool_calls``. Prompts then no longer list the tools and
+    arguments never have to be parsed from free text. Several calls in one
+    turn run concurrently, up to ``max_tool_workers`` at a time and within
+    each tool's ``max_concurrency``.
+    """
 
     ACTION_RE = re.compile(r"^行動:\s*(\w+):\s*(.*)$", re.MULTILINE)
     FINAL_RE = re.compile(r"^最終的な答え:\s*(.*)$", re.MULTILINE)
@@ -24,17 +45,57 @@ class ReActAgent:
         "{agent_scratchpad}"
     )
 
+    FUNCTION_PROMPT = (
+        "あなたは質問に答えるアシスタントです。"
+        "必要に応じてツールを呼び出し、十分な情報が集まったら答えだけを返してください。"
+    )
+
+    RECALL_TOOL = "recall_observation"
+    RECALL_DESCRIPTION = (
+        f"- {RECALL_TOOL}: 省略された観察を全文表示する。入力は {{\"index\": 番号}}"
+    )
+    RECALL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": RECALL_TOOL,
+            "description": "省略された観察を全文表示する",
+            "parameters": {
+                "type": "object",
+                "properties": {"index": {"type": "integer"}},
+                "required": ["index"],
+            },
+        },
+    }
+
     def __init__(
         self,
         llm_client: LLMClient,
         tools: List[Tool],
         memory: Optional[BaseMemory] = None,
         verbose: bool = False,
+        *,
+        context_builder: Optional[ContextBuilder] = None,
+        keep_observations: int = 2,
+        digest_chars: int = 200,
+        stream: bool = False,
+        function_calling: bool = False,
+        max_tool_workers: int = 4,
+        tool_timeout: Optional[float] = None,
     ):
         self.llm_client = llm_client
         self.tools = {t.name: t for t in tools}
         self.memory = memory
         self.verbose = verbose
+        self.context_builder = context_builder or ContextBuilder()
+        self.keep_observations = keep_observations
+        self.digest_chars = digest_chars
+        self.stream = stream
+        self.function_calling = function_calling
+        # Applies to tools without a timeout of their own
+        self.tool_timeout = tool_timeout
+        self.executor = ToolExecutor.for_tools(
+            tools, max_workers=max_tool_workers, timeout=tool_timeout
+        )
         if verbose:
             logger.setLevel(logging.DEBUG)
 
@@ -44,33 +105,105 @@ class ReActAgent:
             descs.append(f"- {t.name}: {t.description}")
         return "\n".join(descs)
 
+    def _render_scratchpad(self, steps: List[Tuple[str, str]]) -> Tuple[str, bool]:
+        """Render the steps, digesting all but the most recent observations.
+
+        Returns the scratchpad and whether any observation was shortened.
+        """
+        parts = []
+        compacted = False
+        cutoff = len(steps) - self.keep_observations
+        for n, (output, observation) in enumerate(steps):
+            if n < cutoff and len(observation) > self.digest_chars:
+                observation = self._digest(n, observation)
+                compacted = True
+            parts.append(f"{output}\n観察: {observation}\n")
+        return "".join(parts), compacted
+
+    def _digest(self, n: int, observation: str) -> str:
+        return (
+            f"{observation[:self.digest_chars]}"
+            f"…(省略: {self.RECALL_TOOL} で #{n} を全文表示)"
+        )
+
+    def _recall(self, steps: List[Tuple[str, str]], tool_input: str) -> str:
+        try:
+            data = json.loads(tool_input)
+            index = int(data["index"] if isinstance(data, dict) else data)
+            return steps[index][1]
+        except Exception:
+            return f"Invalid arguments for {self.RECALL_TOOL}: {tool_input}"
+
     def run_iter(self, question: str, max_turns: int = 5) -> Iterator[str]:
         """Yield intermediate steps of the ReAct loop."""
-        scratchpad = ""
+        return run_steps(self._loop(question, max_turns))
+
+    def arun_iter(self, question: str, max_turns: int = 5) -> AsyncIterator[str]:
+        """Async variant of :meth:`run_iter`.
+
+        The LLM is called through ``llm_client.achat`` and tools run in a
+        worker thread, so the event loop stays free for other sessions.
+        """
+        return arun_steps(self._loop(question, max_turns))
+
+    def _loop(self, question: str, max_turns: int) -> Steps:
+        if self.function_calling:
+            return self._function_steps(question, max_turns)
+        return self._steps(question, max_turns)
+
+    def _history_lines(self, question: str) -> List[str]:
+        if self.memory is None:
+            return []
+        self.memory.add("user", question)
+        try:
+            return self.memory.search(question, top_k=3)
+        except Exception:
+            return [
+                f"{m['role']}: {m['content']}" for m in self.memory.messages[:-1]
+            ]
+
+    def _finish(self, answer: str) -> None:
+        if self.memory is not None:
+            self.memory.add("assistant", answer)
+        if self.verbose:
+            logger.info("Final answer: %s", answer)
+
+    def _observe(self, output: str, observation: str) -> None:
+        if self.verbose:
+            logger.debug("Observation: %s", observation)
         if self.memory is not None:
-            self.memory.add("user", question)
-            try:
-                history_lines = self.memory.search(question, top_k=3)
-            except Exception:
-                history_lines = [
-                    f"{m['role']}: {m['content']}" for m in self.memory.messages[:-1]
-                ]
-            history = "\n".join(history_lines)
-        else:
-            history = ""
+            self.memory.add("assistant", output)
+            self.memory.add("system", f"観察: {observation}")
+
+    def _steps(self, question: str, max_turns: int) -> Steps:
+        steps: List[Tuple[str, str]] = []
+        history_lines = self._history_lines(question)
 
         for _ in range(max_turns):
+            scratchpad, compacted = self._render_scratchpad(steps)
+            tools = self.tool_descriptions()
+            if compacted:
+                tools += "\n" + self.RECALL_DESCRIPTION
+            context = self.context_builder.build(
+                question,
+                scratchpad,
+                history_lines,
+                fixed=self.PROMPT_TEMPLATE + tools,
+            )
             prompt = self.PROMPT_TEMPLATE.format(
                 input=question,
-                tools=self.tool_descriptions(),
-                agent_scratchpad=(history + "\n" + scratchpad if history else scratchpad),
+                tools=tools,
+                agent_scratchpad=context.render(),
             )
             messages = [{"role": "user", "content": prompt}]
 
             if self.verbose:
                 logger.debug("Prompt:\n%s", prompt)
 
-            output = self.llm_client.chat(messages=messages, stream=False)
+            if self.stream:
+                output = yield StreamChat(self.llm_client, messages, self.ACTION_RE)
+            else:
+                output = yield Chat(self.llm_client, messages)
 
             if self.verbose:
                 logger.debug("LLM output:\n%s", output)
@@ -78,10 +211,7 @@ class ReActAgent:
             final_match = self.FINAL_RE.search(output)
             if final_match:
                 answer = final_match.group(1)
-                if self.memory is not None:
-                    self.memory.add("assistant", answer)
-                if self.verbose:
-                    logger.info("Final answer: %s", answer)
+                self._finish(answer)
                 yield answer
                 return
             action_match = self.ACTION_RE.search(output)
@@ -91,21 +221,124 @@ class ReActAgent:
             tool_name, tool_input = action_match.groups()
             if self.verbose:
                 logger.info("Executing tool %s with %s", tool_name, tool_input)
-            try:
-                args: Dict[str, str] = json.loads(tool_input)
-                if not isinstance(args, dict):
-                    raise ValueError
-            except Exception:
-                args = {"url": tool_input}
-
-            observation = execute_tool(tool_name, args, self.tools)
-            if self.verbose:
-                logger.debug("Observation: %s", observation)
+            if tool_name == self.RECALL_TOOL and tool_name not in self.tools:
+                observation = self._recall(steps, tool_input)
+            else:
+                try:
+                    args: Dict[str, str] = json.loads(tool_input)
+                    if not isinstance(args, dict):
+                        raise ValueError
+                except Exception:
+                    args = {"url": tool_input}
+                observation = yield Call(
+                    partial(
+                        execute_tool, tool_name, args, self.tools, timeout=self.tool_timeout
+                    )
+                )
             yield f"観察: {observation}"
-            scratchpad += f"{output}\n観察: {observation}\n"
-            if self.memory is not None:
-                self.memory.add("assistant", output)
-                self.memory.add("system", f"観察: {observation}")
+            steps.append((output, str(observation)))
+            self._observe(output, observation)
+        if self.verbose:
+            logger.warning("Max turns reached with no final answer")
+        yield "エラー: 最大試行回数に達しました"
+
+    def _function_steps(self, question: str, max_turns: int) -> Steps:
+        """ReAct loop driven by structured ``tool_calls``."""
+        schemas = [tool_schema(t) for t in self.tools.values()]
+        context = self.context_builder.build(
+            question,
+            memory=self._history_lines(question),
+            fixed=self.FUNCTION_PROMPT + json.dumps(schemas, ensure_ascii=False),
+        )
+        request = (
+            f"関連履歴:\n{context.history}\n" if context.history else ""
+        ) + f"質問: {question}"
+        head = [
+            {"role": "system", "content": self.FUNCTION_PROMPT},
+            {"role": "user", "content": request},
+        ]
+        # Assistant and tool messages, the latter tagged with their step index
+        transcript: List[Tuple[Dict, Optional[int]]] = []
+        steps: List[Tuple[str, str]] = []
+
+        for _ in range(max_turns):
+            messages = list(head)
+            compacted = False
+            cutoff = len(steps) - self.keep_observations
+            for message, n in transcript:
+                if n is not None and n < cutoff and len(steps[n][1]) > self.digest_chars:
+                    message = dict(message, content=self._digest(n, steps[n][1]))
+                    compacted = True
+                messages.append(message)
+            offered = schemas
+            if compacted and self.RECALL_TOOL not in self.tools:
+                offered = schemas + [self.RECALL_SCHEMA]
+
+            reply = yield ToolChat(self.llm_client, messages, offered)
+            calls = getattr(reply, "tool_calls", None) or []
+            if not calls:
+                answer = (reply.content or "").strip()
+                yield f"最終的な答え: {answer}"
+                self._finish(answer)
+                yield answer
+                return
+            transcript.append((
+                {
+                    "role": "assistant",
+                    "content": reply.content,
+                    "tool_calls": [
+                        {
+                            "id": call.id,
+                            "type": "function",
+                            "function": {
+                                "name": call.function.name,
+                                "arguments": call.function.arguments,
+                            },
+                        }
+                        for call in calls
+                    ],
+                },
+                None,
+            ))
+            outputs: List[str] = []
+            results: List[Optional[str]] = []
+            batch: List[Tuple[str, Dict]] = []
+            for call in calls:
+                name = call.function.name
+                arguments = call.function.arguments or "{}"
+                output = f"行動: {name}: {arguments}"
+                if self.verbose:
+                    logger.info("Executing tool %s with %s", name, arguments)
+                yield output
+                outputs.append(output)
+                try:
+                    args = json.loads(arguments)
+                    if not isinstance(args, dict):
+                        raise ValueError("arguments must be an object")
+                except ValueError as exc:
+                    results.append(f"Invalid arguments for {name}: {exc}")
+                    continue
+                if name == self.RECALL_TOOL and name not in self.tools:
+                    results.append(self._recall(steps, arguments))
+                else:
+                    results.append(None)
+                    batch.append((name, args))
+            if batch:
+                executed = yield Call(
+                    partial(self.executor.run, batch), partial(self.executor.arun, batch)
+                )
+                pending = iter(executed)
+                results = [next(pending) if r is None else r for r in results]
+            # Results go back in call order, whichever tool finished first
+            for call, output, observation in zip(calls, outputs, results):
+                observation = str(observation)
+                yield f"観察: {observation}"
+                transcript.append((
+                    {"role": "tool", "tool_call_id": call.id, "content": observation},
+                    len(steps),
+                ))
+                steps.append((output, observation))
+                self._observe(output, observation)
         if self.verbose:
             logger.warning("Max turns reached with no final answer")
         yield "エラー: 最大試行回数に達しました"
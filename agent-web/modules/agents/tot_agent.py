@@ -1,8 +1,38 @@
+import asyncio
+import heapq
+import itertools
+import logging
 import re
-from typing import List, Tuple, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Generator,
+    List,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from config.constants import TOT_LEVELS
 
 from ..memory.conversation_memory import BaseMemory
 from ..utils.llm_client import LLMClient
+from .context_builder import ContextBuilder
+from .effects import Call, Chat, Effect, Gather, Steps, arun_steps, run_steps
+from .evaluator import CachedEvaluator, model_name
+from .tot_search import STRATEGIES, SearchBudget, SearchPolicy, ThoughtNode
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+# Generators that yield progress strings and effects, then return a value
+Search = Generator[Union[str, Effect], Any, R]
 
 
 class ToTAgent:
@@ -12,10 +42,36 @@ class ToTAgent:
     At each depth it expands the best nodes according to an evaluation
     function and finally asks the LLM to produce an answer based on the
     highest scoring path.
+
+    With ``max_workers`` above one, the proposals for all frontier nodes
+    and the evaluations of all candidates of a level are issued
+    concurrently. Results are gathered in input order, so the selected
+    path is the same as in sequential mode.
+
+    Evaluators that provide ``evaluate_many(histories)`` score all
+    candidates of a level in a single call. Duplicate candidates within a
+    level are scored once, and a custom evaluator is wrapped in a
+    :class:`CachedEvaluator` so repeated histories across levels and runs
+    are not scored again.
+
+    A :class:`SearchPolicy` can prune weak candidates, stop early once a
+    path is good enough and cap the LLM calls and tokens of a search. The
+    spending of the last run is available as ``budget``.
+
+    The ``strategy`` selects how the tree is explored. ``"beam"`` expands
+    the best ``breadth`` nodes of every level. ``"best_first"`` always
+    expands the single highest scoring open node, so weak branches are
+    never expanded unless nothing better is left. ``"mcts"`` descends the
+    tree by upper confidence bound and propagates evaluation scores back to
+    the ancestors. The latter two expand one node per step, so by default
+    they stop before making more LLM calls than a beam search of the same
+    depth and breadth would, and no node is expanded twice.
     """
 
     THOUGHT_RE = re.compile(r"^-\s*(.+)", re.MULTILINE)
     FINAL_RE = re.compile(r"^最終的な答え:\s*(.*)$", re.MULTILINE)
+    # Exploration constant of the MCTS selection rule
+    EXPLORATION = 1.0
 
     def __init__(
         self,
@@ -24,6 +80,13 @@ class ToTAgent:
         max_depth: int = 2,
         breadth: int = 2,
         memory: Optional[BaseMemory] = None,
+        context_builder: Optional[ContextBuilder] = None,
+        evaluator: Optional[Callable[[str], float]] = None,
+        max_workers: int = 1,
+        eval_cache_size: int = 1024,
+        policy: Optional[SearchPolicy] = None,
+        strategy: str = "beam",
+        max_expansions: Optional[int] = None,
     ) -> None:
         """Create a new agent.
 
@@ -35,50 +98,425 @@ class ToTAgent:
             How many rounds of expansion to perform.
         breadth:
             How many candidates to keep at each depth.
+        context_builder:
+            Limits how much retrieved memory is included in the prompts.
+        evaluator:
+            Scores a thought history between 0 and 1. If it also has an
+            ``evaluate_many`` method, that is used for whole levels.
+        max_workers:
+            Upper bound on concurrent LLM calls within one depth level.
+        eval_cache_size:
+            Size of the evaluation cache. ``0`` disables caching.
+        policy:
+            Pruning, early stopping and budget limits. Unlimited by default.
+        strategy:
+            ``"beam"``, ``"best_first"`` or ``"mcts"``.
+        max_expansions:
+            Number of nodes ``best_first`` and ``mcts`` may expand. By
+            default they may spend as many LLM calls as a beam search.
         """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}, got {strategy!r}")
         self.llm_client = llm_client
-        self.evaluate = self._dummy_evaluate
+        if evaluator is not None and eval_cache_size > 0:
+            # Scores of one model must not be reused for another
+            model = model_name(evaluator) or model_name(llm_client)
+            evaluator = CachedEvaluator(evaluator, maxsize=eval_cache_size, model=model)
+        self.evaluate = evaluator or self._dummy_evaluate
         self.max_depth = max_depth
         self.breadth = breadth
         self.memory = memory
+        self.context_builder = context_builder or ContextBuilder()
+        self.max_workers = max_workers
+        self.policy = policy or SearchPolicy()
+        self.budget = SearchBudget(self.policy)
+        self.strategy = strategy
+        self.max_expansions = max_expansions
+
+    @classmethod
+    def from_level(
+        cls,
+        llm_client: LLMClient,
+        level: str,
+        *,
+        max_depth: Optional[int] = None,
+        breadth: Optional[int] = None,
+        **kwargs,
+    ) -> "ToTAgent":
+        """Create an agent using the depth, breadth and budget of a preset.
+
+        ``max_depth`` and ``breadth`` override the preset, for example from
+        ``TOT_DEPTH`` and ``TOT_BREADTH``, while its budget still applies.
+        """
+        depth, width = TOT_LEVELS[level.upper()]
+        kwargs.setdefault("policy", SearchPolicy.for_level(level))
+        return cls(
+            llm_client,
+            max_depth=depth if max_depth is None else max_depth,
+            breadth=width if breadth is None else breadth,
+            **kwargs,
+        )
 
     def _dummy_evaluate(self, history: str) -> float:
         """A placeholder evaluation function. TODO: Implement a real one."""
         return 0.0
 
-    def _propose(self, question: str, history: str, memory: str = "") -> List[str]:
-        """Ask the LLM for the next thought candidates."""
-        prompt = (
+    def _map(
+        self,
+        pool: Optional[ThreadPoolExecutor],
+        func: Callable[[T], R],
+        items: Sequence[T],
+    ) -> List[R]:
+        """Apply ``func`` to ``items``, concurrently if a pool is given."""
+        if pool is None or len(items) < 2:
+            return [func(item) for item in items]
+        return list(pool.map(func, items))
+
+    def _uncached(self, unique: List[str]) -> List[str]:
+        """Return the histories whose evaluation will reach the LLM."""
+        if self.evaluate == self._dummy_evaluate:
+            return []
+        if isinstance(self.evaluate, CachedEvaluator):
+            return [h for h in unique if h not in self.evaluate]
+        return unique
+
+    def _charge_scoring(self, fresh: List[str], batched: bool) -> None:
+        if fresh:
+            calls = 1 if batched else len(fresh)
+            self.budget.charge("\n".join(fresh), calls=calls)
+
+    def _score(
+        self, pool: Optional[ThreadPoolExecutor], histories: List[str]
+    ) -> List[float]:
+        """Score candidate histories, in one batch when supported."""
+        unique = list(dict.fromkeys(histories))
+        fresh = self._uncached(unique)
+        evaluate_many = getattr(self.evaluate, "evaluate_many", None)
+        if callable(evaluate_many):
+            scores = list(evaluate_many(unique))
+        else:
+            scores = self._map(pool, self.evaluate, unique)
+        self._charge_scoring(fresh, callable(evaluate_many))
+        by_history = dict(zip(unique, scores))
+        return [by_history[h] for h in histories]
+
+    async def _ascore(self, histories: List[str]) -> List[float]:
+        """Async variant of :meth:`_score`.
+
+        Evaluators without async methods run in worker threads.
+        """
+        unique = list(dict.fromkeys(histories))
+        fresh = self._uncached(unique)
+        evaluate_many = getattr(self.evaluate, "evaluate_many", None)
+        aevaluate_many = getattr(self.evaluate, "aevaluate_many", None)
+        aevaluate = getattr(self.evaluate, "aevaluate", None)
+        if callable(aevaluate_many):
+            scores = list(await aevaluate_many(unique))
+        elif callable(evaluate_many):
+            scores = list(await asyncio.to_thread(evaluate_many, unique))
+        elif callable(aevaluate):
+            scores = list(await asyncio.gather(*(aevaluate(h) for h in unique)))
+        else:
+            scores = list(
+                await asyncio.gather(
+                    *(asyncio.to_thread(self.evaluate, h) for h in unique)
+                )
+            )
+        self._charge_scoring(fresh, callable(aevaluate_many) or callable(evaluate_many))
+        by_history = dict(zip(unique, scores))
+        return [by_history[h] for h in histories]
+
+    def _chat(self, prompt: str) -> Search[str]:
+        messages = [{"role": "user", "content": prompt}]
+        output = yield Chat(self.llm_client, messages)
+        self.budget.charge(prompt, output)
+        return output
+
+    def _eval_calls(self, count: int) -> int:
+        """LLM calls needed to score ``count`` new candidates."""
+        if self.evaluate == self._dummy_evaluate:
+            return 0
+        if callable(getattr(self.evaluate, "evaluate_many", None)):
+            return 1 if count else 0
+        return count
+
+    def _affordable(self, nodes: List[ThoughtNode]) -> List[ThoughtNode]:
+        """Return the frontier nodes the remaining budget can expand.
+
+        Room is kept for scoring their candidates and for the final answer.
+        """
+        tokens_left = self.budget.tokens_left()
+        if tokens_left is not None and tokens_left <= 0:
+            return []
+        calls_left = self.budget.calls_left()
+        if calls_left is None:
+            return nodes
+        count = len(nodes)
+        while count and count + self._eval_calls(count * self.breadth) + 1 > calls_left:
+            count -= 1
+        return nodes[:count]
+
+    def _scorable(self, histories: List[str]) -> List[str]:
+        """Drop candidates whose evaluation the budget cannot pay for."""
+        calls_left = self.budget.calls_left()
+        if calls_left is None:
+            return histories
+        count = len(histories)
+        # Keep one call for the final answer; free scoring is never cut
+        while count:
+            calls = self._eval_calls(count)
+            if calls == 0 or calls + 1 <= calls_left:
+                break
+            count -= 1
+        return histories[:count]
+
+    def _propose_prompt(self, question: str, history: str, memory: str = "") -> str:
+        return (
             f"質問: {question}\n"
             + (f"関連履歴:\n{memory}\n" if memory else "")
             + f"これまでの思考:\n{history}\n"
             f"{self.breadth}個の次の思考候補を箇条書きで提案してください。"
         )
-        messages = [{"role": "user", "content": prompt}]
-        output = self.llm_client.chat(messages=messages, stream=False)
-        return [m.group(1).strip() for m in self.THOUGHT_RE.finditer(output)]
 
-    def _final(self, question: str, history: str, memory: str = "") -> str:
+    def _propose(
+        self, pool: Optional[ThreadPoolExecutor], prompts: List[str]
+    ) -> Search[List[List[str]]]:
+        """Ask the LLM for the next thought candidates of every prompt."""
+        outputs = yield Gather(
+            [Chat(self.llm_client, [{"role": "user", "content": p}]) for p in prompts],
+            pool,
+        )
+        for prompt, output in zip(prompts, outputs):
+            self.budget.charge(prompt, output)
+        return [
+            [m.group(1).strip() for m in self.THOUGHT_RE.finditer(output)]
+            for output in outputs
+        ]
+
+    def _final(self, question: str, history: str, memory: str = "") -> Search[str]:
         """Request the final answer from the LLM."""
         prompt = (
             f"質問: {question}\n"
             + (f"関連履歴:\n{memory}\n" if memory else "")
             + f"思考過程:\n{history}\n最終的な答え:"
         )
-        messages = [{"role": "user", "content": prompt}]
-        resp = self.llm_client.chat(messages=messages, stream=False)
+        resp = yield from self._chat(prompt)
         match = self.FINAL_RE.search(resp)
         return match.group(1).strip() if match else resp.strip()
 
-    def run_iter(self, question: str) -> Iterator[str]:
-        """Generate reasoning steps and yield the final answer.
+    def _expand(
+        self,
+        question: str,
+        mem_context: str,
+        pool: Optional[ThreadPoolExecutor],
+        parents: List[ThoughtNode],
+    ) -> Search[List[ThoughtNode]]:
+        """Propose and score the children of ``parents``.
 
-        The iterator yields strings describing each phase of the search:
+        Yields the ``思考候補`` steps and returns the scored children, which
+        are also attached to their parents.
+        """
+        proposals = yield from self._propose(
+            pool,
+            [self._propose_prompt(question, n.history, mem_context) for n in parents],
+        )
+        children: List[ThoughtNode] = []
+        for parent, thoughts in zip(parents, proposals):
+            parent.expanded = True
+            if thoughts:
+                yield "\n".join(f"思考候補: {t}" for t in thoughts)
+            children.extend(parent.child(t) for t in thoughts)
+        children = children[: len(self._scorable([c.history for c in children]))]
+        if not children:
+            return []
+        histories = [c.history for c in children]
+        scores = yield Call(
+            partial(self._score, pool, histories), partial(self._ascore, histories)
+        )
+        for child, score in zip(children, scores):
+            child.score = score
+            child.parent.children.append(child)
+        return children
 
-        * ``思考候補`` lines listing proposed thoughts
-        * ``選択`` lines showing which path was chosen and its score
-        * a ``最終的な答え`` line containing the answer at the end
+    def _expansion_limit(self) -> int:
+        if self.max_expansions is not None:
+            return self.max_expansions
+        return 1 + self.breadth * (self.max_depth - 1) if self.max_depth > 0 else 0
+
+    def _beam_calls(self) -> int:
+        """LLM calls a beam search of this depth and breadth makes at most."""
+        if self.max_depth <= 0:
+            return 0
+        widths = [1] + [self.breadth] * (self.max_depth - 1)
+        return sum(n + self._eval_calls(n * self.breadth) for n in widths)
+
+    def _can_expand(self, expansions: int) -> bool:
+        """Whether ``best_first`` or ``mcts`` may expand another node.
+
+        Each of their expansions is scored on its own, so with a batched
+        evaluator they pay a scoring call per node where a beam search pays
+        one per level. Unless ``max_expansions`` is given they are limited
+        by the calls of a beam search rather than by its expansions.
+        """
+        if expansions >= self._expansion_limit():
+            return False
+        if self.max_expansions is not None:
+            return True
+        cost = 1 + self._eval_calls(self.breadth)
+        return self.budget.calls + cost <= self._beam_calls()
+
+    def _stop(self, score: float) -> bool:
+        stop_score = self.policy.stop_score
+        if stop_score is not None and score >= stop_score:
+            logger.info("ToT stopped early with score %.2f", score)
+            return True
+        return False
+
+    def _log_exhausted(self) -> None:
+        logger.info("ToT budget exhausted: %s calls, %s tokens",
+                    self.budget.calls, self.budget.tokens)
+
+    def _beam_search(
+        self, question: str, mem_context: str, pool: Optional[ThreadPoolExecutor]
+    ) -> Search[ThoughtNode]:
+        """Expand the best ``breadth`` nodes of each level."""
+        root = ThoughtNode()
+        nodes = [root]
+        for _ in range(self.max_depth):
+            frontier = self._affordable(nodes)
+            if not frontier:
+                self._log_exhausted()
+                break
+            candidates = yield from self._expand(question, mem_context, pool, frontier)
+            if not candidates:
+                break
+            candidates.sort(key=lambda c: c.score, reverse=True)
+            prune_below = self.policy.prune_below
+            if prune_below is not None and candidates[0].score < prune_below:
+                logger.info("All ToT candidates scored below %s", prune_below)
+                if nodes[0] is root:
+                    nodes = candidates[:1]
+                break
+            if prune_below is not None:
+                candidates = [c for c in candidates if c.score >= prune_below]
+            nodes = candidates[: self.breadth]
+            yield f"選択: {nodes[0].history} (score={nodes[0].score:.2f})"
+            if self._stop(nodes[0].score):
+                break
+        return nodes[0]
+
+    def _best_first_search(
+        self, question: str, mem_context: str, pool: Optional[ThreadPoolExecutor]
+    ) -> Search[ThoughtNode]:
+        """Always expand the highest scoring open node.
+
+        Ties go to the deeper node so complete paths are reached quickly.
         """
+        root = ThoughtNode()
+        best = root
+        order = itertools.count()
+        heap = [(0.0, 0, next(order), root)]
+        expansions = 0
+        prune_below = self.policy.prune_below
+        while heap and self._can_expand(expansions):
+            node = heapq.heappop(heap)[-1]
+            if node.expanded or node.depth >= self.max_depth:
+                continue
+            if not self._affordable([node]):
+                self._log_exhausted()
+                break
+            children = yield from self._expand(question, mem_context, pool, [node])
+            expansions += 1
+            for child in children:
+                if prune_below is not None and child.score < prune_below:
+                    continue
+                heapq.heappush(heap, (-child.score, -child.depth, next(order), child))
+                if best is root or child.score > best.score:
+                    best = child
+            if best is root and children:
+                # Everything was pruned; keep the best guess as in beam search
+                best = max(children, key=lambda c: c.score)
+            if best is not root:
+                yield f"選択: {best.history} (score={best.score:.2f})"
+                if self._stop(best.score):
+                    break
+        return best
+
+    @staticmethod
+    def _most_visited_path(root: ThoughtNode) -> ThoughtNode:
+        node = root
+        while node.children:
+            node = max(node.children, key=lambda c: (c.visits, c.mean()))
+        return node
+
+    def _mcts_search(
+        self, question: str, mem_context: str, pool: Optional[ThreadPoolExecutor]
+    ) -> Search[ThoughtNode]:
+        """Monte Carlo tree search using evaluator scores as rewards.
+
+        Instead of random rollouts the best score among the children of an
+        expanded node is backed up to its ancestors. The answer follows the
+        most visited children from the root.
+        """
+        root = ThoughtNode()
+        limit = self._expansion_limit()
+        expansions = 0
+        prune_below = self.policy.prune_below
+        # Bounded so revisiting finished paths cannot loop forever
+        for _ in range(4 * limit):
+            if not self._can_expand(expansions):
+                break
+            node = root
+            while node.expanded and node.children:
+                node = max(node.children, key=lambda c: c.ucb(self.EXPLORATION))
+            if node.expanded or node.depth >= self.max_depth:
+                if node is root:
+                    break
+                # A finished path or a dead end is scored again without a call
+                node.backpropagate(node.score if node.depth >= self.max_depth else 0.0)
+                continue
+            if not self._affordable([node]):
+                self._log_exhausted()
+                break
+            children = yield from self._expand(question, mem_context, pool, [node])
+            expansions += 1
+            if prune_below is not None:
+                kept = [c for c in children if c.score >= prune_below]
+                if not kept and node is root and children:
+                    logger.info("All ToT candidates scored below %s", prune_below)
+                    kept = [max(children, key=lambda c: c.score)]
+                node.children = kept
+                children = kept
+            if not children:
+                node.backpropagate(0.0)
+                continue
+            for child in children:
+                child.visits = 1
+                child.value = child.score
+            leaf = max(children, key=lambda c: c.score)
+            node.backpropagate(leaf.score)
+            chosen = self._most_visited_path(root)
+            yield f"選択: {chosen.history} (score={chosen.score:.2f})"
+            if self._stop(leaf.score):
+                break
+        best = self._most_visited_path(root)
+        if self.policy.stop_score is not None:
+            finished = [
+                c for c in self._nodes(root) if c.score >= self.policy.stop_score
+            ]
+            if finished:
+                best = max(finished, key=lambda c: c.score)
+        return best
+
+    @staticmethod
+    def _nodes(root: ThoughtNode) -> Iterator[ThoughtNode]:
+        stack = list(root.children)
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children)
+
+    def _steps(self, question: str, pool: Optional[ThreadPoolExecutor]) -> Steps:
         memory_lines: List[str] = []
         if self.memory is not None:
             try:
@@ -88,30 +526,49 @@ class ToTAgent:
             if not memory_lines:
                 memory_lines = [m["content"] for m in self.memory.messages]
             self.memory.add("user", question)
-        mem_context = "\n".join(memory_lines)
+        # The thought path is short, so only memory is budgeted here
+        mem_context = self.context_builder.build(question, memory=memory_lines).history
 
-        nodes: List[Tuple[str, float]] = [("", 0.0)]
-        for _ in range(self.max_depth):
-            candidates: List[Tuple[str, float]] = []
-            for hist, _score in nodes:
-                thoughts = self._propose(question, hist, mem_context)
-                if thoughts:
-                    yield "\n".join(f"思考候補: {t}" for t in thoughts)
-                for t in thoughts:
-                    new_hist = (hist + "\n" + t) if hist else t
-                    score = self.evaluate(new_hist)
-                    candidates.append((new_hist, score))
-            if not candidates:
-                break
-            candidates.sort(key=lambda x: x[1], reverse=True)
-            nodes = candidates[: self.breadth]
-            yield f"選択: {nodes[0][0]} (score={nodes[0][1]:.2f})"
-        best_history = nodes[0][0]
-        answer = self._final(question, best_history, mem_context)
+        self.budget = SearchBudget(self.policy)
+        search = {
+            "beam": self._beam_search,
+            "best_first": self._best_first_search,
+            "mcts": self._mcts_search,
+        }[self.strategy]
+        best = yield from search(question, mem_context, pool)
+        answer = yield from self._final(question, best.history, mem_context)
         yield f"最終的な答え: {answer}"
         if self.memory is not None:
             self.memory.add("assistant", answer)
-        return
+
+    def run_iter(self, question: str) -> Iterator[str]:
+        """Generate reasoning steps and yield the final answer.
+
+        The iterator yields strings describing each phase of the search:
+
+        * ``思考候補`` lines listing proposed thoughts
+        * ``選択`` lines showing which path was chosen and its score
+        * a ``最終的な答え`` line containing the answer at the end
+        """
+        pool = (
+            ThreadPoolExecutor(max_workers=self.max_workers)
+            if self.max_workers > 1
+            else None
+        )
+        try:
+            yield from run_steps(self._steps(question, pool))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    def arun_iter(self, question: str) -> AsyncIterator[str]:
+        """Async variant of :meth:`run_iter`.
+
+        Proposals and evaluations of a level are awaited together on the
+        running event loop instead of occupying worker threads, so
+        ``max_workers`` does not apply.
+        """
+        return arun_steps(self._steps(question, None))
 
     def run(self, question: str) -> str:
         """Execute the search loop and return the final answer."""
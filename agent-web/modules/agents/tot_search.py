@@ -0,0 +1,111 @@
+"""Search policies, budgets and the thought tree of :class:`ToTAgent`."""
+
+from dataclasses import dataclass, field
+import math
+import threading
+from typing import List, Optional
+
+from config.constants import TOT_BUDGETS
+
+from .context_builder import count_tokens
+
+STRATEGIES = ("beam", "best_first", "mcts")
+
+
+@dataclass
+class SearchPolicy:
+    """Limits and thresholds applied while searching.
+
+    Parameters
+    ----------
+    prune_below:
+        Candidates scoring below this value are discarded. If every
+        candidate of a level is discarded the search stops with the best
+        path found so far.
+    stop_score:
+        Stop expanding once the best candidate reaches this score.
+    max_llm_calls:
+        Upper bound on LLM requests including evaluations and the final
+        answer.
+    max_tokens:
+        Upper bound on prompt plus completion tokens, counted locally.
+    """
+
+    prune_below: Optional[float] = None
+    stop_score: Optional[float] = None
+    max_llm_calls: Optional[int] = None
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def for_level(cls, level: str) -> "SearchPolicy":
+        """Return the policy of a ``TOT_LEVELS`` preset."""
+        return cls(**TOT_BUDGETS[level.upper()])
+
+
+class SearchBudget:
+    """Thread-safe accounting of the calls and tokens spent in one search."""
+
+    def __init__(self, policy: SearchPolicy) -> None:
+        self.policy = policy
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def charge(self, prompt: str, output: str = "", calls: int = 1) -> None:
+        tokens = count_tokens(prompt) + count_tokens(output)
+        with self._lock:
+            self.calls += calls
+            self.tokens += tokens
+
+    def calls_left(self) -> Optional[int]:
+        if self.policy.max_llm_calls is None:
+            return None
+        return self.policy.max_llm_calls - self.calls
+
+    def tokens_left(self) -> Optional[int]:
+        if self.policy.max_tokens is None:
+            return None
+        return self.policy.max_tokens - self.tokens
+
+
+@dataclass(eq=False)
+class ThoughtNode:
+    """A thought path in the search tree.
+
+    ``history`` holds the thoughts from the root joined by newlines and
+    ``score`` the evaluation of that path. ``visits`` and ``value`` are the
+    visit count and summed reward used by Monte Carlo tree search.
+    """
+
+    history: str = ""
+    score: float = 0.0
+    parent: Optional["ThoughtNode"] = field(default=None, repr=False)
+    children: List["ThoughtNode"] = field(default_factory=list, repr=False)
+    depth: int = 0
+    expanded: bool = False
+    visits: int = 0
+    value: float = 0.0
+
+    def child(self, thought: str) -> "ThoughtNode":
+        """Return the path extended by ``thought``, without attaching it."""
+        history = (self.history + "\n" + thought) if self.history else thought
+        return ThoughtNode(history, parent=self, depth=self.depth + 1)
+
+    def mean(self) -> float:
+        return self.value / self.visits if self.visits else self.score
+
+    def ucb(self, exploration: float) -> float:
+        """Upper confidence bound used to pick a child to descend into."""
+        if not self.visits:
+            return math.inf
+        parent_visits = self.parent.visits if self.parent is not None else self.visits
+        return self.mean() + exploration * math.sqrt(
+            math.log(max(parent_visits, 1)) / self.visits
+        )
+
+    def backpropagate(self, reward: float) -> None:
+        node: Optional[ThoughtNode] = self
+        while node is not None:
+            node.visits += 1
+            node.value += reward
+            node = node.parent
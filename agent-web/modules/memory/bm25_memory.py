@@ -0,0 +1,70 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Dict
+import heapq
+import math
+
+from .conversation_memory import MessageMemory
+from .tokenizer import tokenize
+
+
+@dataclass
+class BM25Memory(MessageMemory):
+    """Conversation memory ranked with Okapi BM25.
+
+    Term frequencies per message and message lengths are recorded when a
+    message is added, so scoring a query only touches the postings of its
+    terms. Japanese text is split into character bigrams by
+    :func:`tokenize` and needs no external segmenter.
+
+    Parameters
+    ----------
+    k1:
+        Term frequency saturation.
+    b:
+        Strength of the document length normalisation.
+    """
+
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    k1: float = 1.5
+    b: float = 0.75
+    _postings: Dict[str, Dict[int, int]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _lengths: List[int] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+    _total_length: int = field(default=0, init=False, repr=False, compare=False)
+
+    def _index_message(self, i: int, message: Dict[str, str]) -> None:
+        terms = tokenize(message["content"])
+        for term, tf in Counter(terms).items():
+            self._postings.setdefault(term, {})[i] = tf
+        self._lengths.append(len(terms))
+        self._total_length += len(terms)
+
+    def _reset_index(self) -> None:
+        self._postings.clear()
+        self._lengths.clear()
+        self._total_length = 0
+
+    def search(self, query: str, top_k: int = 3) -> List[str]:
+        """Return the contents of the best scoring messages."""
+        self._sync_index()
+        n = len(self._lengths)
+        if not n:
+            return []
+        avgdl = self._total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        # Newer messages win ties
+        best = heapq.nlargest(top_k, scores, key=lambda i: (scores[i], i))
+        return [self.messages[i]["content"] for i in best]
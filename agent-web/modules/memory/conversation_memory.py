@@ -1,8 +1,13 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Protocol
+from typing import List, Dict, Optional, Protocol
 import json
 import os
 
+from .journal import MessageJournal
+
+# Length of the character n-grams indexed by ConversationMemory
+_NGRAM = 2
+
 
 class BaseMemory(Protocol):
     """Protocol for memory implementations."""
@@ -27,43 +32,183 @@ class BaseMemory(Protocol):
 
 @dataclass
 class MessageMemory:
-    """Common message storage with persistence helpers."""
+    """Common message storage with persistence helpers.
+
+    Paths ending in ``.jsonl`` are stored in the append-only format of
+    :class:`MessageJournal`. After :meth:`open_journal` every ``add`` is
+    persisted immediately as one line instead of rewriting the whole file.
+    """
 
     messages: List[Dict[str, str]] = field(default_factory=list)
+    journal: Optional[MessageJournal] = field(default=None, repr=False, compare=False)
+    _indexed: int = field(default=0, init=False, repr=False, compare=False)
+    _indexed_list: Optional[list] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self._sync_index()
 
     def add(self, role: str, content: str) -> None:
         """Add a message to memory."""
-        self.messages.append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        self._sync_index()
+        if self.journal is not None:
+            self.journal.append(message)
+            self._maybe_compact()
+
+    def open_journal(self, path: str, **options) -> None:
+        """Persist all further changes to the journal at ``path``.
+
+        An existing journal replaces the current messages; otherwise it is
+        created from them. ``options`` are passed to :class:`MessageJournal`.
+        """
+        self.close_journal()
+        journal = MessageJournal(path, **options)
+        if os.path.exists(journal.path):
+            self.messages = journal.read()
+            self._sync_index()
+        else:
+            journal.compact(self.messages)
+        self.journal = journal
+        self._maybe_compact()
+
+    def close_journal(self) -> None:
+        """Detach and close the journal opened by :meth:`open_journal`."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def _maybe_compact(self) -> None:
+        if self.journal.needs_compaction:
+            self.journal.compact(self.messages)
+
+    def _sync_index(self) -> None:
+        """Index messages appended since the last call.
+
+        ``messages`` is a public list and may be replaced or edited directly,
+        so the index is rebuilt from scratch whenever the list was swapped
+        out or shrank.
+        """
+        if self._indexed_list is not self.messages or self._indexed > len(self.messages):
+            self._reset_index()
+            self._indexed = 0
+            self._indexed_list = self.messages
+        for i in range(self._indexed, len(self.messages)):
+            self._index_message(i, self.messages[i])
+        self._indexed = len(self.messages)
+
+    def _index_message(self, i: int, message: Dict[str, str]) -> None:
+        """Hook for subclasses maintaining a search index."""
+
+    def _reset_index(self) -> None:
+        """Hook for subclasses to drop their search index."""
+
+    def _save_index(self, path: str) -> None:
+        """Hook for subclasses to persist their index next to ``path``."""
+
+    def _load_index(self, path: str) -> bool:
+        """Hook for subclasses to restore a persisted index.
+
+        Return ``True`` only if the index covers all loaded messages.
+        """
+        return False
 
     def save(self, path: str) -> None:
-        """Persist messages to a JSON file."""
-        directory = os.path.dirname(path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"messages": self.messages}, f, ensure_ascii=False, indent=2)
+        """Persist messages to a JSON or JSON Lines file."""
+        if str(path).endswith(".jsonl"):
+            journal = self.journal
+            if journal is None or journal.path != str(path):
+                journal = MessageJournal(path)
+            journal.compact(self.messages)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"messages": self.messages}, f, ensure_ascii=False, indent=2)
+        self._save_index(path)
 
     def load(self, path: str) -> None:
-        """Load messages from a JSON file."""
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        self.messages = data.get("messages", [])
+        """Load messages from a JSON or JSON Lines file.
+
+        An open journal is rewritten to hold the loaded messages, so later
+        changes keep being persisted on top of them.
+        """
+        if str(path).endswith(".jsonl"):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            self.messages = MessageJournal(path).read()
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.messages = data.get("messages", [])
+        self._reset_index()
+        self._indexed = 0
+        if self._load_index(path):
+            self._indexed = len(self.messages)
+        self._indexed_list = self.messages
+        self._sync_index()
+        if self.journal is not None:
+            self.journal.compact(self.messages)
 
     def clear(self) -> None:
         """Remove all stored messages."""
         self.messages.clear()
+        self._reset_index()
+        self._indexed = 0
+        if self.journal is not None:
+            self.journal.mark_clear()
+            self._maybe_compact()
 
 
 @dataclass
 class ConversationMemory(MessageMemory):
-    """Simple in-memory store for conversation messages."""
+    """Simple in-memory store for conversation messages.
+
+    Lowercased contents and an inverted index of character bigrams are
+    maintained as messages are added. A search only verifies the messages
+    listed under the rarest bigram of the query instead of scanning and
+    re-lowercasing the whole history. Character n-grams need no word
+    segmentation, so Japanese text is indexed as well as English.
+    """
+
+    _lowered: List[str] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+    _grams: Dict[str, List[int]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def _index_message(self, i: int, message: Dict[str, str]) -> None:
+        text = message["content"].lower()
+        self._lowered.append(text)
+        for gram in {text[j:j + _NGRAM] for j in range(len(text) - _NGRAM + 1)}:
+            self._grams.setdefault(gram, []).append(i)
+
+    def _reset_index(self) -> None:
+        self._lowered.clear()
+        self._grams.clear()
 
     def search(self, query: str, top_k: int = 3) -> List[str]:
         """Return messages containing the query text."""
+        self._sync_index()
         query_lower = query.lower()
-        results = [
-            m["content"]
-            for m in self.messages
-            if query_lower in m["content"].lower()
-        ]
+        if len(query_lower) < _NGRAM:
+            candidates = range(len(self._lowered))
+        else:
+            candidates = min(
+                (
+                    self._grams.get(query_lower[j:j + _NGRAM], [])
+                    for j in range(len(query_lower) - _NGRAM + 1)
+                ),
+                key=len,
+            )
+        results = []
+        for i in candidates:
+            if query_lower in self._lowered[i]:
+                results.append(self.messages[i]["content"])
+                if 0 < top_k <= len(results):
+                    break
         return results[:top_k]
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+import zlib
+
+import numpy as np
+
+from .conversation_memory import MessageMemory
+from .index_store import load_index, save_index
+from .tokenizer import tokenize
+
+_INITIAL_CAPACITY = 64
+
+
+class HashingEmbedder:
+    """Offline embedding function based on the hashing trick.
+
+    Terms produced by :func:`tokenize` are hashed into ``dim`` buckets with a
+    sign bit to reduce collision bias. No model or network access is needed.
+    """
+
+    def __init__(self, dim: int = 128) -> None:
+        self.dim = dim
+
+    def __call__(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for term in tokenize(text):
+            h = zlib.crc32(term.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vec
+
+
+def _normalize(vec: Sequence[float]) -> np.ndarray:
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm else arr
+
+
+@dataclass
+class EmbeddingMemory(MessageMemory):
+    """Conversation memory searched by cosine similarity of dense embeddings.
+
+    All message vectors live in one contiguous float32 matrix whose capacity
+    doubles when full. Vectors are normalised on insertion so a search is a
+    single matrix-vector product followed by ``np.argpartition``.
+
+    ``save`` writes the matrix to a ``.npy`` sidecar which ``load`` maps
+    read-only, so restarting does not re-embed the history. The mapped
+    matrix is only copied into RAM when the next message is added.
+
+    Parameters
+    ----------
+    embed:
+        Callable turning a text into a vector. Defaults to
+        :class:`HashingEmbedder`.
+    """
+
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    embed: Callable[[str], Sequence[float]] = field(
+        default_factory=HashingEmbedder, repr=False, compare=False
+    )
+    _matrix: Optional[np.ndarray] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _size: int = field(default=0, init=False, repr=False, compare=False)
+
+    def _index_message(self, i: int, message: Dict[str, str]) -> None:
+        vec = _normalize(self.embed(message["content"]))
+        if self._matrix is None:
+            self._matrix = np.zeros((_INITIAL_CAPACITY, vec.shape[0]), dtype=np.float32)
+        elif self._size == self._matrix.shape[0]:
+            grown = np.zeros((self._size * 2, self._matrix.shape[1]), dtype=np.float32)
+            grown[: self._size] = self._matrix[: self._size]
+            self._matrix = grown
+        self._matrix[self._size] = vec
+        self._size += 1
+
+    def _reset_index(self) -> None:
+        self._matrix = None
+        self._size = 0
+
+    def _embedder_name(self) -> str:
+        return f"{type(self.embed).__name__}:{getattr(self.embed, 'dim', '')}"
+
+    def _save_index(self, path: str) -> None:
+        self._sync_index()
+        if isinstance(self._matrix, np.memmap):
+            # Release the mapping before its file is replaced
+            self._matrix = np.array(self._matrix)
+        dim = self._matrix.shape[1] if self._matrix is not None else 0
+        vectors = (
+            self._matrix[: self._size]
+            if self._matrix is not None
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        save_index(
+            path,
+            self.messages,
+            {"vectors": vectors},
+            {"kind": "embedding", "count": self._size, "embedder": self._embedder_name()},
+        )
+
+    def _load_index(self, path: str) -> bool:
+        loaded = load_index(path, self.messages)
+        if loaded is None:
+            return False
+        arrays, meta = loaded
+        vectors = arrays.get("vectors")
+        if (
+            meta.get("kind") != "embedding"
+            or meta.get("embedder") != self._embedder_name()
+            or vectors is None
+            or vectors.shape[0] != len(self.messages)
+        ):
+            return False
+        if vectors.shape[0]:
+            self._matrix = vectors
+            self._size = vectors.shape[0]
+        return True
+
+    def search(self, query: str, top_k: int = 3) -> List[str]:
+        """Return the contents of the messages closest to the query."""
+        self._sync_index()
+        if not self._size or top_k <= 0:
+            return []
+        scores = self._matrix[: self._size] @ _normalize(self.embed(query))
+        k = min(top_k, self._size)
+        if k < self._size:
+            idx = np.argpartition(scores, self._size - k)[self._size - k:]
+        else:
+            idx = np.arange(self._size)
+        idx = idx[np.argsort(scores[idx])[::-1]]
+        return [self.messages[i]["content"] for i in idx if scores[i] > 0]
@@ -0,0 +1,91 @@
+"""Sidecar files for persisted memory indexes.
+
+An index saved next to ``conv.json`` consists of ``conv.json.index.json``
+holding compact metadata and one ``conv.json.<name>.npy`` file per array.
+Arrays are opened with ``mmap_mode="r"`` on load, so restoring even a very
+large index only maps the files instead of reading them into RAM. The
+messages themselves are still parsed from the conversation file; what a
+saved index spares is tokenizing or embedding every one of them again.
+
+A mapped file cannot be replaced on Windows, so indexes copy mapped arrays
+into RAM before they are saved over the files they came from.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _array_path(path: str, name: str) -> str:
+    return f"{path}.{name}.npy"
+
+
+def _meta_path(path: str) -> str:
+    return f"{path}.index.json"
+
+
+def _fingerprint(messages: List[Dict[str, str]]) -> str:
+    """Digest of all messages, used to detect an index saved for others."""
+    digest = hashlib.blake2b(digest_size=16)
+    for message in messages:
+        digest.update(message.get("role", "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(message.get("content", "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def save_index(
+    path: str,
+    messages: List[Dict[str, str]],
+    arrays: Dict[str, np.ndarray],
+    meta: Dict[str, Any],
+) -> None:
+    """Write the index of ``messages`` as sidecars of ``path``.
+
+    Every file is written to a temporary name first and the metadata is
+    replaced last, so an interrupted save never pairs new metadata with
+    old arrays.
+    """
+    for name, arr in arrays.items():
+        target = _array_path(path, name)
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(tmp, target)
+    meta = dict(meta, arrays=sorted(arrays), fingerprint=_fingerprint(messages))
+    target = _meta_path(path)
+    tmp = target + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, target)
+
+
+def load_index(
+    path: str, messages: List[Dict[str, str]]
+) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """Memory-map the index of ``messages`` saved next to ``path``.
+
+    Returns ``None`` when no complete index is present or it was saved for
+    a different list of messages.
+    """
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != _fingerprint(messages):
+            logger.debug("Index for %s is stale", path)
+            return None
+        arrays = {
+            name: np.load(_array_path(path, name), mmap_mode="r")
+            for name in meta.get("arrays", [])
+        }
+    except (OSError, ValueError) as exc:
+        logger.debug("No usable index for %s: %s", path, exc)
+        return None
+    return arrays, meta
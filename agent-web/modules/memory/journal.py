@@ -0,0 +1,188 @@
+"""Append-only JSON Lines storage for memory messages."""
+
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+# Obsolete records tolerated before ``compact_ratio`` is applied, so short
+# journals are not rewritten after every clear
+MIN_OBSOLETE = 100
+
+
+class MessageJournal:
+    """Append-only log with one compact JSON object per line.
+
+    Adding a message writes a single line, so persisting a turn costs only
+    the size of that message. ``clear`` is recorded as an ``{"op": "clear"}``
+    marker instead of truncating the file, and metadata as an
+    ``{"op": "meta"}`` record whose latest copy wins. Records made obsolete
+    this way are dropped by :meth:`compact`, which rewrites the file
+    atomically. Owners call it when :attr:`needs_compaction` is set: once
+    ``compact_every`` obsolete records have accumulated, or once they
+    outnumber the live ones by ``compact_ratio``.
+
+    Parameters
+    ----------
+    path:
+        Location of the ``.jsonl`` file.
+    fsync:
+        ``"always"`` to fsync after every record, ``"interval"`` to fsync
+        at most every ``fsync_interval`` seconds or ``"never"`` to leave
+        flushing to the operating system.
+    compact_every:
+        Number of obsolete records that triggers a compaction. ``0``
+        disables this trigger.
+    compact_ratio:
+        Obsolete records per live record that trigger a compaction once
+        more than ``MIN_OBSOLETE`` of them exist. ``0`` disables this
+        trigger.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        fsync: str = "never",
+        fsync_interval: float = 1.0,
+        compact_every: int = 1000,
+        compact_ratio: float = 1.0,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = str(path)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.compact_ratio = compact_ratio
+        self.meta: Dict[str, Any] = {}
+        self._file = None
+        self._last_sync = 0.0
+        self._live = 0
+        self._obsolete = 0
+        self._torn = False
+
+    @staticmethod
+    def _records(path: str) -> Iterator[Optional[Dict]]:
+        """Yield decoded lines, or ``None`` for a line that cannot be parsed."""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Stream the journal and return the live messages.
+
+        Messages are returned with all their keys. The latest metadata is
+        left in :attr:`meta`.
+        """
+        messages: List[Dict[str, Any]] = []
+        self.meta = {}
+        self._obsolete = 0
+        self._torn = False
+        if not os.path.exists(self.path):
+            self._live = 0
+            return messages
+        for record in self._records(self.path):
+            if record is None:
+                # Usually the tail of a write interrupted by a crash
+                logger.warning("Skipping unreadable record in %s", self.path)
+                self._torn = True
+            elif record.get("op") == "clear":
+                self._obsolete += len(messages) + 1
+                messages = []
+            elif record.get("op") == "meta":
+                if self.meta:
+                    self._obsolete += 1
+                self.meta = record.get("data", {})
+            else:
+                messages.append(record)
+        self._live = len(messages)
+        return messages
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _write(self, record: Dict) -> None:
+        f = self._open()
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        if self.fsync == "always":
+            os.fsync(f.fileno())
+        elif self.fsync == "interval":
+            now = time.monotonic()
+            if now - self._last_sync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_sync = now
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """Append one message."""
+        self._write(message)
+        self._live += 1
+
+    def write_meta(self, meta: Dict[str, Any]) -> None:
+        """Record ``meta``, replacing the previously written metadata."""
+        self._write({"op": "meta", "data": meta})
+        if self.meta:
+            self._obsolete += 1
+        self.meta = dict(meta)
+
+    def mark_clear(self) -> None:
+        """Record that all previous messages were removed."""
+        self._write({"op": "clear"})
+        self._obsolete += self._live + 1
+        self._live = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        if self._torn:
+            return True
+        if self.compact_every > 0 and self._obsolete >= self.compact_every:
+            return True
+        return (
+            self.compact_ratio > 0
+            and self._obsolete > MIN_OBSOLETE
+            and self._obsolete > self.compact_ratio * self._live
+        )
+
+    def compact(self, messages: List[Dict[str, Any]]) -> None:
+        """Atomically rewrite the journal so it holds only ``messages``.
+
+        The current :attr:`meta` is kept.
+        """
+        self.close()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if self.meta:
+                record = {"op": "meta", "data": self.meta}
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._live = len(messages)
+        self._obsolete = 0
+        self._torn = False
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,33 @@
+"""Dependency-free tokenization helpers for the memory indexes."""
+
+import re
+from typing import List
+
+# Runs of word characters; CJK runs are split further into bigrams because
+# Japanese text has no spaces between words.
+_WORD_RE = re.compile(r"\w+")
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split ``text`` into lowercase index terms.
+
+    Latin words become single terms while CJK runs are expanded into
+    character bigrams (a lone CJK character is kept as is), so that a query
+    such as ``"天気"`` matches ``"今日は良い天気です"``.
+    """
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text.lower()):
+        pos = 0
+        for m in _CJK_RE.finditer(word):
+            if m.start() > pos:
+                terms.append(word[pos:m.start()])
+            run = m.group(0)
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+            pos = m.end()
+        if pos < len(word):
+            terms.append(word[pos:])
+    return terms
@@ -1,25 +1,227 @@
+from collections import Counter
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import heapq
+import math
 
-from .memory import MessageMemory
+import numpy as np
+
+from .conversation_memory import MessageMemory
+from .index_store import load_index, save_index
+from .tokenizer import tokenize
+
+
+@dataclass
+class _Segment:
+    """Read-only postings in term-major (CSC) layout.
+
+    The postings of term ``t`` are ``docs[indptr[t]:indptr[t + 1]]`` with
+    the matching term frequencies in ``tfs``. The arrays are usually memory
+    maps of a saved index.
+    """
+
+    terms: List[str]
+    indptr: np.ndarray
+    docs: np.ndarray
+    tfs: np.ndarray
+    norms: np.ndarray
+    vocab: Dict[str, int] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.vocab = {t: i for i, t in enumerate(self.terms)}
+
+    @property
+    def size(self) -> int:
+        return len(self.norms)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        t = self.vocab.get(term)
+        if t is None:
+            return None
+        start, end = int(self.indptr[t]), int(self.indptr[t + 1])
+        return self.docs[start:end], self.tfs[start:end]
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 @dataclass
 class VectorMemory(MessageMemory):
-    """Conversation memory backed by a simple vector store using TF-IDF."""
+    """Conversation memory backed by an incremental TF-IDF index.
+
+    Every message is tokenized once when it is added and its term
+    frequencies are stored in an inverted index. ``search`` only tokenizes
+    the query and walks the postings of the query terms, so retrieval cost
+    depends on how often those terms occur rather than on the history length.
+
+    Inverse document frequencies are computed at query time from the current
+    posting lengths. Documents are length-normalised by the norm of their raw
+    term frequencies, which does not change as the corpus grows and therefore
+    never has to be recomputed.
+
+    ``save`` writes the postings as ``.npy`` sidecars plus a compact
+    vocabulary file. ``load`` memory-maps them as a read-only segment and
+    messages added afterwards go to an in-memory segment searched alongside.
+    """
 
     messages: List[Dict[str, str]] = field(default_factory=list)
+    _base: Optional[_Segment] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _postings: Dict[str, Dict[int, int]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _norms: List[float] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+
+    @property
+    def _offset(self) -> int:
+        return self._base.size if self._base is not None else 0
+
+    def _index_message(self, i: int, message: Dict[str, str]) -> None:
+        counts = Counter(tokenize(message["content"]))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[i] = tf
+        self._norms.append(math.sqrt(sum(tf * tf for tf in counts.values())))
+
+    def _reset_index(self) -> None:
+        self._base = None
+        self._postings.clear()
+        self._norms.clear()
+
+    def _idf(self, term: str) -> float:
+        """Smoothed inverse document frequency, as in scikit-learn."""
+        df = len(self._postings.get(term, ()))
+        if self._base is not None:
+            t = self._base.vocab.get(term)
+            if t is not None:
+                df += int(self._base.indptr[t + 1] - self._base.indptr[t])
+        n = self._offset + len(self._norms)
+        return math.log((1 + n) / (1 + df)) + 1.0
+
+    def _merged_segment(self) -> _Segment:
+        """Combine the loaded segment and recent additions into one.
+
+        Only the recent postings are walked in Python. The postings of the
+        loaded segment are merged with NumPy, and every array of the result
+        is a copy in RAM, so none of the mapped files stays in use.
+        """
+        base = self._base
+        terms = list(base.terms) if base is not None else []
+        vocab = dict(base.vocab) if base is not None else {}
+        recent_terms: List[int] = []
+        recent_docs: List[int] = []
+        recent_tfs: List[int] = []
+        for term, postings in self._postings.items():
+            t = vocab.get(term)
+            if t is None:
+                t = vocab[term] = len(terms)
+                terms.append(term)
+            recent_terms.extend([t] * len(postings))
+            recent_docs.extend(postings.keys())
+            recent_tfs.extend(postings.values())
+        if base is not None:
+            counts = np.diff(np.asarray(base.indptr))
+            term_ids = np.concatenate([
+                np.repeat(np.arange(len(base.terms), dtype=np.int64), counts),
+                np.asarray(recent_terms, dtype=np.int64),
+            ])
+            docs = np.concatenate([
+                np.asarray(base.docs, dtype=np.int32),
+                np.asarray(recent_docs, dtype=np.int32),
+            ])
+            tfs = np.concatenate([
+                np.asarray(base.tfs, dtype=np.float32),
+                np.asarray(recent_tfs, dtype=np.float32),
+            ])
+            norms = np.concatenate([
+                np.asarray(base.norms, dtype=np.float32),
+                np.asarray(self._norms, dtype=np.float32),
+            ])
+        else:
+            term_ids = np.asarray(recent_terms, dtype=np.int64)
+            docs = np.asarray(recent_docs, dtype=np.int32)
+            tfs = np.asarray(recent_tfs, dtype=np.float32)
+            norms = np.asarray(self._norms, dtype=np.float32)
+        # A stable sort keeps the loaded postings of a term before new ones
+        order = np.argsort(term_ids, kind="stable")
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=indptr[1:])
+        return _Segment(
+            terms=terms,
+            indptr=indptr,
+            docs=docs[order],
+            tfs=tfs[order],
+            norms=norms,
+        )
+
+    def _save_index(self, path: str) -> None:
+        self._sync_index()
+        segment = self._merged_segment()
+        # Keep the compacted segment so later saves only merge new messages
+        self._base = segment
+        self._postings.clear()
+        self._norms.clear()
+        save_index(
+            path,
+            self.messages,
+            {
+                "indptr": segment.indptr,
+                "docs": segment.docs,
+                "tfs": segment.tfs,
+                "norms": segment.norms,
+            },
+            {"kind": "tfidf", "count": segment.size, "vocab": segment.terms},
+        )
+
+    def _load_index(self, path: str) -> bool:
+        loaded = load_index(path, self.messages)
+        if loaded is None:
+            return False
+        arrays, meta = loaded
+        if meta.get("kind") != "tfidf" or meta.get("count") != len(self.messages):
+            return False
+        try:
+            self._base = _Segment(
+                terms=meta["vocab"],
+                indptr=arrays["indptr"],
+                docs=arrays["docs"],
+                tfs=arrays["tfs"],
+                norms=arrays["norms"],
+            )
+        except KeyError:
+            return False
+        return True
 
     def search(self, query: str, top_k: int = 3) -> List[str]:
         """Return the contents of the messages most similar to the query."""
-        corpus = [m["content"] for m in self.messages]
-        if not corpus:
+        self._sync_index()
+        if top_k <= 0:
             return []
-        vectorizer = TfidfVectorizer()
-        vectors = vectorizer.fit_transform(corpus + [query])
-        sims = cosine_similarity(vectors[-1], vectors[:-1]).flatten()
-        indices = sims.argsort()[::-1][:top_k]
-        return [corpus[i] for i in indices]
-
+        offset = self._offset
+        scores: Dict[int, float] = {}
+        base_docs: List[np.ndarray] = []
+        base_vals: List[np.ndarray] = []
+        for term, qtf in Counter(tokenize(query)).items():
+            idf = self._idf(term)
+            weight = qtf * idf * idf
+            if self._base is not None:
+                hit = self._base.postings(term)
+                if hit is not None:
+                    base_docs.append(hit[0])
+                    base_vals.append(hit[1] * weight)
+            for i, tf in self._postings.get(term, {}).items():
+                scores[i] = scores.get(i, 0.0) + weight * tf
+        for i in scores:
+            scores[i] /= self._norms[i - offset]
+        if base_docs:
+            docs, inverse = np.unique(np.concatenate(base_docs), return_inverse=True)
+            sums = np.bincount(inverse, weights=np.concatenate(base_vals))
+            sums /= self._base.norms[docs]
+            if len(docs) > top_k:
+                keep = np.argpartition(sums, len(docs) - top_k)[len(docs) - top_k:]
+            else:
+                keep = np.arange(len(docs))
+            for j in keep:
+                scores[int(docs[j])] = float(sums[j])
+        # Newer messages win ties
+        best = heapq.nlargest(top_k, scores, key=lambda i: (scores[i], i))
+        return [self.messages[i]["content"] for i in best]
@@ -3,7 +3,9 @@ from .web_scraper import get_tool as get_web_scraper
 from .sqlite_tool import get_tool as get_sqlite_tool
 from .mermaid_tool import get_tool as get_mermaid_tool
 from .graphviz_tool import get_tool as get_graphviz_tool
-from .base import Tool, execute_tool
+from .base import Tool, call_tool, execute_tool, tool_schema
+from .harness import Isolation, ToolResult
+from .executor import ToolExecutor
 
 # Map the new tool names from the UI to the old tool creation functions
 TOOL_MAPPING = {
@@ -27,4 +29,9 @@ __all__ = [
     "get_tools_by_name",
     "Tool",
     "execute_tool",
+    "call_tool",
+    "ToolResult",
+    "Isolation",
+    "tool_schema",
+    "ToolExecutor",
 ]
@@ -1,34 +1,122 @@
 from dataclasses import dataclass, asdict, is_dataclass
-from typing import Callable, Type
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Type
+import copy
+import threading
 
 from pydantic import BaseModel
 
+from .harness import Isolation, ToolResult, run_tool
+
 
 @dataclass
 class Tool:
-    """Simple container for tool definitions."""
+    """Simple container for tool definitions.
+
+    ``max_concurrency`` caps how many calls of the tool a
+    :class:`~modules.tools.executor.ToolExecutor` runs at once. It only
+    has an effect below the executor's ``max_workers``: tools that keep a
+    core busy are held under the number of cores, and tools calling a
+    remote service under what that service tolerates. ``timeout``
+    is a wall-clock limit in seconds and ``isolation`` runs the tool in a
+    child process with resource limits (see :mod:`modules.tools.harness`).
+    """
 
     name: str
     description: str
     func: Callable
     args_schema: Type[BaseModel]
+    max_concurrency: Optional[int] = None
+    timeout: Optional[float] = None
+    isolation: Optional[Isolation] = None
+
+
+def _strip_titles(schema: Any) -> Any:
+    """Drop the ``title`` entries pydantic adds, which only cost tokens."""
+    if isinstance(schema, dict):
+        return {
+            k: _strip_titles(v)
+            for k, v in schema.items()
+            if not (k == "title" and isinstance(v, str))
+        }
+    if isinstance(schema, list):
+        return [_strip_titles(v) for v in schema]
+    return schema
+
+
+@lru_cache(maxsize=None)
+def _parameters(args_schema: type) -> Dict[str, Any]:
+    if hasattr(args_schema, "model_json_schema"):
+        schema = args_schema.model_json_schema()
+    elif hasattr(args_schema, "schema"):
+        schema = args_schema.schema()
+    else:
+        schema = {"type": "object", "properties": {}}
+    return _strip_titles(schema)
+
+
+def tool_schema(tool: Tool) -> Dict[str, Any]:
+    """Describe ``tool`` in the OpenAI function calling format.
+
+    The parameters are derived from ``tool.args_schema``.
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": copy.deepcopy(_parameters(tool.args_schema)),
+        },
+    }
 
 
-def execute_tool(name: str, args: dict, tools: dict):
+def _parse_args(tool: Tool, args: dict) -> Dict[str, Any]:
+    parsed = tool.args_schema(**args)
+    dump = getattr(parsed, "model_dump", None)
+    if callable(dump):
+        return dump()
+    if hasattr(parsed, "dict") and callable(getattr(parsed, "dict")):
+        return parsed.dict()
+    if is_dataclass(parsed):
+        return asdict(parsed)
+    return parsed.__dict__
+
+
+def call_tool(
+    name: str,
+    args: dict,
+    tools: dict,
+    *,
+    timeout: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> ToolResult:
+    """Validate ``args`` and run the tool, returning a structured result."""
     tool = tools.get(name)
     if not tool:
-        return f"Unknown tool: {name}"
+        return ToolResult(name, error=f"Unknown tool: {name}")
     try:
-        parsed = tool.args_schema(**args)
+        data = _parse_args(tool, args)
     except Exception as e:
-        return f"Invalid arguments for {name}: {e}"
-    dump = getattr(parsed, "model_dump", None)
-    if callable(dump):
-        data = dump()
-    elif hasattr(parsed, "dict") and callable(getattr(parsed, "dict")):
-        data = parsed.dict()
-    elif is_dataclass(parsed):
-        data = asdict(parsed)
-    else:
-        data = parsed.__dict__
-    return tool.func(**data)
+        return ToolResult(name, error=f"Invalid arguments for {name}: {e}")
+    return run_tool(tool, data, timeout=timeout, cancel=cancel)
+
+
+def execute_tool(
+    name: str,
+    args: dict,
+    tools: dict,
+    *,
+    timeout: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+):
+    """Run a tool and return its output.
+
+    An exception raised by the tool propagates as before. Unknown tools,
+    invalid arguments, timeouts, cancellation and failures of isolated
+    tools are returned as an error message. Use :func:`call_tool` for a
+    structured result instead.
+    """
+    result = call_tool(name, args, tools, timeout=timeout, cancel=cancel)
+    if result.exception is not None:
+        raise result.exception
+    return result.output if result.ok else result.error
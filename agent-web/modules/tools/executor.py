@@ -0,0 +1,115 @@
+"""Concurrent execution of the tool calls of one model turn."""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import threading
+
+from .base import Tool, execute_tool
+
+logger = logging.getLogger(__name__)
+
+# Tool name and the arguments handed to ``execute``
+ToolCall = Tuple[str, Any]
+
+
+class ToolExecutor:
+    """Run independent tool calls in a bounded thread pool.
+
+    Results are returned in the order of the calls regardless of which
+    finishes first. A call that raises produces a ``Tool execution failed``
+    message instead of aborting the other calls.
+
+    Parameters
+    ----------
+    execute:
+        Function running one call given the tool name and its arguments.
+    max_workers:
+        Size of the pool shared by all tools.
+    limits:
+        Maximum number of concurrent calls per tool name.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[str, Any], Any],
+        *,
+        max_workers: int = 4,
+        limits: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.execute = execute
+        self.max_workers = max_workers
+        self._semaphores = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in (limits or {}).items()
+        }
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_tools(
+        cls, tools: Iterable[Tool], *, timeout: Optional[float] = None, **kwargs
+    ) -> "ToolExecutor":
+        """Executor for :class:`Tool` objects honouring their ``max_concurrency``.
+
+        ``timeout`` applies to tools without a timeout of their own.
+        """
+        tools = {t.name: t for t in tools}
+        limits = {
+            t.name: t.max_concurrency for t in tools.values() if t.max_concurrency
+        }
+        limits.update(kwargs.pop("limits", None) or {})
+        return cls(partial(_execute, tools, timeout), limits=limits, **kwargs)
+
+    def _call(self, name: str, args: Any) -> Any:
+        semaphore = self._semaphores.get(name)
+        try:
+            if semaphore is None:
+                return self.execute(name, args)
+            with semaphore:
+                return self.execute(name, args)
+        except Exception as exc:
+            logger.exception("Tool %s failed", name)
+            return f"Tool execution failed: {exc}"
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="tool"
+                )
+            return self._pool
+
+    def run(self, calls: Sequence[ToolCall]) -> List[Any]:
+        """Execute ``calls`` and return their results in order."""
+        if len(calls) < 2 or self.max_workers < 2:
+            return [self._call(name, args) for name, args in calls]
+        pool = self._get_pool()
+        futures = [pool.submit(self._call, name, args) for name, args in calls]
+        return [f.result() for f in futures]
+
+    async def arun(self, calls: Sequence[ToolCall]) -> List[Any]:
+        """Async variant of :meth:`run` using the same pool."""
+        if not calls:
+            return []
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        return list(
+            await asyncio.gather(
+                *(loop.run_in_executor(pool, self._call, name, args) for name, args in calls)
+            )
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+def _execute(
+    tools: Dict[str, Tool], timeout: Optional[float], name: str, args: Dict[str, Any]
+) -> Any:
+    return execute_tool(name, args, tools, timeout=timeout)
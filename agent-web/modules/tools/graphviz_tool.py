@@ -4,6 +4,7 @@ from graphviz import Source
 import subprocess
 from pydantic import BaseModel, Field
 from .base import Tool
+from .harness import Isolation
 
 class GraphvizInput(BaseModel):
     code: str = Field(description="DOT言語のコード")
@@ -36,4 +37,9 @@ def get_tool() -> Tool:
         description="DOT言語から図を生成する。フローチャート等に適している。",
         func=create_graphviz_diagram,
         args_schema=GraphvizInput,
+        # Each call runs a local dot process that keeps a core busy
+        max_concurrency=min(2, os.cpu_count() or 1),
+        # A pathological graph can make dot run away with CPU and memory
+        timeout=60.0,
+        isolation=Isolation(memory_mb=1024, cpu_seconds=60),
     )
@@ -0,0 +1,236 @@
+"""Guarded execution of tool functions.
+
+:func:`run_tool` enforces a wall-clock timeout and supports cancellation.
+A tool with :class:`Isolation` runs in a separate process under memory and
+CPU rlimits, where a runaway call can be killed. Every call produces a
+:class:`ToolResult` with its timing, and no exception escapes.
+
+Functions that accept a ``cancel`` keyword receive a
+:class:`threading.Event`. It is set when the call times out or is
+cancelled, so long loops can stop cooperatively. A thread cannot be killed,
+so a function that ignores the event keeps running in the background after
+its result has been abandoned.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+import inspect
+import logging
+import multiprocessing
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+if TYPE_CHECKING:
+    from .base import Tool
+
+logger = logging.getLogger(__name__)
+
+# How often waiting calls check for cancellation
+_POLL_INTERVAL = 0.05
+
+
+@dataclass(frozen=True)
+class Isolation:
+    """Run a tool in a child process with resource limits.
+
+    Parameters
+    ----------
+    memory_mb:
+        Address space limit of the child process.
+    cpu_seconds:
+        CPU time after which the child is killed by the OS.
+    """
+
+    memory_mb: Optional[int] = 512
+    cpu_seconds: Optional[int] = 30
+
+
+@dataclass
+class ToolResult:
+    """Outcome of one tool call.
+
+    ``exception`` is what the tool raised when it ran in this process.
+    """
+
+    name: str
+    output: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    timed_out: bool = False
+    cancelled: bool = False
+    exception: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def text(self) -> str:
+        """The output, or the error message of a failed call."""
+        return str(self.output) if self.ok else self.error
+
+
+def _accepts_cancel(func: Callable) -> bool:
+    try:
+        return "cancel" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _apply_rlimits(isolation: Isolation) -> None:
+    if resource is None:
+        return
+    if isolation.memory_mb is not None:
+        size = isolation.memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    if isolation.cpu_seconds is not None:
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (isolation.cpu_seconds, isolation.cpu_seconds)
+        )
+
+
+def _child_main(conn, func: Callable, kwargs: Dict[str, Any], isolation: Isolation) -> None:
+    try:
+        _apply_rlimits(isolation)
+        conn.send((True, func(**kwargs)))
+    except BaseException as exc:
+        conn.send((False, f"{type(exc).__name__}: {exc}"))
+    finally:
+        conn.close()
+
+
+def _stopped(
+    deadline: Optional[float], cancel: Optional[threading.Event]
+) -> Optional[str]:
+    """Return ``"timeout"`` or ``"cancel"`` once waiting should end."""
+    if cancel is not None and cancel.is_set():
+        return "cancel"
+    if deadline is not None and time.monotonic() >= deadline:
+        return "timeout"
+    return None
+
+
+def _wait_slice(deadline: Optional[float]) -> float:
+    if deadline is None:
+        return _POLL_INTERVAL
+    return max(0.0, min(_POLL_INTERVAL, deadline - time.monotonic()))
+
+
+def _run_isolated(
+    func: Callable,
+    kwargs: Dict[str, Any],
+    isolation: Isolation,
+    deadline: Optional[float],
+    cancel: Optional[threading.Event],
+):
+    """Return ``(ok, value)`` or ``(None, reason)`` when the child was killed."""
+    # spawn avoids inheriting locks held by other threads of this process
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_child_main, args=(sender, func, kwargs, isolation), daemon=True
+    )
+    proc.start()
+    sender.close()
+    try:
+        while True:
+            if receiver.poll(_wait_slice(deadline)):
+                try:
+                    return receiver.recv()
+                except EOFError:
+                    return False, f"process exited with code {proc.exitcode}"
+            if not proc.is_alive() and not receiver.poll():
+                proc.join()
+                return False, f"process exited with code {proc.exitcode}"
+            reason = _stopped(deadline, cancel)
+            if reason is not None:
+                return None, reason
+    finally:
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+        receiver.close()
+
+
+def _run_thread(
+    func: Callable,
+    kwargs: Dict[str, Any],
+    deadline: Optional[float],
+    cancel: Optional[threading.Event],
+    token: threading.Event,
+    name: str,
+):
+    done = threading.Event()
+    box: Dict[str, Any] = {}
+
+    def target() -> None:
+        try:
+            box["value"] = func(**kwargs)
+        except BaseException as exc:
+            box["error"] = exc
+        finally:
+            done.set()
+
+    threading.Thread(target=target, name=f"tool-{name}", daemon=True).start()
+    while not done.wait(_wait_slice(deadline)):
+        reason = _stopped(deadline, cancel)
+        if reason is not None:
+            token.set()
+            return None, reason
+    if "error" in box:
+        return False, box["error"]
+    return True, box.get("value")
+
+
+def run_tool(
+    tool: "Tool",
+    data: Dict[str, Any],
+    *,
+    timeout: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
+) -> ToolResult:
+    """Call ``tool.func`` with validated arguments ``data``.
+
+    ``timeout`` applies when the tool has none of its own. Calls without
+    a timeout, cancellation event or isolation run inline.
+    """
+    timeout = tool.timeout if tool.timeout is not None else timeout
+    start = time.monotonic()
+    deadline = start + timeout if timeout is not None else None
+    kwargs = dict(data)
+    token = threading.Event()
+    if tool.isolation is None and _accepts_cancel(tool.func):
+        kwargs["cancel"] = token
+
+    if tool.isolation is not None:
+        ok, value = _run_isolated(tool.func, kwargs, tool.isolation, deadline, cancel)
+    elif deadline is None and cancel is None:
+        try:
+            ok, value = True, tool.func(**kwargs)
+        except Exception as exc:
+            ok, value = False, exc
+    else:
+        ok, value = _run_thread(tool.func, kwargs, deadline, cancel, token, tool.name)
+
+    result = ToolResult(tool.name, elapsed=time.monotonic() - start)
+    if ok is None:
+        result.timed_out = value == "timeout"
+        result.cancelled = value == "cancel"
+        result.error = (
+            f"Tool {tool.name} timed out after {timeout:g}s"
+            if result.timed_out
+            else f"Tool {tool.name} was cancelled"
+        )
+        logger.warning("%s (%.2fs)", result.error, result.elapsed)
+    elif ok:
+        result.output = value
+    else:
+        result.error = f"Tool execution failed: {value}"
+        if isinstance(value, BaseException):
+            result.exception = value
+        logger.warning("Tool %s failed: %s", tool.name, value)
+    return result
@@ -0,0 +1,260 @@
+"""Streaming text extraction for scraped HTML.
+
+:class:`TextExtractor` is an incremental :class:`html.parser.HTMLParser`.
+It collects the text of the first ``main``, ``article`` and ``body``
+element while the page is tokenized, without building a tree. Text inside
+``script``, ``style``, ``header``, ``footer`` and ``nav`` is skipped as it
+is read, together with any container nested in them. Parsing stops once
+the first ``main`` element has ended, or once ``max_chars`` characters of
+the highest-priority container seen so far have been gathered, so the
+work depends on how much text is kept rather than on the size of the
+page.
+
+The result matches ``BeautifulSoup(...).get_text(" ", strip=True)`` on the
+first of those elements with the skipped tags removed. The one exception
+is a higher-priority container that only starts after ``max_chars``
+characters of a lower one were gathered, such as a ``main`` following a
+long ``article``. Parsing has stopped by then, so it is not considered.
+"""
+
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Tuple
+import codecs
+import re
+
+CONTAINERS = ("main", "article", "body")
+CHUNK_SIZE = 64 * 1024
+# Bytes buffered before the encoding is sniffed from a <meta> tag
+SNIFF_BYTES = 2048
+SKIPPED = frozenset(["script", "style", "header", "footer", "nav"])
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w.:-]+)""", re.IGNORECASE)
+_PARTIAL_WORD = re.compile(r"\S*\Z")
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+class _Enough(Exception):
+    pass
+
+
+def sniff_encoding(head: bytes, content_type: Optional[str] = None) -> str:
+    """Return the encoding of an HTML document.
+
+    A byte order mark wins, then the charset of the ``Content-Type``
+    header, then a ``<meta charset>`` among the first bytes of ``head``.
+    Unknown names are ignored and UTF-8 is assumed otherwise.
+    """
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    candidates = []
+    match = _HEADER_CHARSET.search(content_type or "")
+    if match:
+        candidates.append(match.group(1))
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+class TextExtractor(HTMLParser):
+    """Collect readable text from HTML fed in chunks.
+
+    Parameters
+    ----------
+    max_chars:
+        Characters to collect per element. ``None`` reads the whole page.
+    """
+
+    def __init__(self, max_chars: Optional[int] = None) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.done = False
+        self._skip = 0
+        self._pending: List[str] = []
+        self._parts: Dict[str, List[str]] = {name: [] for name in CONTAINERS}
+        self._sizes: Dict[str, int] = dict.fromkeys(CONTAINERS, 0)
+        self._depth: Dict[str, int] = dict.fromkeys(CONTAINERS, 0)
+        self._state: Dict[str, str] = dict.fromkeys(CONTAINERS, "unseen")
+
+    def feed(self, data: str) -> None:
+        if self.done:
+            return
+        try:
+            super().feed(data)
+        except _Enough:
+            self.done = True
+
+    def close(self) -> None:
+        if not self.done:
+            try:
+                super().close()
+                self._flush()
+            except _Enough:
+                pass
+        self.done = True
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending).strip()
+        self._pending.clear()
+        if not text or self._skip:
+            return
+        for name in CONTAINERS:
+            if self._state[name] != "open":
+                continue
+            size = self._sizes[name]
+            if self.max_chars is not None and size >= self.max_chars:
+                continue
+            self._parts[name].append(text)
+            self._sizes[name] = size + len(text) + (1 if size else 0)
+        if self._settled():
+            raise _Enough
+
+    def _full(self, name: str) -> bool:
+        return self.max_chars is not None and self._sizes[name] >= self.max_chars
+
+    def _settled(self) -> bool:
+        """Return whether the container :meth:`text` would pick is full."""
+        for name in CONTAINERS:
+            if self._state[name] != "unseen":
+                return self._full(name)
+        return False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush()
+        if tag in SKIPPED:
+            self._skip += 1
+        elif tag in self._state and self._state[tag] != "closed" and not self._skip:
+            self._state[tag] = "open"
+            self._depth[tag] += 1
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush()
+
+    # Comments, declarations and processing instructions separate text nodes
+    def handle_comment(self, data: str) -> None:
+        self._flush()
+
+    def handle_decl(self, decl: str) -> None:
+        self._flush()
+
+    def handle_pi(self, data: str) -> None:
+        self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush()
+        if tag in SKIPPED:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self._state and self._state[tag] == "open" and not self._skip:
+            self._depth[tag] -= 1
+            if self._depth[tag] == 0:
+                self._state[tag] = "closed"
+                if tag == "main":
+                    raise _Enough
+
+    def handle_data(self, data: str) -> None:
+        # A text node can arrive in pieces when it spans two chunks
+        self._pending.append(data)
+
+    def text(self) -> Optional[str]:
+        """Return the text of the first container found, or ``None``."""
+        for name in CONTAINERS:
+            if self._state[name] != "unseen":
+                text = " ".join(self._parts[name])
+                return text if self.max_chars is None else text[: self.max_chars]
+        return None
+
+
+def _decoded(
+    chunks: Iterable[bytes], content_type: Optional[str], sniff: bool
+) -> Iterable[str]:
+    """Decode byte chunks incrementally once the encoding is known."""
+    head = b""
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            head += chunk
+            if sniff and len(head) < SNIFF_BYTES:
+                continue
+            encoding = sniff_encoding(head if sniff else b"", content_type)
+            decoder = codecs.getincrementaldecoder(encoding)("replace")
+            chunk, head = head, b""
+        yield decoder.decode(chunk)
+    if decoder is None:
+        encoding = sniff_encoding(head if sniff else b"", content_type)
+        decoder = codecs.getincrementaldecoder(encoding)("replace")
+    yield decoder.decode(head, final=True)
+
+
+def extract_chunks(
+    chunks: Iterable[bytes],
+    max_chars: Optional[int] = None,
+    *,
+    content_type: Optional[str] = None,
+) -> Optional[str]:
+    """Return up to ``max_chars`` characters of the main text of a page.
+
+    ``chunks`` are the raw bytes of the page, for example from
+    ``Response.iter_content``. They are decoded and parsed as they
+    arrive, and no further chunk is read once enough text has been found.
+    """
+    extractor = TextExtractor(max_chars)
+    for text in _decoded(chunks, content_type, sniff=True):
+        extractor.feed(text)
+        if extractor.done:
+            break
+    extractor.close()
+    return extractor.text()
+
+
+def extract_plain(
+    chunks: Iterable[bytes],
+    max_chars: Optional[int] = None,
+    *,
+    content_type: Optional[str] = None,
+) -> Optional[str]:
+    """Return up to ``max_chars`` characters of a plain text document.
+
+    Whitespace is collapsed as it is in extracted HTML text.
+    """
+    parts: List[str] = []
+    size = 0
+    pending = ""
+    for text in _decoded(chunks, content_type, sniff=False):
+        text = pending + text
+        # Keep a word cut by the chunk boundary for the next chunk
+        cut = _PARTIAL_WORD.search(text).start()
+        pending = text[cut:]
+        for word in text[:cut].split():
+            parts.append(word)
+            size += len(word) + 1
+        if max_chars is not None and size >= max_chars:
+            break
+    else:
+        parts.extend(pending.split())
+    text = " ".join(parts)
+    return text if max_chars is None else text[:max_chars]
+
+
+def extract_text(
+    content: bytes,
+    max_chars: Optional[int] = None,
+    *,
+    content_type: Optional[str] = None,
+) -> Optional[str]:
+    """Return up to ``max_chars`` characters of the main text of a page.
+
+    The content is decoded and parsed in chunks, so the rest of a large
+    page is never decoded once enough text has been found.
+    """
+    view = memoryview(content)
+    chunks = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    return extract_chunks(chunks, max_chars, content_type=content_type)
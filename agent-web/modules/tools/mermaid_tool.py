@@ -39,4 +39,7 @@ def get_tool() -> Tool:
         description="Mermaid markdown-like codeから図を生成する。シーケンス図、ガントチャート等に適している。",
         func=create_mermaid_diagram,
         args_schema=MermaidInput,
+        # mermaid-py renders on the public mermaid.ink service
+        max_concurrency=2,
+        timeout=60.0,
     )
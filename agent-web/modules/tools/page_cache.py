@@ -0,0 +1,239 @@
+"""Cache of scraped page texts.
+
+Pages are stored with all the text that was extracted, so callers asking
+for different ``max_chars`` share one entry. The in-memory tier is an LRU
+bounded by the UTF-8 size of the texts. An optional SQLite tier keeps
+pages across restarts.
+
+Entries expire ``ttl`` seconds after they were fetched. Expired pages that
+came with an ``ETag`` or ``Last-Modified`` header are kept so the next
+request can revalidate them and receive a ``304`` instead of the body.
+Expired pages without validators are dropped.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import Dict, Optional
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """Extracted text of a page and the validators it was served with."""
+
+    text: str
+    expires: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    truncated: bool = False
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def covers(self, max_chars: Optional[int]) -> bool:
+        """Return whether the page holds ``max_chars`` characters of text.
+
+        ``None`` asks for the whole page.
+        """
+        if not self.truncated:
+            return True
+        return max_chars is not None and len(self.text) >= max_chars
+
+    @cached_property
+    def size(self) -> int:
+        return len(self.text.encode("utf-8"))
+
+    def validators(self) -> Dict[str, str]:
+        """Headers for a conditional request."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Byte-bounded two-tier LRU cache of pages.
+
+    Parameters
+    ----------
+    max_bytes:
+        Total size of the texts kept in memory. A page larger than this is
+        only written to the disk tier.
+    ttl:
+        Seconds a page is fresh after it was fetched or revalidated.
+    path:
+        SQLite file for the disk tier. ``None`` keeps the cache in memory.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        *,
+        ttl: float = 3600,
+        path: Optional[str] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._memory: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, text TEXT NOT NULL, expires REAL NOT NULL, "
+                "etag TEXT, last_modified TEXT, truncated INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.commit()
+            self.purge()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @staticmethod
+    def _dead(page: CachedPage) -> bool:
+        return not page.fresh and not page.revalidatable
+
+    def _drop(self, url: str) -> None:
+        page = self._memory.pop(url, None)
+        if page is not None:
+            self.nbytes -= page.size
+
+    def _remember(self, url: str, page: CachedPage) -> None:
+        self._drop(url)
+        size = page.size
+        if size > self.max_bytes:
+            return
+        self._memory[url] = page
+        self.nbytes += size
+        if self.nbytes > self.max_bytes:
+            for key in [k for k, p in self._memory.items() if self._dead(p)]:
+                self._drop(key)
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.nbytes -= evicted.size
+
+    def _persist(self, url: str, page: CachedPage) -> None:
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    page.text,
+                    page.expires,
+                    page.etag,
+                    page.last_modified,
+                    int(page.truncated),
+                ),
+            )
+            self._db.commit()
+        except sqlite3.Error as exc:
+            logger.warning("Failed to persist cached page: %s", exc)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Return the page for ``url``, fresh or still revalidatable."""
+        with self._lock:
+            page = self._memory.get(url)
+            if page is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT text, expires, etag, last_modified, truncated "
+                    "FROM pages WHERE url = ?",
+                    (url,),
+                ).fetchone()
+                if row is not None:
+                    page = CachedPage(*row[:4], truncated=bool(row[4]))
+                    if not self._dead(page):
+                        self._remember(url, page)
+            if page is not None and self._dead(page):
+                self._drop(url)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                    self._db.commit()
+                page = None
+            if page is None:
+                self.misses += 1
+                return None
+            if url in self._memory:
+                self._memory.move_to_end(url)
+            if page.fresh:
+                self.hits += 1
+            return page
+
+    def put(
+        self,
+        url: str,
+        text: str,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        truncated: bool = False,
+    ) -> CachedPage:
+        """Store the text of ``url`` with its response validators.
+
+        ``truncated`` marks text that was cut short during extraction.
+        """
+        page = CachedPage(text, time.time() + self.ttl, etag, last_modified, truncated)
+        with self._lock:
+            self._remember(url, page)
+            self._persist(url, page)
+        return page
+
+    def refresh(self, url: str, page: CachedPage) -> CachedPage:
+        """Mark ``page`` fresh again after a ``304 Not Modified``."""
+        page = replace(page, expires=time.time() + self.ttl)
+        with self._lock:
+            self._remember(url, page)
+            self._persist(url, page)
+        return page
+
+    def purge(self) -> None:
+        """Remove expired pages that cannot be revalidated from both tiers."""
+        with self._lock:
+            for key in [k for k, p in self._memory.items() if self._dead(p)]:
+                self._drop(key)
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM pages WHERE expires <= ? "
+                    "AND etag IS NULL AND last_modified IS NULL",
+                    (time.time(),),
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.nbytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM pages")
+                self._db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,194 @@
+"""Cached robots.txt rules for the web scraper.
+
+:class:`RobotsRules` compiles the group that applies to the scraper once,
+so :meth:`RobotsRules.can_fetch` only walks a short list of prefixes and
+patterns. :class:`RobotsCache` keeps the rules per site until they expire
+and loads missing ones on a small thread pool. Callers get a future, so a
+site's robots.txt downloads while the page request is being prepared and
+robots.txt files of different sites download in parallel.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class RobotsRules:
+    """Allow and disallow rules of one robots.txt group.
+
+    Rules are sorted so the first match is the most specific one: the
+    longest pattern wins and ``Allow`` wins a tie, as in RFC 9309.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, bool]] = ()) -> None:
+        compiled = []
+        for pattern, allow in rules:
+            if "*" in pattern or pattern.endswith("$"):
+                anchored = pattern.endswith("$")
+                body = pattern[:-1] if anchored else pattern
+                regex = ".*".join(re.escape(part) for part in body.split("*"))
+                match = re.compile(regex + ("$" if anchored else "")).match
+            else:
+                match = _prefix(pattern)
+            compiled.append((len(pattern), allow, match))
+        compiled.sort(key=lambda r: (-r[0], not r[1]))
+        self._rules = [(allow, match) for _, allow, match in compiled]
+
+    @classmethod
+    def parse(cls, text: str, user_agent: str = "*") -> "RobotsRules":
+        """Compile the rules that apply to ``user_agent``.
+
+        Groups naming the agent's product token are merged. The ``*``
+        group is used when none names it.
+        """
+        token = user_agent.split("/")[0].strip().lower()
+        groups: List[Tuple[List[str], List[Tuple[str, bool]]]] = []
+        agents: List[str] = []
+        rules: List[Tuple[str, bool]] = []
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            field, value = (s.strip() for s in line.split(":", 1))
+            field = field.lower()
+            if field == "user-agent":
+                if rules:
+                    groups.append((agents, rules))
+                    agents, rules = [], []
+                agents.append(value.lower())
+            elif field in ("allow", "disallow") and agents:
+                if value:
+                    rules.append((value, field == "allow"))
+        if agents:
+            groups.append((agents, rules))
+
+        named = [r for names, r in groups if token != "*" and token in names]
+        chosen = named or [r for names, r in groups if "*" in names]
+        return cls([rule for group in chosen for rule in group])
+
+    def can_fetch(self, path: str) -> bool:
+        """Return whether ``path``, including any query, may be fetched."""
+        if path == "/robots.txt":
+            return True
+        for allow, match in self._rules:
+            if match(path):
+                return allow
+        return True
+
+
+def _prefix(pattern: str) -> Callable[[str], bool]:
+    return lambda path: path.startswith(pattern)
+
+
+ALLOW_ALL = RobotsRules()
+
+
+def _done(rules: RobotsRules) -> "Future[RobotsRules]":
+    future: "Future[RobotsRules]" = Future()
+    future.set_result(rules)
+    return future
+
+
+class RobotsCache:
+    """Per-site robots.txt rules with expiry.
+
+    Parameters
+    ----------
+    user_agent:
+        Agent whose group is applied.
+    ttl:
+        Seconds rules are kept when the response has no ``max-age``.
+    error_ttl:
+        Seconds a failed download is remembered before it is retried.
+        Sites whose robots.txt cannot be loaded are treated as allowing
+        everything in the meantime.
+    max_workers:
+        Number of robots.txt files downloaded at the same time.
+    """
+
+    def __init__(
+        self,
+        *,
+        user_agent: str = "*",
+        ttl: float = 24 * 3600,
+        error_ttl: float = 300,
+        max_workers: int = 8,
+    ) -> None:
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_workers = max_workers
+        self._entries: Dict[str, Tuple[float, RobotsRules]] = {}
+        self._pending: Dict[str, "Future[RobotsRules]"] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, base: str) -> bool:
+        entry = self._entries.get(base)
+        return entry is not None and entry[0] > time.time()
+
+    def rules(self, base: str, fetch: Callable[[str], Any]) -> "Future[RobotsRules]":
+        """Return a future of the rules for the site at ``base``.
+
+        ``fetch`` takes a URL and returns a :class:`requests.Response`. It
+        is only called when the rules are missing or expired, and at most
+        once per site at a time.
+        """
+        with self._lock:
+            entry = self._entries.get(base)
+            if entry is not None and entry[0] > time.time():
+                return _done(entry[1])
+            future = self._pending.get(base)
+            if future is None:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="robots"
+                    )
+                future = self._pool.submit(self._load, base, fetch)
+                self._pending[base] = future
+            return future
+
+    def _max_age(self, response: Any) -> Optional[float]:
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        return float(match.group(1)) if match else None
+
+    def _load(self, base: str, fetch: Callable[[str], Any]) -> RobotsRules:
+        rules, ttl = ALLOW_ALL, self.error_ttl
+        try:
+            response = fetch(urljoin(base, "/robots.txt"))
+            if 200 <= response.status_code < 300:
+                rules = RobotsRules.parse(response.text, self.user_agent)
+                max_age = self._max_age(response)
+                ttl = self.ttl if max_age is None else max_age
+            elif 400 <= response.status_code < 500:
+                # No robots.txt means no restrictions
+                ttl = self.ttl
+            else:
+                logger.debug("robots.txt of %s returned %s", base, response.status_code)
+        except Exception as exc:
+            logger.debug("Failed to load robots.txt of %s: %s", base, exc)
+        with self._lock:
+            self._entries[base] = (time.time() + ttl, rules)
+            self._pending.pop(base, None)
+        return rules
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
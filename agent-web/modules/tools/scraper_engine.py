@@ -0,0 +1,307 @@
+"""Concurrent fetching for the web scraper tool.
+
+:class:`ScraperEngine` shares one pooled :class:`requests.Session`, so
+requests to the same host reuse keep-alive connections. Politeness delays
+are enforced per host by :class:`TokenBucket` instead of one global delay,
+and identical URLs requested at the same time are fetched once through
+:class:`SingleFlight`. Locks are only held while shared state is updated,
+never during network I/O, so fetches to different hosts run in parallel.
+A site's robots.txt is loaded by :class:`~.robots.RobotsCache` while the
+first page request waits for its turn, and the page is only sent once the
+rules allow it. Bodies are streamed into the extractor for their media
+type, reading at most ``max_bytes`` and stopping as soon as enough text
+has been found. Unsupported types are rejected before the body is read.
+"""
+
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+from urllib.parse import urlparse
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .html_extract import CHUNK_SIZE, extract_chunks, extract_plain
+from .page_cache import CachedPage, PageCache
+from .robots import RobotsCache, RobotsRules
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Extractors by media type; other types are rejected before the body is read
+EXTRACTORS: Dict[str, Callable[..., Optional[str]]] = {
+    "text/html": extract_chunks,
+    "application/xhtml+xml": extract_chunks,
+    "text/plain": extract_plain,
+}
+
+
+class TokenBucket:
+    """Rate limiter allowing ``rate`` requests per second with bursts of ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping outside the lock until it is available."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Reserve the token now so concurrent callers queue up behind it
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _Disallowed(Exception):
+    pass
+
+
+class _CappedBody:
+    """Response body in chunks up to ``max_bytes``.
+
+    ``capped`` tells whether the body went on past the cap.
+    """
+
+    def __init__(self, response: requests.Response, max_bytes: int) -> None:
+        self.response = response
+        self.max_bytes = max_bytes
+        self.capped = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        remaining = self.max_bytes
+        for chunk in self.response.iter_content(CHUNK_SIZE):
+            if len(chunk) > remaining:
+                self.capped = True
+                logger.debug("Stopped reading a response at %s bytes", self.max_bytes)
+                if remaining:
+                    yield chunk[:remaining]
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run a function once per key while identical calls wait for its result."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class ScraperEngine:
+    """Fetch pages politely and concurrently.
+
+    Parameters
+    ----------
+    delay:
+        Minimum seconds between requests to the same host. ``0`` disables
+        rate limiting.
+    timeout:
+        Request timeout in seconds.
+    headers:
+        Headers sent with every request.
+    cache_ttl:
+        Seconds a scraped page is served from the default cache.
+    cache:
+        Page cache to use, shared between engines.
+    robots:
+        robots.txt cache to use, shared between engines.
+    session:
+        Session to use. A pooled session is created by default.
+    pool_size:
+        Keep-alive connections kept per host.
+    text_limit:
+        Characters of page text extracted and cached. Extraction stops
+        there, so large pages are not parsed to the end. Callers asking
+        for more raise the limit for their request. ``None`` extracts the
+        whole text.
+    max_bytes:
+        Bytes of a response body read at most. Longer pages are cut off
+        there and their text is extracted from the part that was read.
+    """
+
+    def __init__(
+        self,
+        *,
+        delay: float = 1.0,
+        timeout: float = 10.0,
+        headers: Optional[Dict[str, str]] = None,
+        cache_ttl: float = 3600,
+        cache: Optional[PageCache] = None,
+        robots: Optional[RobotsCache] = None,
+        session: Optional[requests.Session] = None,
+        pool_size: int = 8,
+        text_limit: Optional[int] = 20000,
+        max_bytes: int = 2 * 1024 * 1024,
+    ) -> None:
+        self.delay = delay
+        self.timeout = timeout
+        self.text_limit = text_limit
+        self.max_bytes = max_bytes
+        self.headers = dict(headers or {})
+        self.cache = cache if cache is not None else PageCache(ttl=cache_ttl)
+        self.robots = robots if robots is not None else RobotsCache()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate = 1.0 / self.delay if self.delay > 0 else 0.0
+                bucket = self._buckets[host] = TokenBucket(rate)
+            return bucket
+
+    def _send(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        *,
+        stream: bool = False,
+    ) -> requests.Response:
+        if headers:
+            headers = {**self.headers, **headers}
+        return self.session.get(
+            url, headers=headers or self.headers, timeout=self.timeout, stream=stream
+        )
+
+    def _get(self, url: str) -> requests.Response:
+        self._bucket(urlparse(url).netloc).acquire()
+        return self._send(url)
+
+    def _fetch_text(
+        self,
+        url: str,
+        path: str,
+        stale: Optional[CachedPage],
+        robots: "Future[RobotsRules]",
+        limit: Optional[int],
+    ) -> Optional[str]:
+        # Wait for our turn while robots.txt may still be downloading
+        self._bucket(urlparse(url).netloc).acquire()
+        if not robots.result().can_fetch(path):
+            raise _Disallowed(url)
+        response = self._send(url, stale.validators() if stale else None, stream=True)
+        try:
+            if stale is not None and response.status_code == 304:
+                logger.debug("Revalidated %s", url)
+                return self.cache.refresh(url, stale).text
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            media_type = content_type.split(";", 1)[0].strip().lower() or "text/html"
+            extract = EXTRACTORS.get(media_type)
+            if extract is None:
+                raise ValueError(f"unsupported content type {media_type}")
+            body = _CappedBody(response, self.max_bytes)
+            text = extract(body, limit, content_type=content_type)
+        finally:
+            response.close()
+        if text is not None:
+            self.cache.put(
+                url,
+                text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                truncated=body.capped or (limit is not None and len(text) >= limit),
+            )
+        return text
+
+    def scrape(self, url: str, max_chars: Optional[int] = 1000) -> str:
+        """Return up to ``max_chars`` characters of the page text.
+
+        ``None`` returns the whole text.
+        """
+        parsed = urlparse(url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        robots = self.robots.rules(base, self._get)
+
+        cached = self.cache.get(url)
+        if cached is not None and not cached.covers(max_chars):
+            # Too short for this caller; a 304 would not bring more text
+            cached = None
+        if cached is not None and cached.fresh:
+            if not robots.result().can_fetch(path):
+                return "Disallowed by robots.txt"
+            return cached.text[:max_chars]
+
+        if max_chars is None or self.text_limit is None:
+            limit = None
+        else:
+            limit = max(max_chars, self.text_limit)
+        try:
+            # Callers with different limits must not share a shorter result
+            text = self._flights.do(
+                f"{url}#{limit}",
+                lambda: self._fetch_text(url, path, cached, robots, limit),
+            )
+        except _Disallowed:
+            return "Disallowed by robots.txt"
+        except Exception as e:
+            return f"Error fetching {url}: {e}"
+        if text is None:
+            return "No content"
+        return text[:max_chars]
+
+    async def ascrape(self, url: str, max_chars: Optional[int] = 1000) -> str:
+        """Run :meth:`scrape` in a worker thread.
+
+        The engine is thread based. No async HTTP client is a dependency of
+        this project, so awaiting callers get concurrency from the thread
+        pool rather than from a native async transport.
+        """
+        return await asyncio.to_thread(self.scrape, url, max_chars)
+
+    def close(self) -> None:
+        self.session.close()
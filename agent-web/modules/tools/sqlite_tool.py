@@ -1,5 +1,7 @@
 import json
 import sqlite3
+import threading
+from typing import Optional
 from pydantic import BaseModel, Field
 
 from .base import Tool
@@ -8,10 +10,16 @@ class SQLiteQueryInput(BaseModel):
     path: str = Field(description="SQLiteデータベースファイルのパス")
     query: str = Field(description="実行するSQLクエリ")
 
-def run_sqlite_query(path: str, query: str) -> str:
-    """Run a SQL query against a SQLite database and return results as JSON."""
+def run_sqlite_query(path: str, query: str, cancel: Optional[threading.Event] = None) -> str:
+    """Run a SQL query against a SQLite database and return results as JSON.
+
+    Setting ``cancel`` interrupts a running query.
+    """
     conn = sqlite3.connect(path)
     try:
+        if cancel is not None:
+            # A nonzero return value aborts the statement
+            conn.set_progress_handler(lambda: int(cancel.is_set()), 1000)
         cur = conn.cursor()
         cur.execute(query)
         rows = cur.fetchall()
@@ -27,4 +35,5 @@ def get_tool() -> Tool:
         description="SQLiteデータベースに対してSQLクエリを実行するツール。入力はデータベースのパスとSQLクエリ。",
         func=run_sqlite_query,
         args_schema=SQLiteQueryInput,
+        timeout=30.0,
     )
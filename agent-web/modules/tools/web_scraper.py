@@ -1,27 +1,30 @@
-from typing import Optional, Dict, Tuple
+from typing import Optional
 import os
 import threading
 import logging
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
-from urllib.robotparser import RobotFileParser
-import time
 
 from pydantic import BaseModel, Field
 from .base import Tool
+from .page_cache import PageCache
+from .robots import RobotsCache
+from .scraper_engine import ScraperEngine
 
-# Shared state protected by _LOCK
-_CACHE: Dict[str, Tuple[float, str]] = {}
+# Shared state; the cache and the engine lock their own updates
 _CACHE_TTL = 3600
-_ROBOTS: Dict[str, RobotFileParser] = {}
-_LAST_REQUEST_TIME = 0.0
+_CACHE_BYTES = 16 * 1024 * 1024
+_CACHE_PATH: Optional[str] = None
+_CACHE = PageCache(_CACHE_BYTES, ttl=_CACHE_TTL)
+_ROBOTS = RobotsCache()
 _DELAY = 1.0
 _TIMEOUT = 10.0
-_LOCK = threading.RLock()
+_MAX_BYTES = 2 * 1024 * 1024
 # Default headers for all HTTP requests
 _HEADERS = {"User-Agent": "Mozilla/5.0"}
 
+_ENGINE: Optional[ScraperEngine] = None
+_ENGINE_SETTINGS: Optional[tuple] = None
+_ENGINE_LOCK = threading.Lock()
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,14 +33,20 @@ def load_settings() -> None:
 
     Invalid ``WEB_SCRAPER_CACHE_TTL`` or ``WEB_SCRAPER_DELAY`` values fall back
     to the defaults and trigger a warning. ``WEB_SCRAPER_TIMEOUT`` defines the
-    request timeout in seconds (default ``10``).
+    request timeout in seconds (default ``10``). ``WEB_SCRAPER_CACHE_BYTES``
+    bounds the in-memory page cache and ``WEB_SCRAPER_CACHE_PATH`` names an
+    SQLite file that keeps cached pages across restarts.
+    ``WEB_SCRAPER_MAX_BYTES`` limits how much of a response body is read.
     """
 
-    global _CACHE_TTL, _DELAY, _HEADERS, _TIMEOUT
+    global _CACHE_TTL, _CACHE_BYTES, _CACHE_PATH, _DELAY, _HEADERS, _TIMEOUT
+    global _MAX_BYTES
 
     ttl_str = os.getenv("WEB_SCRAPER_CACHE_TTL", "3600")
+    bytes_str = os.getenv("WEB_SCRAPER_CACHE_BYTES", str(16 * 1024 * 1024))
     delay_str = os.getenv("WEB_SCRAPER_DELAY", "1.0")
     timeout_str = os.getenv("WEB_SCRAPER_TIMEOUT", "10")
+    max_bytes_str = os.getenv("WEB_SCRAPER_MAX_BYTES", str(2 * 1024 * 1024))
 
     try:
         _CACHE_TTL = int(ttl_str)
@@ -47,6 +56,16 @@ def load_settings() -> None:
         )
         _CACHE_TTL = 3600
 
+    try:
+        _CACHE_BYTES = int(bytes_str)
+    except ValueError:
+        logger.warning(
+            "Invalid WEB_SCRAPER_CACHE_BYTES=%s, using default 16 MiB", bytes_str
+        )
+        _CACHE_BYTES = 16 * 1024 * 1024
+
+    _CACHE_PATH = os.getenv("WEB_SCRAPER_CACHE_PATH") or None
+
     try:
         _DELAY = float(delay_str)
     except ValueError:
@@ -63,6 +82,14 @@ def load_settings() -> None:
         )
         _TIMEOUT = 10.0
 
+    try:
+        _MAX_BYTES = int(max_bytes_str)
+    except ValueError:
+        logger.warning(
+            "Invalid WEB_SCRAPER_MAX_BYTES=%s, using default 2 MiB", max_bytes_str
+        )
+        _MAX_BYTES = 2 * 1024 * 1024
+
     _HEADERS = {"User-Agent": os.getenv("WEB_SCRAPER_USER_AGENT", "Mozilla/5.0")}
 
 
@@ -70,13 +97,35 @@ def load_settings() -> None:
 load_settings()
 
 
-def _respect_delay() -> None:
-    global _LAST_REQUEST_TIME
-    with _LOCK:
-        since = time.time() - _LAST_REQUEST_TIME
-        if since < _DELAY:
-            time.sleep(_DELAY - since)
-        _LAST_REQUEST_TIME = time.time()
+def _engine() -> ScraperEngine:
+    """Return the shared engine, rebuilt when the settings have changed.
+
+    ``_DELAY`` is enforced per host, so pages from different sites are
+    fetched in parallel.
+    """
+    global _CACHE, _ENGINE, _ENGINE_SETTINGS
+    settings = (_DELAY, _TIMEOUT, _MAX_BYTES, tuple(_HEADERS.items()))
+    with _ENGINE_LOCK:
+        _CACHE.ttl = _CACHE_TTL
+        _CACHE.max_bytes = _CACHE_BYTES
+        if _CACHE.path != _CACHE_PATH:
+            _CACHE.close()
+            _CACHE = PageCache(_CACHE_BYTES, ttl=_CACHE_TTL, path=_CACHE_PATH)
+            _ENGINE_SETTINGS = None
+        if _ENGINE is None or _ENGINE_SETTINGS != settings:
+            if _ENGINE is not None:
+                _ENGINE.close()
+            _ENGINE = ScraperEngine(
+                delay=_DELAY,
+                timeout=_TIMEOUT,
+                headers=_HEADERS,
+                max_bytes=_MAX_BYTES,
+                cache=_CACHE,
+                robots=_ROBOTS,
+            )
+            _ENGINE_SETTINGS = settings
+        return _ENGINE
+
 
 class ScraperInput(BaseModel):
     url: str = Field(description="WebページのURL")
@@ -85,57 +134,16 @@ class ScraperInput(BaseModel):
     )
 
 
-def scrape_website_content(url: str, max_chars: int = 1000) -> str:
+def scrape_website_content(url: str, max_chars: Optional[int] = 1000) -> str:
     """Fetch a web page and return cleaned text respecting robots.txt."""
-    parsed = urlparse(url)
-    base = f"{parsed.scheme}://{parsed.netloc}"
-
-    with _LOCK:
-        # Check robots.txt
-        rp = _ROBOTS.get(base)
-        if rp is None:
-            rp = RobotFileParser()
-            robots_url = urljoin(base, "/robots.txt")
-            try:
-                _respect_delay()
-                resp = requests.get(robots_url, headers=_HEADERS, timeout=_TIMEOUT)
-                if resp.status_code == 200:
-                    rp.parse(resp.text.splitlines())
-                else:
-                    rp = None
-            except Exception:
-                rp = None
-            _ROBOTS[base] = rp
-        if rp and not rp.can_fetch("*", parsed.path):
-            return "Disallowed by robots.txt"
-
-        # Check cache
-        cached = _CACHE.get(url)
-        if cached and time.time() - cached[0] < _CACHE_TTL:
-            return cached[1][:max_chars]
-
-        try:
-            _respect_delay()
-            response = requests.get(
-                url, headers=_HEADERS, timeout=_TIMEOUT
-            )
-            response.raise_for_status()
-        except Exception as e:
-            return f"Error fetching {url}: {e}"
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        main = soup.find("main") or soup.find("article") or soup.find("body")
-        if not main:
-            return "No content"
+    return _engine().scrape(url, max_chars)
 
-        for tag in main.find_all(["script", "style", "header", "footer", "nav"]):
-            tag.decompose()
 
-        text = main.get_text(separator=" ", strip=True)
-        result = text[:max_chars]
-        _CACHE[url] = (time.time(), result)
-        return result
+async def ascrape_website_content(
+    url: str, max_chars: Optional[int] = 1000
+) -> str:
+    """Await :func:`scrape_website_content` run in a worker thread."""
+    return await _engine().ascrape(url, max_chars)
 
 
 def get_tool() -> Tool:
@@ -146,4 +154,7 @@ def get_tool() -> Tool:
         description="指定されたURLから主要テキストを抽出するツール。入力はURL。",
         func=scrape_website_content,
         args_schema=ScraperInput,
+        # The scraped sites are rate limited
+        max_concurrency=2,
+        timeout=60.0,
     )
@@ -42,6 +42,7 @@ class ChatInterface:
             st.session_state.current_agent,
             self.llm_client,
             st.session_state.get('tools', []),
-            st.session_state.memory
+            st.session_state.memory,
+            st.session_state.get('tot_level', 'LOW'),
         )
         return agent.run(prompt)
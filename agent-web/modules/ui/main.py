@@ -19,6 +19,9 @@ import openpyxl
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from modules.memory.journal import MessageJournal
+from modules.tools.executor import ToolExecutor
+from modules.utils.http_pool import shared_http_client
 from src.agent import ReActAgent, CoTAgent, ToTAgent, PresentationAgent
 from src.main import create_evaluator, read_tot_env
 from src.constants import TOT_LEVELS
@@ -65,6 +68,13 @@ TOOL_FUNCS = {
     "create_mermaid_diagram": create_mermaid_diagram,
 }
 
+# Concurrency limits are part of each tool's definition
+TOOL_LIMITS = {
+    tool.name: tool.max_concurrency
+    for tool in (get_graphviz_tool(), get_mermaid_tool())
+    if tool.name in TOOL_FUNCS and tool.max_concurrency
+}
+
 # Load environment variables from .env if present
 load_dotenv()
 
@@ -104,6 +114,13 @@ else:
 # :mod:`src.constants` as ``TOT_LEVELS``.
 
 class ChatGPTClient:
+    # Guards the diagram state written by tool threads
+    _diagram_lock = threading.Lock()
+    # 保存済みの会話はジャーナルに追記する
+    _journal: MessageJournal | None = None
+    _journaled = 0
+    _save_lock = threading.Lock()
+
     def __init__(self):
         """Initialize the main window and OpenAI client."""
         self.window = ctk.CTk()
@@ -136,10 +153,13 @@ class ChatGPTClient:
         logging.info("Loaded OpenAI API key from environment")
 
         base_url = os.getenv("OPENAI_BASE_URL")
+        # The shared pool keeps connections alive across requests and threads
         if base_url:
-            self.client = OpenAI(api_key=api_key, base_url=base_url)
+            self.client = OpenAI(
+                api_key=api_key, base_url=base_url, http_client=shared_http_client()
+            )
         else:
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, http_client=shared_http_client())
 
         timeout_str = os.getenv("OPENAI_TIMEOUT", "0")
         try:
@@ -727,19 +747,11 @@ class ChatGPTClient:
                     }
                     self.messages.append(assistant_msg)
 
-                    for cid, d in tool_data.items():
-                        func = TOOL_FUNCS.get(d["name"])
-                        if func:
-                            try:
-                                args = json.loads(d["args"] or "{}")
-                                if d["name"] == "create_mermaid_diagram":
-                                    code = args.get("code", "")
-                                    self._failed_mermaid_code = sanitize_mermaid_code(code)
-                                result = func(**args)
-                            except Exception as exc:
-                                result = f"Tool execution failed: {exc}"
-                        else:
-                            result = f"Unknown tool: {d['name']}"
+                    # Independent calls run concurrently; results keep call order
+                    results = self._get_tool_executor().run(
+                        [(d["name"], d["args"]) for d in tool_data.values()]
+                    )
+                    for cid, result in zip(tool_data, results):
                         self.messages.append({"role": "tool", "tool_call_id": cid, "content": result})
 
                     # Continue looping to stream assistant's follow-up answer
@@ -757,6 +769,29 @@ class ChatGPTClient:
             logging.exception("Streaming failed: %s", e)
             self.response_queue.put(f"\n\nエラー: {str(e)}\n")
 
+    def _run_tool(self, name: str, arguments: str) -> str:
+        """Execute one tool call of the model."""
+        func = TOOL_FUNCS.get(name)
+        if not func:
+            return f"Unknown tool: {name}"
+        try:
+            args = json.loads(arguments or "{}")
+            result = func(**args)
+            if name == "create_mermaid_diagram" and result.startswith("Failed to generate diagram"):
+                # Keep the code that failed for the retry button
+                with self._diagram_lock:
+                    self._failed_mermaid_code = sanitize_mermaid_code(args.get("code", ""))
+            return result
+        except Exception as exc:
+            return f"Tool execution failed: {exc}"
+
+    def _get_tool_executor(self) -> ToolExecutor:
+        executor = getattr(self, "_tool_executor", None)
+        if executor is None:
+            executor = ToolExecutor(self._run_tool, limits=TOOL_LIMITS)
+            self._tool_executor = executor
+        return executor
+
     def simple_llm(self, prompt: str, *, stream: bool = False, prefix: str = "") -> str:
         """Call the OpenAI API and optionally stream tokens to the queue."""
         params = {
@@ -797,20 +832,19 @@ class ChatGPTClient:
                 agent = CoTAgent(functools.partial(self.simple_llm, stream=True), self.memory)
             elif agent_type == "tot":
                 level = self.tot_level_var.get()
-                depth, breadth = TOT_LEVELS.get(level, (2, 2))
+                if level not in TOT_LEVELS:
+                    level = "LOW"
                 try:
-                    env_depth, env_breadth = read_tot_env()
-                    if env_depth is not None:
-                        depth = env_depth
-                    if env_breadth is not None:
-                        breadth = env_breadth
+                    depth, breadth = read_tot_env()
                 except (SystemExit, Exception) as exc:
                     self.response_queue.put(f"\n\nエラー: {exc}\n")
                     return
                 evaluator = create_evaluator(self.simple_llm)
-                agent = ToTAgent(
+                # The preset's budget applies even when depth or breadth is overridden
+                agent = ToTAgent.from_level(
                     functools.partial(self.simple_llm, stream=True, prefix="__TOT__"),
-                    evaluator,
+                    level,
+                    evaluator=evaluator,
                     max_depth=depth,
                     breadth=breadth,
                     memory=self.memory,
@@ -876,19 +910,14 @@ class ChatGPTClient:
             self.response_queue.put(f"__TITLE__{self.current_title}")
     
     def save_conversation(self, show_popup: bool = True):
-        """会話をJSONファイルとして保存."""
+        """会話をJSON Linesのジャーナルとして保存.
+
+        会話ごとのファイルは初回の保存で作成し、以降は前回の保存から
+        増えたメッセージだけを追記する。
+        """
         if not self.current_title:
             return
-        
-        # conversationsディレクトリがなければ作成
-        if not os.path.exists(CONV_DIR):
-            os.makedirs(CONV_DIR)
-            
-        filename_base = f"{self.current_title}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        # ファイル名に使えない文字を置換
-        filename_safe = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in filename_base)
-        filename = os.path.join(CONV_DIR, f"{filename_safe}.json")
-        
+
         # uploaded_filesのcontentは保存しない (大きすぎる可能性があるため)
         files_metadata = []
         for f_info in self.uploaded_files:
@@ -897,20 +926,38 @@ class ChatGPTClient:
                 "type": f_info["type"]
             })
 
-        conversation_data = {
-            "title": self.current_title,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "model": self.model_var.get(),
-            "messages": self.messages, # メッセージ履歴をそのまま保存
-            "uploaded_files_metadata": files_metadata # contentは含めない
-        }
-        
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+            with self._save_lock:
+                journal = self._journal
+                if journal is None:
+                    filename_base = f"{self.current_title}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                    # ファイル名に使えない文字を置換
+                    filename_safe = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in filename_base)
+                    journal = MessageJournal(os.path.join(CONV_DIR, f"{filename_safe}.jsonl"))
+                    self._journal = journal
+                    self._journaled = 0
+                meta = {
+                    "title": self.current_title,
+                    "timestamp": journal.meta.get("timestamp") or datetime.datetime.now().isoformat(),
+                    "model": self.model_var.get(),
+                    "uploaded_files_metadata": files_metadata, # contentは含めない
+                }
+                messages = list(self.messages)
+                if len(messages) < self._journaled:
+                    # 履歴が短くなった場合だけ全体を書き直す
+                    journal.meta = meta
+                    journal.compact(messages)
+                else:
+                    if meta != journal.meta:
+                        journal.write_meta(meta)
+                    for message in messages[self._journaled:]:
+                        journal.append(message)
+                    if journal.needs_compaction:
+                        journal.compact(messages)
+                self._journaled = len(messages)
             if show_popup:
                 try:
-                    messagebox.showinfo("保存完了", f"会話を {filename} に保存しました")
+                    messagebox.showinfo("保存完了", f"会話を {journal.path} に保存しました")
                 except tkinter.TclError:
                     pass
         except Exception as e:
@@ -919,9 +966,18 @@ class ChatGPTClient:
             else:
                 logging.error("会話の保存に失敗しました: %s", e)
 
+    def _close_journal(self) -> None:
+        """Stop appending to the journal of the current conversation."""
+        with self._save_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._journaled = 0
+
     
     def new_chat(self):
         """新しい会話を開始"""
+        self._close_journal()
         self.messages = []
         self.current_title = None
         self.uploaded_files = []
@@ -952,25 +1008,40 @@ class ChatGPTClient:
         """Open a saved conversation file and load its content."""
         file_path = filedialog.askopenfilename(
             title="会話を選択",
-            filetypes=[("Conversation", "*.json")],
+            filetypes=[("Conversation", "*.jsonl *.json")],
             initialdir=CONV_DIR,
         )
         if file_path:
             self.load_conversation(file_path)
 
     def load_conversation(self, file_path: str):
-        """Load conversation from a JSON file created by save_conversation."""
+        """Load a conversation saved by save_conversation.
+
+        Journals (``.jsonl``) keep being appended to. Older ``.json`` files
+        are left untouched and the next save starts a journal.
+        """
+        self._close_journal()
+        journal = None
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            if file_path.endswith(".jsonl"):
+                journal = MessageJournal(file_path)
+                messages = journal.read()
+                data = journal.meta
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                messages = data.get("messages", [])
         except Exception as e:
             messagebox.showerror("読み込みエラー", f"会話の読み込みに失敗しました: {str(e)}")
             return
 
+        with self._save_lock:
+            self._journal = journal
+            self._journaled = len(messages)
         self.current_title = data.get("title")
         if self.current_title:
             self.window.title(f"ChatGPT Desktop - {self.current_title}")
-        self.messages = data.get("messages", [])
+        self.messages = messages
         meta = data.get("uploaded_files_metadata", [])
         self.uploaded_files = [{"name": m["name"], "type": m["type"]} for m in meta]
 
@@ -1047,7 +1118,8 @@ class ChatGPTClient:
 
     def retry_diagram(self) -> None:
         """Attempt to regenerate a Mermaid diagram after a failure."""
-        code = getattr(self, "_failed_mermaid_code", None)
+        with self._diagram_lock:
+            code = getattr(self, "_failed_mermaid_code", None)
         if not code:
             return
         path = create_mermaid_diagram(code)
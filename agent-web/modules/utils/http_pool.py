@@ -0,0 +1,54 @@
+"""Process-wide HTTP connection pools for the OpenAI clients.
+
+Every ``OpenAI`` client normally owns its own connection pool, so building a
+client per request pays a new TCP and TLS handshake each time. Clients
+created with these shared pools reuse keep-alive connections instead. Without ``httpx`` the functions return ``None`` and
+the OpenAI clients fall back to their own pools.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+POOL_LIMITS = (
+    httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=30.0)
+    if httpx is not None
+    else None
+)
+
+_lock = threading.Lock()
+_client: Optional["httpx.Client"] = None
+# httpx.AsyncClient connections belong to the loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def shared_http_client() -> Optional["httpx.Client"]:
+    """Return the blocking client shared by the whole process."""
+    global _client
+    if httpx is None:
+        return None
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(limits=POOL_LIMITS)
+        return _client
+
+
+def shared_async_http_client() -> Optional["httpx.AsyncClient"]:
+    """Return the async client shared by everything on the running loop."""
+    if httpx is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=POOL_LIMITS)
+            _async_clients[loop] = client
+        return client
@@ -1,36 +1,249 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
 import streamlit as st
-from typing import Generator, List, Dict
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Optional
+import asyncio
+import time
+import weakref
+
+from .http_pool import shared_async_http_client, shared_http_client
+from .response_cache import ResponseCache, cache_key
+from .tokens import count_tokens
+
+
+def buffer_deltas(deltas: Iterable[str], min_chars: int = 64, max_delay: float = 0.05) -> Iterator[str]:
+    """ストリームの小さな差分をまとめて返す
+
+    最初の差分はすぐに返すため初回トークンの遅延は変わらない。以降は
+    ``min_chars`` 文字以上たまるか、前回から ``max_delay`` 秒経過した時点
+    (差分の到着時に判定) でまとめて返す。
+    """
+    it = iter(deltas)
+    try:
+        for first in it:
+            yield first
+            break
+        parts: List[str] = []
+        size = 0
+        last = time.monotonic()
+        for delta in it:
+            parts.append(delta)
+            size += len(delta)
+            if size >= min_chars or time.monotonic() - last >= max_delay:
+                yield "".join(parts)
+                parts.clear()
+                size = 0
+                last = time.monotonic()
+        if parts:
+            yield "".join(parts)
+    finally:
+        close = getattr(it, "close", None)
+        if callable(close):
+            close()
+
 
 class LLMClient:
-    def __init__(self):
-        self.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        model: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_all: bool = False,
+    ):
+        """``model`` を指定するとセッション状態を参照しない (ワーカースレッド用)
+
+        ``cache`` を渡すと temperature が 0 の要求 (``cache_all`` なら全要求)
+        の応答を再利用する。ツール付きの要求はツール定義もキーに含める。
+        エージェントでは評価だけが temperature 0 で要求される。既定の
+        temperature を使う回答や思考候補は ``cache_all`` のときだけ再利用される。
+        """
+        self.api_key = api_key or st.secrets["OPENAI_API_KEY"]
+        self.model = model
+        self.cache = cache
+        self.cache_all = cache_all
+        self.client = OpenAI(api_key=self.api_key, http_client=shared_http_client())
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _model(self) -> str:
+        return self.model or st.session_state.get('model', 'gpt-4.1-mini')
 
-    def chat(self, messages: List[Dict], stream: bool = True) -> Generator:
-        """チャット補完を実行"""
-        model = st.session_state.get('model', 'gpt-4.1-mini')
+    def _cache_key(self, messages: List[Dict], temperature: Optional[float], tools: Optional[List[Dict]] = None) -> Optional[str]:
+        if self.cache is None or (temperature != 0 and not self.cache_all):
+            return None
+        return cache_key(self._model(), messages, temperature, tools)
 
+    def _store(self, key: Optional[str], content: str, response=None) -> None:
+        if key is not None:
+            usage = getattr(response, "usage", None)
+            self.cache.put(key, content, getattr(usage, "total_tokens", 0) or 0)
+
+    def _store_response(self, key: Optional[str], response) -> None:
+        """ツール呼び出しを含む応答全体を JSON として保存"""
+        dump = getattr(response, "model_dump_json", None)
+        if key is not None and callable(dump):
+            self._store(key, dump(), response)
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """実行中のイベントループ用の非同期クライアント (接続プールを共有)"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=self.api_key, http_client=shared_async_http_client())
+            self._async_clients[loop] = client
+        return client
+
+    def complete(self, messages: List[Dict], temperature: float = 0.7) -> str:
+        """ストリーミングせずに応答全文を返す"""
+        key = self._cache_key(messages, temperature)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         response = self.client.chat.completions.create(
-            model=model,
+            model=self._model(),
             messages=messages,
-            stream=stream,
-            temperature=0.7
+            temperature=temperature
         )
+        content = response.choices[0].message.content or ""
+        self._store(key, content, response)
+        return content
 
-        if stream:
+    def stream(self, messages: List[Dict], temperature: float = 0.7, *, buffered: bool = False) -> Iterator[str]:
+        """応答を逐次返す。``buffered`` なら小さな差分をまとめる (:func:`buffer_deltas`)"""
+        key = self._cache_key(messages, temperature)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return iter([cached])
+        response = self.client.chat.completions.create(
+            model=self._model(),
+            messages=messages,
+            stream=True,
+            temperature=temperature
+        )
+        deltas = self._deltas(response)
+        if key is not None:
+            deltas = self._caching(key, messages, deltas)
+        return buffer_deltas(deltas) if buffered else deltas
+
+    @staticmethod
+    def _deltas(response) -> Iterator[str]:
+        """途中で閉じられたら接続も閉じて生成を打ち切る"""
+        try:
             for chunk in response:
-                if chunk.choices[0].delta.content:
+                if chunk.choices and chunk.choices[0].delta.content:
                     yield chunk.choices[0].delta.content
-        else:
-            return response.choices[0].message.content
+        finally:
+            close = getattr(response, "close", None)
+            if callable(close):
+                close()
 
-    def with_tools(self, messages: List[Dict], tools: List[Dict]) -> Dict:
-        """ツール使用を含むチャット"""
-        model = st.session_state.get('model', 'gpt-4.1-mini')
+    def _store_stream(self, key: Optional[str], messages: List[Dict], content: str) -> None:
+        """ストリームの応答を保存する
+
+        ストリームは使用量を返さないため、トークン数はローカルで見積もる。
+        """
+        if key is not None:
+            prompt = "".join(m["content"] for m in messages if isinstance(m.get("content"), str))
+            self.cache.put(key, content, count_tokens(prompt) + count_tokens(content))
+
+    def _caching(self, key: str, messages: List[Dict], deltas: Iterator[str]) -> Iterator[str]:
+        """最後まで読まれたストリームだけをキャッシュする"""
+        parts: List[str] = []
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+        self._store_stream(key, messages, "".join(parts))
+
+    def chat(self, messages: List[Dict], stream: bool = True):
+        """チャット補完を実行 (``stream=False`` なら文字列、それ以外はイテレータ)"""
+        if stream:
+            return self.stream(messages)
+        return self.complete(messages)
+
+    async def achat(self, messages: List[Dict], temperature: float = 0.7) -> str:
+        """チャット補完を非同期に実行し、本文を返す"""
+        key = self._cache_key(messages, temperature)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        response = await self.aclient.chat.completions.create(
+            model=self._model(),
+            messages=messages,
+            temperature=temperature
+        )
+        content = response.choices[0].message.content or ""
+        self._store(key, content, response)
+        return content
+
+    async def astream(self, messages: List[Dict], temperature: float = 0.7) -> AsyncIterator[str]:
+        """チャット補完を非同期にストリーミング"""
+        key = self._cache_key(messages, temperature)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        response = await self.aclient.chat.completions.create(
+            model=self._model(),
+            messages=messages,
+            stream=True,
+            temperature=temperature
+        )
+        parts: List[str] = []
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        finally:
+            close = getattr(response, "close", None)
+            if callable(close):
+                await close()
+        # 最後まで読まれたストリームだけをキャッシュする
+        self._store_stream(key, messages, "".join(parts))
+
+    def with_tools(self, messages: List[Dict], tools: List[Dict], temperature: Optional[float] = None) -> ChatCompletion:
+        """ツール使用を含むチャット
+
+        ``temperature`` が None ならモデルの既定値を使い、キャッシュは ``cache_all``
+        のときだけ使う。
+        """
+        key = self._cache_key(messages, temperature, tools)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+        options = {} if temperature is None else {"temperature": temperature}
+        response = self.client.chat.completions.create(
+            model=self._model(),
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            **options,
+        )
+        self._store_response(key, response)
+        return response
 
-        return self.client.chat.completions.create(
-            model=model,
+    async def awith_tools(self, messages: List[Dict], tools: List[Dict], temperature: Optional[float] = None) -> ChatCompletion:
+        """ツール使用を含むチャットを非同期に実行"""
+        key = self._cache_key(messages, temperature, tools)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ChatCompletion.model_validate_json(cached)
+        options = {} if temperature is None else {"temperature": temperature}
+        response = await self.aclient.chat.completions.create(
+            model=self._model(),
             messages=messages,
             tools=tools,
-            tool_choice="auto"
+            tool_choice="auto",
+            **options,
         )
+        self._store_response(key, response)
+        return response
@@ -0,0 +1,159 @@
+"""Cache of LLM replies for deterministic requests.
+
+Replies are keyed on the model, messages, temperature and tools of a
+request. A bounded in-memory LRU tier answers repeated requests within a
+process. An optional SQLite tier keeps replies across restarts. Entries
+older than ``ttl`` seconds are ignored and removed in both tiers.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float],
+    tools: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Return a stable digest of the fields that determine a reply."""
+    data = json.dumps(
+        [model, messages, temperature, tools or []],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier LRU cache of reply texts.
+
+    ``hits`` and ``misses`` count lookups. ``saved_tokens`` adds up the
+    tokens that the cached requests had used, so it estimates the tokens
+    that hits did not spend again.
+
+    Parameters
+    ----------
+    maxsize:
+        Number of replies kept in memory.
+    path:
+        SQLite file for the disk tier. ``None`` keeps the cache in memory.
+    ttl:
+        Seconds after which an entry expires. ``None`` never expires.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        *,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._memory: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                "tokens INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, entry: Tuple[str, int, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply for ``key`` or ``None``."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[2]):
+                del self._memory[key]
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT content, tokens, created FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and self._expired(row[2]):
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                elif row is not None:
+                    entry = (row[0], row[1], row[2])
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            self.saved_tokens += entry[1]
+            return entry[0]
+
+    def put(self, key: str, content: str, tokens: int = 0) -> None:
+        """Store ``content`` which cost ``tokens`` to produce."""
+        entry = (content, tokens, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                        (key, *entry),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as exc:
+                    logger.warning("Failed to persist cached response: %s", exc)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+            self.hits = 0
+            self.misses = 0
+            self.saved_tokens = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
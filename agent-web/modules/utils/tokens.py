@@ -0,0 +1,36 @@
+"""Local token counting for prompts and replies."""
+
+from functools import lru_cache
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        logger.warning("tiktoken encoding unavailable, estimating token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally.
+
+    Uses ``tiktoken`` when installed. Otherwise ASCII text is estimated at
+    four characters per token and every other character, such as Japanese,
+    as one token, which errs on the side of overcounting.
+    """
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (ascii_chars + 3) // 4 + len(text) - ascii_chars
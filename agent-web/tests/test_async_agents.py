@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+from pydantic import BaseModel
+
+from modules.agents import CoTAgent, ReActAgent, ToTAgent
+from modules.agents.evaluator import CachedEvaluator, LLMEvaluator
+from modules.tools.base import Tool
+
+
+class AsyncClient:
+    """Only offers ``achat`` and records how many calls overlapped."""
+
+    def __init__(self, replies=None):
+        self.replies = list(replies or [])
+        self.active = 0
+        self.peak = 0
+
+    def chat(self, messages, stream=False):
+        raise AssertionError("blocking call from async agent")
+
+    async def achat(self, messages, temperature=0.7):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        prompt = messages[0]["content"]
+        if self.replies:
+            return self.replies.pop(0)
+        if "JSON配列" in prompt:
+            return "[0.2, 0.8, 0.5, 0.5]"
+        if "スコア" in prompt:
+            return "0.5"
+        if "箇条書き" in prompt:
+            return "- A\n- B"
+        return "最終的な答え: done"
+
+
+async def collect(steps):
+    return [step async for step in steps]
+
+
+def test_tot_arun_iter_overlaps_requests():
+    client = AsyncClient()
+    agent = ToTAgent(
+        client, max_depth=2, breadth=2, evaluator=LLMEvaluator(client)
+    )
+    steps = asyncio.run(collect(agent.arun_iter("q")))
+    assert steps[-1] == "最終的な答え: done"
+    assert client.peak == 2
+    assert isinstance(agent.evaluate, CachedEvaluator)
+    assert agent.evaluate.misses > 0
+
+
+class EchoArgs(BaseModel):
+    text: str
+
+
+def test_react_arun_iter_runs_tools_off_loop():
+    client = AsyncClient(['行動: echo: {"text": "hi"}', "最終的な答え: hi"])
+    threads = []
+
+    def echo(text):
+        threads.append(threading.get_ident())
+        return text
+
+    tool = Tool(name="echo", description="echo", func=echo, args_schema=EchoArgs)
+    agent = ReActAgent(client, [tool])
+    steps = asyncio.run(collect(agent.arun_iter("q")))
+    assert steps[1] == "観察: hi"
+    assert steps[-1] == "hi"
+    assert threads and threads[0] != threading.get_ident()
+
+
+def test_cot_arun_iter_falls_back_to_blocking_client():
+    class BlockingClient:
+        def chat(self, messages, stream=False):
+            return "最終的な答え: ok"
+
+    agent = CoTAgent(BlockingClient())
+    assert asyncio.run(collect(agent.arun_iter("q"))) == ["最終的な答え: ok", "ok"]
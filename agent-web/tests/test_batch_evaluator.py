@@ -0,0 +1,44 @@
+from modules.agents import LLMEvaluator, ToTAgent
+from modules.agents.evaluator import parse_scores
+
+
+class QueueClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def chat(self, messages, stream=False):
+        self.prompts.append(messages[0]["content"])
+        return self.responses.pop(0)
+
+
+def test_parse_scores_handles_noise():
+    assert parse_scores("スコア: [0.1, 0.9]", 2) == [0.1, 0.9]
+    assert parse_scores("[0.5, \"x\"]", 3) == [0.5, None, None]
+    assert parse_scores("no json", 2) == [None, None]
+
+
+def test_evaluate_many_uses_one_call_and_falls_back():
+    client = QueueClient(["[0.2, \"?\", 0.7]", "0.4"])
+    scores = LLMEvaluator(client).evaluate_many(["a", "b", "c"])
+    assert scores == [0.2, 0.4, 0.7]
+    assert len(client.prompts) == 2
+    assert "候補3" in client.prompts[0]
+
+
+def test_tot_agent_prefers_batch_interface():
+    calls = []
+
+    class Batch:
+        def __call__(self, history):
+            raise AssertionError("single evaluation used")
+
+        def evaluate_many(self, histories):
+            calls.append(list(histories))
+            return [1.0 if "B" in h else 0.0 for h in histories]
+
+    client = QueueClient(["- A\n- B", "最終的な答え: done"])
+    agent = ToTAgent(client, max_depth=1, breadth=2, evaluator=Batch())
+    assert agent.run("q") == "done"
+    assert calls == [["A", "B"]]
+    assert "B" in client.prompts[-1]
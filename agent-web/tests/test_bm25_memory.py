@@ -0,0 +1,28 @@
+from modules.memory.bm25_memory import BM25Memory
+
+
+def test_bm25_ranks_relevant_messages_first():
+    mem = BM25Memory()
+    mem.add("user", "今日は良い天気です")
+    mem.add("assistant", "SQLのクエリを実行しました")
+    mem.add("user", "天気予報によると明日の天気は雨")
+    mem.add("user", "Python code review")
+
+    assert mem.search("明日の天気", top_k=2) == [
+        "天気予報によると明日の天気は雨",
+        "今日は良い天気です",
+    ]
+    assert mem.search("python", top_k=3) == ["Python code review"]
+    assert mem.search("存在しない") == []
+
+
+def test_bm25_index_survives_reload(tmp_path):
+    mem = BM25Memory()
+    mem.add("user", "hello world")
+    file = tmp_path / "bm25.json"
+    mem.save(file)
+    other = BM25Memory()
+    other.load(file)
+    assert other.search("world") == ["hello world"]
+    other.clear()
+    assert other.search("world") == []
@@ -0,0 +1,52 @@
+from modules.agents import CoTAgent
+from modules.agents.context_builder import ContextBuilder, TRUNCATION_MARK
+
+
+def count_chars(text: str) -> int:
+    return len(text)
+
+
+def test_everything_fits():
+    builder = ContextBuilder(max_tokens=100, counter=count_chars)
+    ctx = builder.build("q", "pad", ["m1", "m2"])
+    assert ctx.history == "m1\nm2"
+    assert ctx.scratchpad == "pad"
+    assert ctx.dropped_tokens == 0
+
+
+def test_scratchpad_keeps_recent_end_before_memory():
+    builder = ContextBuilder(max_tokens=30, counter=count_chars)
+    pad = "old " * 10 + "recent"
+    ctx = builder.build("question", pad, ["memory line"])
+    assert ctx.scratchpad.startswith(TRUNCATION_MARK)
+    assert ctx.scratchpad.endswith("recent")
+    assert ctx.history == ""
+    assert ctx.tokens <= 30
+    assert ctx.dropped_tokens > 0
+
+
+def test_memory_is_truncated_to_remaining_budget():
+    builder = ContextBuilder(max_tokens=40, counter=count_chars)
+    ctx = builder.build("q", "", ["short", "x" * 100])
+    lines = ctx.history.split("\n")
+    assert lines[0] == "short"
+    assert lines[1].endswith(TRUNCATION_MARK)
+    assert ctx.tokens <= 40
+
+
+class RecordingClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def chat(self, messages, stream=False):
+        self.prompts.append(messages[0]["content"])
+        return self.responses.pop(0)
+
+
+def test_agent_prompt_respects_budget():
+    client = RecordingClient(["思考: " + "長い" * 200, "最終的な答え: ok"])
+    builder = ContextBuilder(max_tokens=150, counter=count_chars)
+    agent = CoTAgent(client, context_builder=builder)
+    assert agent.run("質問") == "ok"
+    assert len(client.prompts[1]) <= 150 + len(TRUNCATION_MARK)
@@ -0,0 +1,30 @@
+from modules.memory.conversation_memory import ConversationMemory
+
+
+def _scan(messages, query, top_k):
+    q = query.lower()
+    return [m["content"] for m in messages if q in m["content"].lower()][:top_k]
+
+
+def test_search_matches_linear_scan():
+    mem = ConversationMemory()
+    texts = [
+        "Hello World", "今日は良い天気です", "天気予報を確認", "WORLD cup",
+        "h", "", "明日の天気は晴れ", "Say hello again",
+    ]
+    for t in texts:
+        mem.add("user", t)
+    for query in ["hello", "world", "天気", "天", "h", "", "xyz", "天気は晴"]:
+        for top_k in (1, 3, 10):
+            assert mem.search(query, top_k=top_k) == _scan(mem.messages, query, top_k)
+
+
+def test_index_resets_on_clear_and_load(tmp_path):
+    mem = ConversationMemory()
+    mem.add("user", "alpha beta")
+    file = tmp_path / "conv.json"
+    mem.save(file)
+    mem.clear()
+    assert mem.search("alpha") == []
+    mem.load(file)
+    assert mem.search("ALPHA") == ["alpha beta"]
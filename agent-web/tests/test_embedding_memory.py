@@ -0,0 +1,65 @@
+import numpy as np
+
+from modules.memory.embedding_memory import EmbeddingMemory, HashingEmbedder
+
+
+def test_search_returns_closest_messages():
+    mem = EmbeddingMemory()
+    mem.add("user", "今日は良い天気です")
+    mem.add("assistant", "SQLのクエリを書きました")
+    mem.add("user", "明日の天気はどうですか")
+
+    results = mem.search("天気", top_k=2)
+    assert set(results) == {"今日は良い天気です", "明日の天気はどうですか"}
+
+
+def test_matrix_grows_and_rows_are_normalized():
+    mem = EmbeddingMemory(embed=HashingEmbedder(dim=16))
+    for i in range(100):
+        mem.add("user", f"message number {i}")
+    assert mem._size == 100
+    assert mem._matrix.shape[0] >= 100
+    norms = np.linalg.norm(mem._matrix[:100], axis=1)
+    # Opposite-signed hash collisions may cancel out to an all-zero row
+    assert np.allclose(norms[norms > 0], 1.0, atol=1e-5)
+
+
+def test_injected_embedder_is_used():
+    vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "q": [0.9, 0.1]}
+    mem = EmbeddingMemory(embed=lambda text: vectors[text])
+    mem.add("user", "a")
+    mem.add("user", "b")
+    assert mem.search("q", top_k=1) == ["a"]
+
+
+def test_save_and_load_maps_vectors(tmp_path):
+    mem = EmbeddingMemory()
+    mem.add("user", "今日は良い天気です")
+    mem.add("assistant", "SQLのクエリ")
+    file = tmp_path / "emb.json"
+    mem.save(file)
+
+    other = EmbeddingMemory()
+    other.load(file)
+    assert isinstance(other._matrix, np.memmap)
+    assert other.search("天気", top_k=1) == ["今日は良い天気です"]
+    other.add("user", "明日の天気")
+    assert not isinstance(other._matrix, np.memmap)
+    assert len(other.search("天気", top_k=3)) == 2
+
+
+def test_save_after_load_releases_the_mapping(tmp_path):
+    file = tmp_path / "emb.json"
+    mem = EmbeddingMemory()
+    mem.add("user", "今日は良い天気です")
+    mem.save(file)
+
+    other = EmbeddingMemory()
+    other.load(file)
+    assert isinstance(other._matrix, np.memmap)
+    other.save(file)
+    assert not isinstance(other._matrix, np.memmap)
+
+    third = EmbeddingMemory()
+    third.load(file)
+    assert third.search("天気") == ["今日は良い天気です"]
@@ -0,0 +1,94 @@
+from modules.agents import ToTAgent
+from modules.agents.evaluator import CachedEvaluator
+
+
+def test_cache_hits_on_normalized_history():
+    calls = []
+
+    def evaluate(history):
+        calls.append(history)
+        return 0.5
+
+    cached = CachedEvaluator(evaluate, maxsize=2)
+    assert cached("a  b") == 0.5
+    assert cached("a b\n") == 0.5
+    assert calls == ["a  b"]
+    assert (cached.hits, cached.misses) == (1, 1)
+    assert cached.evaluate_many is None
+
+
+def test_cache_is_bounded_and_keyed_by_model():
+    calls = []
+
+    def evaluate(history):
+        calls.append(history)
+        return 0.1
+
+    small = CachedEvaluator(evaluate, maxsize=1, model="m1")
+    small("x")
+    small("y")
+    small("x")
+    assert calls == ["x", "y", "x"]
+    other = CachedEvaluator(evaluate, model="m2")
+    assert other._key("x") != small._key("x")
+
+
+def test_batch_dedupes_and_skips_cached():
+    batches = []
+
+    class Batch:
+        def __call__(self, history):
+            return 0.0
+
+        def evaluate_many(self, histories):
+            batches.append(list(histories))
+            return [float(len(h)) for h in histories]
+
+    cached = CachedEvaluator(Batch())
+    assert cached.evaluate_many(["a", "bb", "a"]) == [1.0, 2.0, 1.0]
+    assert cached.evaluate_many(["bb", "ccc"]) == [2.0, 3.0]
+    assert batches == [["a", "bb"], ["ccc"]]
+
+
+def test_tot_scores_duplicate_candidates_once():
+    calls = []
+
+    def evaluate(history):
+        calls.append(history)
+        return 1.0 if "B" in history else 0.0
+
+    class Client:
+        def chat(self, messages, stream=False):
+            if "箇条書き" in messages[0]["content"]:
+                return "- A\n- B\n- B"
+            return "最終的な答え: ok"
+
+    agent = ToTAgent(Client(), max_depth=1, breadth=2, evaluator=evaluate)
+    assert agent.run("q") == "ok"
+    assert sorted(calls) == ["A", "B"]
+
+
+def test_thought_boundaries_are_part_of_the_key():
+    cached = CachedEvaluator(lambda h: 0.0)
+    assert cached._key("A B") != cached._key("A\nB")
+    assert cached._key("A  B\n\n C ") == cached._key("A B\nC")
+
+
+def test_tot_cache_is_keyed_by_client_model():
+    calls = []
+
+    def evaluate(history):
+        calls.append(history)
+        return 0.5
+
+    class Client:
+        def __init__(self, model):
+            self.model = model
+
+        def chat(self, messages, stream=False):
+            return "- A"
+
+    first = ToTAgent(Client("m1"), max_depth=1, breadth=1, evaluator=evaluate)
+    second = ToTAgent(Client("m2"), max_depth=1, breadth=1, evaluator=evaluate)
+    assert first.evaluate.model == "m1"
+    assert first.evaluate._key("A") != second.evaluate._key("A")
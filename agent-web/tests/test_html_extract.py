@@ -0,0 +1,90 @@
+from modules.tools.html_extract import (
+    TextExtractor,
+    extract_chunks,
+    extract_plain,
+    extract_text,
+    sniff_encoding,
+)
+
+
+def test_extracts_main_without_noise():
+    html = (
+        b"<html><body><nav>menu</nav><main><script>var x=1;</script>"
+        b"<p>Hi</p><p>A &amp; B</p><footer>foot</footer></main></body></html>"
+    )
+    assert extract_text(html) == "Hi A & B"
+
+
+def test_falls_back_to_article_then_body():
+    assert extract_text(b"<body><p>x</p><article>art</article></body>") == "art"
+    assert extract_text(b"<body><header>h</header>just <b>body</b></body>") == "just body"
+    assert extract_text(b"<html><head><title>t</title></head></html>") is None
+
+
+def test_stops_once_enough_text():
+    extractor = TextExtractor(max_chars=10)
+    extractor.feed("<main><p>" + "word " * 10 + "</p><p>")
+    assert extractor.done
+    extractor.feed("<p>ignored</p>" * 1000)
+    extractor.close()
+    assert extractor.text() == "word word "
+
+
+def test_text_split_across_chunks():
+    extractor = TextExtractor()
+    for chunk in ["<main><p>Hel", "lo</p> <p>Wor", "ld</p></main>"]:
+        extractor.feed(chunk)
+    extractor.close()
+    assert extractor.text() == "Hello World"
+
+
+def test_sniff_encoding():
+    assert sniff_encoding(b"", "text/html; charset=Shift_JIS") == "shift_jis"
+    assert sniff_encoding(b'<meta charset="euc-jp">') == "euc_jp"
+    assert sniff_encoding(b"<html>", "text/html; charset=bogus") == "utf-8"
+    html = '<meta charset="shift_jis"><main>日本語</main>'.encode("shift_jis")
+    assert extract_text(html) == "日本語"
+
+
+def test_chunks_are_read_lazily():
+    read = []
+
+    def chunks():
+        for i in range(1000):
+            read.append(i)
+            yield b"<main>" + b"text " * 100 if i == 0 else b"<p>more</p>"
+
+    assert extract_chunks(chunks(), 20) == "text text text text "
+    assert len(read) < 1000
+
+
+def test_plain_text_across_chunks():
+    assert extract_plain([b"hel", b"lo  wor", b"ld\nfoo"]) == "hello world foo"
+    assert extract_plain([b"hello world foo"], 7) == "hello w"
+
+
+def test_comments_separate_text():
+    assert extract_text(b"<body>x y<!-- c -->x y</body>") == "x y x y"
+    assert extract_text(b"<!DOCTYPE html><body>a<?pi x?>b</body>") == "a b"
+
+
+def test_main_inside_skipped_tags_is_ignored():
+    html = b"<body><nav><main>menu</main></nav><p>rest</p></body>"
+    assert extract_text(html) == "rest"
+
+
+def test_stops_once_article_or_body_is_full():
+    for container in ("article", "body"):
+        extractor = TextExtractor(max_chars=10)
+        extractor.feed(f"<{container}><p>" + "word " * 10 + "</p>")
+        assert extractor.done
+        extractor.close()
+        assert extractor.text() == "word word "
+
+
+def test_seen_article_is_not_replaced_by_full_body():
+    extractor = TextExtractor(max_chars=10)
+    extractor.feed("<body>pre <article>short</article>" + "word " * 10)
+    assert not extractor.done
+    extractor.close()
+    assert extractor.text() == "short"
@@ -0,0 +1,115 @@
+import json
+
+from modules.memory.conversation_memory import ConversationMemory
+from modules.memory.journal import MIN_OBSOLETE, MessageJournal
+
+
+def test_journal_appends_one_line_per_message(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    mem = ConversationMemory()
+    mem.open_journal(file)
+    mem.add("user", "hello")
+    mem.add("assistant", "こんにちは")
+
+    lines = file.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == mem.messages
+    assert "こんにちは" in lines[1]
+
+
+def test_journal_reload_and_clear(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    mem = ConversationMemory()
+    mem.open_journal(file)
+    mem.add("user", "old")
+    mem.clear()
+    mem.add("user", "new")
+    mem.close_journal()
+
+    other = ConversationMemory()
+    other.load(file)
+    assert other.messages == [{"role": "user", "content": "new"}]
+    assert other.search("new") == ["new"]
+
+
+def test_compaction_drops_cleared_records(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    mem = ConversationMemory()
+    mem.open_journal(file, compact_every=3)
+    mem.add("user", "a")
+    mem.add("user", "b")
+    mem.clear()
+    mem.add("user", "c")
+    assert file.read_text(encoding="utf-8").splitlines() == [
+        '{"role":"user","content":"c"}'
+    ]
+
+
+def test_torn_tail_is_repaired(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    file.write_text('{"role":"user","content":"a"}\n{"role":"us', encoding="utf-8")
+    mem = ConversationMemory()
+    mem.open_journal(file)
+    mem.add("user", "b")
+    mem.close_journal()
+
+    other = ConversationMemory()
+    other.load(file)
+    assert [m["content"] for m in other.messages] == ["a", "b"]
+
+
+def test_save_jsonl(tmp_path):
+    mem = ConversationMemory()
+    mem.add("user", "hi")
+    file = tmp_path / "nested" / "conv.jsonl"
+    mem.save(file)
+    other = ConversationMemory()
+    other.load(file)
+    assert other.messages == mem.messages
+
+
+def test_compaction_once_obsolete_records_outnumber_live_ones(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    mem = ConversationMemory()
+    mem.open_journal(file, compact_every=0)
+    for i in range(MIN_OBSOLETE - 1):
+        mem.add("user", str(i))
+    mem.clear()
+    assert len(file.read_text(encoding="utf-8").splitlines()) == MIN_OBSOLETE
+    mem.add("user", "kept")
+    mem.clear()
+    assert file.read_text(encoding="utf-8") == ""
+
+
+def test_load_resets_open_journal(tmp_path):
+    source = tmp_path / "source.json"
+    other = ConversationMemory()
+    other.add("user", "loaded")
+    other.save(source)
+
+    file = tmp_path / "conv.jsonl"
+    mem = ConversationMemory()
+    mem.open_journal(file)
+    mem.add("user", "before")
+    mem.load(source)
+    mem.add("assistant", "after")
+    mem.close_journal()
+
+    reread = ConversationMemory()
+    reread.load(file)
+    assert [m["content"] for m in reread.messages] == ["loaded", "after"]
+
+
+def test_journal_keeps_metadata_and_message_keys(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    journal = MessageJournal(file)
+    journal.write_meta({"title": "a"})
+    journal.append({"role": "tool", "tool_call_id": "1", "content": "ok"})
+    journal.write_meta({"title": "b"})
+    journal.close()
+
+    reread = MessageJournal(file)
+    assert reread.read() == [{"role": "tool", "tool_call_id": "1", "content": "ok"}]
+    assert reread.meta == {"title": "b"}
+    reread.compact(reread.read())
+    assert len(file.read_text(encoding="utf-8").splitlines()) == 2
+    assert reread.read() and reread.meta == {"title": "b"}
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from modules.utils.llm_client import LLMClient, buffer_deltas
+
+
+def _client(create):
+    client = LLMClient(api_key="test", model="m")
+    client.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    return client
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def test_chat_without_stream_returns_text():
+    def create(model, messages, temperature, stream=False):
+        assert not stream
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="hello"))]
+        )
+
+    client = _client(create)
+    assert client.chat([{"role": "user", "content": "hi"}], stream=False) == "hello"
+    assert client.complete([{"role": "user", "content": "hi"}]) == "hello"
+
+
+def test_stream_skips_empty_deltas():
+    def create(model, messages, temperature, stream=False):
+        assert stream
+        return [_chunk("a"), _chunk(None), _chunk("b")]
+
+    client = _client(create)
+    assert list(client.stream([])) == ["a", "b"]
+    assert list(client.chat([])) == ["a", "b"]
+
+
+def test_buffer_deltas_passes_first_delta_and_coalesces_rest():
+    pieces = list(buffer_deltas(["a"] + ["x"] * 10, min_chars=4, max_delay=60))
+    assert pieces == ["a", "xxxx", "xxxx", "xx"]
+    assert list(buffer_deltas([])) == []
@@ -1,6 +1,7 @@
 import json
 from types import SimpleNamespace
 from src.ui import main as GPT
+from modules.memory.journal import MessageJournal
 
 ChatGPTClient = GPT.ChatGPTClient
 
@@ -30,3 +31,22 @@ def test_load_conversation(tmp_path):
     assert client.current_title == "Chat"
     assert client.messages == data["messages"]
     assert client.uploaded_files == [{"name": "f.pdf", "type": ".pdf"}]
+
+
+def test_load_journal_keeps_appending(tmp_path):
+    file = tmp_path / "conv.jsonl"
+    journal = MessageJournal(file)
+    journal.write_meta({"title": "Chat", "uploaded_files_metadata": []})
+    journal.append({"role": "user", "content": "hi"})
+    journal.close()
+
+    client = _client()
+    client.model_var = SimpleNamespace(get=lambda: "model-x")
+    client.load_conversation(str(file))
+    assert client.current_title == "Chat"
+    assert client.messages == [{"role": "user", "content": "hi"}]
+
+    client.messages.append({"role": "assistant", "content": "ok"})
+    client.save_conversation(show_popup=False)
+    assert MessageJournal(file).read() == client.messages
+    assert list(tmp_path.glob("*.jsonl")) == [file]
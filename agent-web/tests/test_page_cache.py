@@ -0,0 +1,46 @@
+import time
+
+from modules.tools.page_cache import PageCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = PageCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a").text == "aaaa"
+    assert cache.nbytes == 8
+
+
+def test_size_counts_utf8_bytes():
+    cache = PageCache(max_bytes=10)
+    cache.put("a", "日本語です")
+    assert cache.get("a") is None
+    assert cache.nbytes == 0
+
+
+def test_expired_pages_without_validators_are_dropped():
+    cache = PageCache(ttl=0.01)
+    cache.put("a", "old")
+    cache.put("b", "old", etag='"v1"')
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    stale = cache.get("b")
+    assert not stale.fresh
+    assert stale.validators() == {"If-None-Match": '"v1"'}
+    assert cache.refresh("b", stale).fresh
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "pages.db")
+    cache = PageCache(path=path)
+    cache.put("a", "full text", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    cache.close()
+
+    reopened = PageCache(path=path)
+    page = reopened.get("a")
+    assert page.text == "full text"
+    assert page.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+    reopened.close()
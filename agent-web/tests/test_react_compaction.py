@@ -0,0 +1,56 @@
+from pydantic import BaseModel
+
+from modules.agents import ReActAgent
+from modules.tools.base import Tool
+
+
+class EchoInput(BaseModel):
+    text: str
+
+
+class RecordingClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def chat(self, messages, stream=False):
+        self.prompts.append(messages[0]["content"])
+        return self.responses.pop(0)
+
+
+def _echo_tool():
+    return Tool(
+        name="echo",
+        description="repeat",
+        func=lambda text: text * 300,
+        args_schema=EchoInput,
+    )
+
+
+def test_old_observations_are_digested_and_recallable():
+    client = RecordingClient([
+        '行動: echo: {"text": "a"}',
+        '行動: echo: {"text": "b"}',
+        '行動: echo: {"text": "c"}',
+        '行動: recall_observation: {"index": 0}',
+        "最終的な答え: done",
+    ])
+    agent = ReActAgent(client, [_echo_tool()], keep_observations=2, digest_chars=10)
+    steps = list(agent.run_iter("q"))
+
+    assert steps[-1] == "done"
+    fourth = client.prompts[3]
+    assert "a" * 300 not in fourth
+    assert "#0" in fourth and "recall_observation" in fourth
+    assert "b" * 300 in fourth and "c" * 300 in fourth
+    assert "観察: " + "a" * 300 in steps
+    assert "a" * 300 in client.prompts[4]
+
+
+def test_prompt_growth_is_bounded_by_digests():
+    responses = [f'行動: echo: {{"text": "{i}"}}' for i in range(5)]
+    client = RecordingClient(responses + ["最終的な答え: ok"])
+    agent = ReActAgent(client, [_echo_tool()], keep_observations=1, digest_chars=20)
+    agent.run("q", max_turns=6)
+    growth = [len(b) - len(a) for a, b in zip(client.prompts, client.prompts[1:])]
+    assert max(growth[1:]) < 400
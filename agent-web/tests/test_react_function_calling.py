@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from pydantic import BaseModel, Field
+
+from modules.agents import ReActAgent
+from modules.tools import Tool, tool_schema
+
+
+class AddArgs(BaseModel):
+    a: int = Field(description="first")
+    b: int = 0
+
+
+def add(a, b):
+    return a + b
+
+
+ADD = Tool(name="add", description="足し算", func=add, args_schema=AddArgs)
+
+
+def _call(cid, name, arguments):
+    return SimpleNamespace(
+        id=cid, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+def _reply(content=None, calls=None):
+    message = SimpleNamespace(content=content, tool_calls=calls)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class ToolClient:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def with_tools(self, messages, tools):
+        self.requests.append((messages, tools))
+        return self.replies.pop(0)
+
+
+def test_schema_is_derived_from_args_model():
+    schema = tool_schema(ADD)
+    assert schema["function"]["name"] == "add"
+    params = schema["function"]["parameters"]
+    assert params["required"] == ["a"]
+    assert params["properties"]["a"] == {"description": "first", "type": "integer"}
+    assert "title" not in params
+
+
+def test_tool_calls_are_executed_and_answered():
+    client = ToolClient([
+        _reply(calls=[_call("c1", "add", '{"a": 2, "b": 3}'), _call("c2", "add", "[1]")]),
+        _reply(content="5です"),
+    ])
+    agent = ReActAgent(client, [ADD], function_calling=True)
+    steps = list(agent.run_iter("2+3は?"))
+    assert steps[:3] == ['行動: add: {"a": 2, "b": 3}', "行動: add: [1]", "観察: 5"]
+    assert steps[3].startswith("観察: Invalid arguments for add")
+    assert steps[-2:] == ["最終的な答え: 5です", "5です"]
+
+    messages, tools = client.requests[1]
+    assert tools == [tool_schema(ADD)]
+    assert "足し算" not in messages[0]["content"] + messages[1]["content"]
+    assert [m["role"] for m in messages[2:]] == ["assistant", "tool", "tool"]
+    assert messages[3] == {"role": "tool", "tool_call_id": "c1", "content": "5"}
+
+
+def test_old_tool_results_are_digested_and_recallable():
+    long_args = '{"a": %d}' % (10 ** 300)
+    client = ToolClient([
+        _reply(calls=[_call("c1", "add", long_args)]),
+        _reply(calls=[_call("c2", "add", '{"a": 1}')]),
+        _reply(calls=[_call("c3", "recall_observation", '{"index": 0}')]),
+        _reply(content="done"),
+    ])
+    agent = ReActAgent(
+        client, [ADD], function_calling=True, keep_observations=1, digest_chars=20
+    )
+    steps = list(agent.run_iter("q"))
+    messages, tools = client.requests[2]
+    assert "recall_observation" in messages[2 + 1]["content"]
+    assert tools[-1]["function"]["name"] == "recall_observation"
+    recalled = steps[steps.index('行動: recall_observation: {"index": 0}') + 1]
+    assert recalled == "観察: " + str(10 ** 300)
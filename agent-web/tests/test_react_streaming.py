@@ -0,0 +1,71 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from modules.agents import ReActAgent
+from modules.tools.base import Tool
+
+ACTION_TURN = ["思考: 調べる\n行動: ec", 'ho: {"text": "hi"}', "\n観察: 幻覚", "\n" * 5]
+FINAL_TURN = ["最終的な答え: ", "hi"]
+
+
+class StreamingClient:
+    def __init__(self):
+        self.turns = [ACTION_TURN, FINAL_TURN]
+        self.consumed = 0
+        self.closed = 0
+
+    def _next(self):
+        return self.turns.pop(0)
+
+    def stream(self, messages):
+        try:
+            for delta in self._next():
+                self.consumed += 1
+                yield delta
+        finally:
+            self.closed += 1
+
+    async def astream(self, messages):
+        for delta in self._next():
+            self.consumed += 1
+            yield delta
+
+
+class EchoArgs(BaseModel):
+    text: str
+
+
+def _agent(client):
+    tool = Tool(name="echo", description="echo", func=lambda text: text, args_schema=EchoArgs)
+    return ReActAgent(client, [tool], stream=True)
+
+
+def test_generation_is_cancelled_after_action_line():
+    client = StreamingClient()
+    steps = list(_agent(client).run_iter("q"))
+    assert steps[0] == '思考: 調べる\n行動: echo: {"text": "hi"}'
+    assert steps[1] == "観察: hi"
+    assert steps[-1] == "hi"
+    # The hallucinated observation and trailing newlines were never read
+    assert client.consumed == 3 + len(FINAL_TURN)
+    assert client.closed == 2
+
+
+def test_async_streaming_matches_blocking():
+    client = StreamingClient()
+
+    async def collect():
+        return [step async for step in _agent(client).arun_iter("q")]
+
+    steps = asyncio.run(collect())
+    assert steps[1] == "観察: hi"
+    assert client.consumed == 3 + len(FINAL_TURN)
+
+
+def test_client_without_stream_falls_back():
+    class Blocking:
+        def chat(self, messages, stream=False):
+            return "最終的な答え: ok"
+
+    assert _agent(Blocking()).run("q") == "ok"
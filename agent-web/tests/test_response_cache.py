@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from modules.agents.evaluator import LLMEvaluator
+from modules.utils.llm_client import LLMClient
+from modules.utils import response_cache
+from modules.utils.response_cache import ResponseCache, cache_key
+from modules.utils.tokens import count_tokens
+
+
+class CountingCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, messages, temperature, stream=False):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="0.7"))],
+            usage=SimpleNamespace(total_tokens=12),
+        )
+
+
+def _client(cache, **kwargs):
+    client = LLMClient(api_key="test", model="m", cache=cache, **kwargs)
+    completions = CountingCompletions()
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return client, completions
+
+
+def test_key_depends_on_every_request_field():
+    messages = [{"role": "user", "content": "hi"}]
+    base = cache_key("m", messages, 0)
+    assert base == cache_key("m", [dict(messages[0])], 0)
+    assert base != cache_key("other", messages, 0)
+    assert base != cache_key("m", messages, 0.5)
+    assert base != cache_key("m", messages, 0, [{"type": "function"}])
+
+
+def test_only_deterministic_requests_are_cached():
+    cache = ResponseCache()
+    client, completions = _client(cache)
+    messages = [{"role": "user", "content": "hi"}]
+    client.complete(messages)
+    client.complete(messages)
+    assert completions.calls == 2
+    client.complete(messages, temperature=0)
+    client.complete(messages, temperature=0)
+    assert completions.calls == 3
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "saved_tokens": 12}
+
+
+def test_cache_all_applies_to_sampled_requests():
+    client, completions = _client(ResponseCache(), cache_all=True)
+    client.complete([{"role": "user", "content": "hi"}])
+    client.complete([{"role": "user", "content": "hi"}])
+    assert completions.calls == 1
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    first, completions = _client(ResponseCache(path=path))
+    evaluator = LLMEvaluator(first)
+    assert evaluator("思考") == 0.7
+    first.cache.close()
+
+    cache = ResponseCache(path=path, ttl=60)
+    second, completions = _client(cache)
+    assert LLMEvaluator(second)("思考") == 0.7
+    assert completions.calls == 0
+
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 120)
+    cache._memory.clear()
+    assert cache.get(cache_key("m", [{"role": "user", "content": "x"}], 0)) is None
+    LLMEvaluator(second)("思考")
+    assert completions.calls == 1
+
+
+def test_memory_tier_is_bounded():
+    cache = ResponseCache(maxsize=2)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
+
+
+class ToolCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, messages, tools, tool_choice, **kwargs):
+        self.calls += 1
+        call = {"id": "1", "type": "function", "function": {"name": "f", "arguments": "{}"}}
+        return ChatCompletion.model_validate({
+            "id": "c", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{
+                "index": 0, "finish_reason": "tool_calls",
+                "message": {"role": "assistant", "content": None, "tool_calls": [call]},
+            }],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+        })
+
+
+def test_tool_calls_are_cached_per_tool_set():
+    cache = ResponseCache()
+    client = LLMClient(api_key="test", model="m", cache=cache)
+    completions = ToolCompletions()
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    messages = [{"role": "user", "content": "hi"}]
+    tools = [{"type": "function", "function": {"name": "f"}}]
+    client.with_tools(messages, tools, temperature=0)
+    reply = client.with_tools(messages, tools, temperature=0).choices[0].message
+    assert reply.tool_calls[0].function.name == "f"
+    assert completions.calls == 1
+    client.with_tools(messages, tools + [{"type": "function", "function": {"name": "g"}}], temperature=0)
+    assert completions.calls == 2
+    client.with_tools(messages, tools)
+    assert completions.calls == 3
+    assert cache.saved_tokens == 8
+
+
+class PinnedCompletions:
+    """``chat.completions.create`` with the parameters of the pinned openai 1.6.0."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    def create(
+        self, *, messages, model, frequency_penalty=None, function_call=None,
+        functions=None, logit_bias=None, logprobs=None, max_tokens=None, n=None,
+        presence_penalty=None, response_format=None, seed=None, stop=None,
+        stream=None, temperature=None, tool_choice=None, tools=None,
+        top_logprobs=None, top_p=None, user=None, extra_headers=None,
+        extra_query=None, extra_body=None, timeout=None,
+    ):
+        self.calls += 1
+        return iter(self.chunks)
+
+
+def test_streamed_replies_are_cached_with_estimated_tokens():
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="ok"))])]
+    completions = PinnedCompletions(chunks)
+    cache = ResponseCache()
+    client = LLMClient(api_key="test", model="m", cache=cache)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    messages = [{"role": "user", "content": "hi"}]
+    assert "".join(client.stream(messages, temperature=0)) == "ok"
+    assert list(client.stream(messages, temperature=0)) == ["ok"]
+    assert completions.calls == 1
+    assert cache.saved_tokens == count_tokens("hi") + count_tokens("ok")
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from modules.tools.robots import RobotsCache, RobotsRules
+
+
+class FakeResponse:
+    def __init__(self, text="", status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_longest_match_wins():
+    rules = RobotsRules.parse(
+        "User-agent: *\nDisallow: /private\nAllow: /private/public\n"
+    )
+    assert not rules.can_fetch("/private/data")
+    assert rules.can_fetch("/private/public/page")
+    assert rules.can_fetch("/")
+
+
+def test_wildcards_and_anchor():
+    rules = RobotsRules.parse("User-agent: *\nDisallow: /*.pdf$\nDisallow: /tmp*/x\n")
+    assert not rules.can_fetch("/docs/file.pdf")
+    assert rules.can_fetch("/docs/file.pdf?download=1")
+    assert not rules.can_fetch("/tmp123/x")
+
+
+def test_named_group_overrides_star():
+    text = "User-agent: *\nDisallow: /\n\nUser-agent: MyAgent\nDisallow: /admin\n"
+    assert not RobotsRules.parse(text).can_fetch("/page")
+    rules = RobotsRules.parse(text, "MyAgent/2.0")
+    assert rules.can_fetch("/page")
+    assert not rules.can_fetch("/admin")
+
+
+def test_failures_are_cached_briefly():
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        raise OSError("down")
+
+    cache = RobotsCache(error_ttl=0.05)
+    assert cache.rules("http://a", fetch).result().can_fetch("/x")
+    assert cache.rules("http://a", fetch).result().can_fetch("/x")
+    assert len(calls) == 1
+    time.sleep(0.06)
+    cache.rules("http://a", fetch).result()
+    assert len(calls) == 2
+    cache.close()
+
+
+def test_max_age_sets_expiry():
+    def fetch(url):
+        return FakeResponse("User-agent: *\nDisallow: /", headers={"Cache-Control": "max-age=0"})
+
+    cache = RobotsCache(ttl=3600)
+    assert not cache.rules("http://a", fetch).result().can_fetch("/x")
+    assert "http://a" not in cache
+    cache.close()
+
+
+def test_sites_load_concurrently():
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fetch(url):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.1)
+        with lock:
+            active["now"] -= 1
+        return FakeResponse("", status_code=404)
+
+    cache = RobotsCache(max_workers=8)
+    futures = [cache.rules(f"http://h{i}", fetch) for i in range(8)]
+    start = time.monotonic()
+    assert all(f.result().can_fetch("/") for f in futures)
+    assert time.monotonic() - start < 0.5
+    assert active["peak"] > 1
+    cache.close()
@@ -1,7 +1,7 @@
-import json
 from types import SimpleNamespace
 
 from src.ui import main as GPT
+from modules.memory.journal import MessageJournal
 
 ChatGPTClient = GPT.ChatGPTClient
 
@@ -21,19 +21,36 @@ def test_save_conversation(tmp_path, monkeypatch):
     client.save_conversation()
 
     conv_dir = tmp_path / "conversations"
-    files = list(conv_dir.glob("*.json"))
+    files = list(conv_dir.glob("*.jsonl"))
     assert len(files) == 1
 
-    with open(files[0], "r", encoding="utf-8") as f:
-        data = json.load(f)
-
+    journal = MessageJournal(files[0])
+    assert journal.read() == client.messages
+    data = journal.meta
     assert data["title"] == "TestChat"
     assert data["model"] == "model-x"
-    assert data["messages"] == client.messages
     assert data["uploaded_files_metadata"] == [{"name": "file.docx", "type": ".docx"}]
     assert "timestamp" in data
 
 
+def test_save_conversation_appends_new_messages(tmp_path, monkeypatch):
+    client = _client()
+    client.current_title = "TestChat"
+    client.model_var = SimpleNamespace(get=lambda: "model-x")
+    client.messages = [{"role": "user", "content": "hi"}]
+    client.uploaded_files = []
+    monkeypatch.chdir(tmp_path)
+    client.save_conversation(show_popup=False)
+    client.messages.append({"role": "assistant", "content": "hello"})
+    client.save_conversation(show_popup=False)
+
+    files = list((tmp_path / "conversations").glob("*.jsonl"))
+    assert len(files) == 1
+    # One metadata record and one line per message
+    assert len(files[0].read_text(encoding="utf-8").splitlines()) == 3
+    assert MessageJournal(files[0]).read() == client.messages
+
+
 def test_save_conversation_with_tool(tmp_path, monkeypatch):
     client = _client()
     client.current_title = "ToolChat"
@@ -59,11 +76,8 @@ def test_save_conversation_with_tool(tmp_path, monkeypatch):
     client.save_conversation()
 
     conv_dir = tmp_path / "conversations"
-    files = list(conv_dir.glob("*.json"))
-    with open(files[0], "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    assert data["messages"] == client.messages
+    files = list(conv_dir.glob("*.jsonl"))
+    assert MessageJournal(files[0]).read() == client.messages
 
 
 def test_save_conversation_custom_dir(tmp_path, monkeypatch):
@@ -79,5 +93,5 @@ def test_save_conversation_custom_dir(tmp_path, monkeypatch):
 
     client.save_conversation(show_popup=False)
 
-    files = list(custom.glob("*.json"))
+    files = list(custom.glob("*.jsonl"))
     assert len(files) == 1
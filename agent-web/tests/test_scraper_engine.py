@@ -0,0 +1,225 @@
+import threading
+import time
+
+from modules.tools.page_cache import PageCache
+from modules.tools.scraper_engine import ScraperEngine, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            self.read += chunk_size
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, page="<html><body><main>Hello World</main></body></html>", delay=0.0):
+        self.page = page
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.calls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if url.endswith("robots.txt"):
+                return FakeResponse("User-agent: *\nAllow: /")
+            time.sleep(self.delay)
+            return FakeResponse(self.page)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def close(self):
+        pass
+
+
+def _run_all(func, args):
+    threads = [threading.Thread(target=func, args=a) for a in args]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_different_hosts_fetch_concurrently():
+    session = FakeSession(delay=0.2)
+    engine = ScraperEngine(delay=0, session=session)
+    hosts = [f"http://h{i}.example.com/" for i in range(4)]
+    start = time.monotonic()
+    _run_all(engine.scrape, [(h,) for h in hosts])
+    assert time.monotonic() - start < 0.6
+    assert session.peak > 1
+
+
+def test_identical_urls_are_fetched_once():
+    session = FakeSession(delay=0.2)
+    engine = ScraperEngine(delay=0, session=session)
+    results = []
+    _run_all(lambda: results.append(engine.scrape("http://example.com/a")), [()] * 5)
+    assert results == ["Hello World"] * 5
+    assert session.calls.count("http://example.com/a") == 1
+    assert session.calls.count("http://example.com/robots.txt") == 1
+
+
+def test_cache_keeps_full_text():
+    session = FakeSession()
+    engine = ScraperEngine(delay=0, session=session)
+    assert engine.scrape("http://example.com/", max_chars=5) == "Hello"
+    assert engine.scrape("http://example.com/", max_chars=100) == "Hello World"
+    assert session.calls.count("http://example.com/") == 1
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # The first token is free, the other three wait 1/20 s each
+    assert time.monotonic() - start >= 0.14
+
+
+class RevalidatingSession(FakeSession):
+    def __init__(self):
+        super().__init__()
+        self.conditional = []
+
+    def get(self, url, **kwargs):
+        if url.endswith("robots.txt"):
+            return FakeResponse("User-agent: *\nAllow: /")
+        self.calls.append(url)
+        self.conditional.append(kwargs["headers"].get("If-None-Match"))
+        if kwargs["headers"].get("If-None-Match") == '"v1"':
+            return FakeResponse("", status_code=304)
+        return FakeResponse(self.page, headers={"ETag": '"v1"'})
+
+
+def test_stale_page_is_revalidated():
+    session = RevalidatingSession()
+    engine = ScraperEngine(delay=0, session=session, cache=PageCache(ttl=0.01))
+    assert engine.scrape("http://example.com/") == "Hello World"
+    time.sleep(0.02)
+    assert engine.scrape("http://example.com/") == "Hello World"
+    assert session.conditional == [None, '"v1"']
+    assert engine.cache.get("http://example.com/").fresh
+
+
+class DisallowingSession(FakeSession):
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        if url.endswith("robots.txt"):
+            return FakeResponse("User-agent: *\nDisallow: /private")
+        return FakeResponse(self.page)
+
+
+def test_disallowed_page_is_never_requested():
+    session = DisallowingSession()
+    engine = ScraperEngine(delay=0, session=session)
+    assert engine.scrape("http://example.com/private/a") == "Disallowed by robots.txt"
+    assert engine.scrape("http://example.com/public") == "Hello World"
+    assert session.calls == [
+        "http://example.com/robots.txt",
+        "http://example.com/public",
+    ]
+
+
+def test_short_extraction_is_refetched_for_longer_requests():
+    session = FakeSession()
+    engine = ScraperEngine(delay=0, session=session, text_limit=5)
+    assert engine.scrape("http://example.com/", max_chars=3) == "Hel"
+    assert engine.scrape("http://example.com/", max_chars=5) == "Hello"
+    assert session.calls.count("http://example.com/") == 1
+    assert engine.scrape("http://example.com/", max_chars=100) == "Hello World"
+    assert session.calls.count("http://example.com/") == 2
+
+
+class TypedSession(FakeSession):
+    def __init__(self, body, content_type):
+        super().__init__(page=body)
+        self.content_type = content_type
+        self.responses = []
+
+    def get(self, url, **kwargs):
+        if url.endswith("robots.txt"):
+            return FakeResponse("", status_code=404)
+        response = FakeResponse(self.page, headers={"Content-Type": self.content_type})
+        self.responses.append(response)
+        return response
+
+
+def test_non_html_is_rejected_before_reading():
+    session = TypedSession("%PDF-1.4", "application/pdf")
+    engine = ScraperEngine(delay=0, session=session)
+    result = engine.scrape("http://example.com/file.pdf")
+    assert result.startswith("Error fetching")
+    assert "application/pdf" in result
+    assert session.responses[0].read == 0
+    assert session.responses[0].closed
+
+
+def test_plain_text_is_extracted():
+    session = TypedSession("line one\n\nline  two", "text/plain; charset=utf-8")
+    engine = ScraperEngine(delay=0, session=session)
+    assert engine.scrape("http://example.com/a.txt") == "line one line two"
+
+
+def test_body_is_capped():
+    body = "<main>" + "word " * 100000 + "</main>"
+    session = TypedSession(body, "text/html")
+    engine = ScraperEngine(delay=0, session=session, text_limit=None, max_bytes=100)
+    text = engine.scrape("http://example.com/", max_chars=10000)
+    assert 0 < len(text) <= 100
+    assert session.responses[0].read < len(body)
+
+
+def test_max_chars_none_returns_whole_page():
+    session = FakeSession()
+    engine = ScraperEngine(delay=0, session=session, text_limit=5)
+    assert engine.scrape("http://example.com/", max_chars=3) == "Hel"
+    assert engine.scrape("http://example.com/", max_chars=None) == "Hello World"
+    assert engine.scrape("http://example.com/", max_chars=None) == "Hello World"
+    assert session.calls.count("http://example.com/") == 2
+
+
+def test_capped_page_is_not_served_for_longer_requests():
+    body = "<main>" + "word " * 1000 + "</main>"
+    session = TypedSession(body, "text/html")
+    engine = ScraperEngine(delay=0, session=session, text_limit=None, max_bytes=300)
+    short = engine.scrape("http://example.com/", max_chars=100)
+    assert len(short) == 100
+    assert engine.cache.get("http://example.com/").truncated
+    assert engine.scrape("http://example.com/", max_chars=50) == short[:50]
+    assert len(session.responses) == 1
+    engine.scrape("http://example.com/", max_chars=5000)
+    assert len(session.responses) == 2
+
+
+def test_concurrent_callers_with_larger_limit_get_full_text():
+    session = FakeSession(delay=0.1)
+    engine = ScraperEngine(delay=0, session=session, text_limit=5)
+    results = {}
+
+    def scrape(n):
+        results[n] = engine.scrape("http://example.com/", max_chars=n)
+
+    _run_all(scrape, [(3,), (100,)])
+    assert results == {3: "Hel", 100: "Hello World"}
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+from pydantic import BaseModel
+
+from modules.tools import Tool, ToolExecutor, graphviz_tool, mermaid_tool
+
+
+class Peak:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, delay):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(delay)
+        with self.lock:
+            self.active -= 1
+
+
+def test_results_keep_call_order():
+    def execute(name, delay):
+        time.sleep(delay)
+        return f"{name}:{delay}"
+
+    executor = ToolExecutor(execute, max_workers=3)
+    calls = [("a", 0.05), ("b", 0.0), ("c", 0.02)]
+    assert executor.run(calls) == ["a:0.05", "b:0.0", "c:0.02"]
+    assert asyncio.run(executor.arun(calls)) == ["a:0.05", "b:0.0", "c:0.02"]
+    executor.close()
+
+
+def test_per_tool_limit_and_failures():
+    scrape = Peak()
+
+    class Args(BaseModel):
+        delay: float
+
+    def boom(delay):
+        raise RuntimeError("broken")
+
+    tools = [
+        Tool("scrape", "", lambda delay: scrape(delay) or "ok", Args, max_concurrency=1),
+        Tool("boom", "", boom, Args),
+    ]
+    executor = ToolExecutor.for_tools(tools, max_workers=4)
+    results = executor.run([("scrape", {"delay": 0.02})] * 3 + [("boom", {"delay": 0})])
+    assert results[:3] == ["ok"] * 3
+    assert results[3] == "Tool execution failed: broken"
+    assert scrape.peak == 1
+    executor.close()
+
+
+def test_unlimited_tools_overlap():
+    render = Peak()
+    executor = ToolExecutor(lambda name, delay: render(delay), max_workers=4)
+    executor.run([("render", 0.05)] * 4)
+    assert render.peak > 1
+    executor.close()
+
+
+def test_diagram_limits_bind_within_default_pool():
+    executor = ToolExecutor(lambda name, args: None)
+    for tool in (graphviz_tool.get_tool(), mermaid_tool.get_tool()):
+        assert 1 <= tool.max_concurrency < executor.max_workers
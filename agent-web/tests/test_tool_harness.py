@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from modules.tools import Isolation, Tool, call_tool, execute_tool
+from modules.tools.sqlite_tool import run_sqlite_query
+
+
+class NoArgs(BaseModel):
+    pass
+
+
+class SizeArgs(BaseModel):
+    size: int
+
+
+def spin(cancel):
+    while not cancel.is_set():
+        time.sleep(0.01)
+    return "stopped"
+
+
+def allocate(size):
+    return len(bytearray(size))
+
+
+def loop_forever():
+    while True:
+        pass
+
+
+def _tools(*tools):
+    return {t.name: t for t in tools}
+
+
+def test_timeout_returns_structured_result_and_signals_cancel():
+    seen = {}
+
+    def slow(cancel):
+        seen["cancel"] = cancel
+        spin(cancel)
+
+    tools = _tools(Tool("slow", "", slow, NoArgs, timeout=0.1))
+    result = call_tool("slow", {}, tools)
+    assert result.timed_out and not result.ok
+    assert result.error == "Tool slow timed out after 0.1s"
+    assert 0.1 <= result.elapsed < 1.0
+    assert seen["cancel"].is_set()
+
+
+def test_external_cancellation():
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    tools = _tools(Tool("spin", "", spin, NoArgs))
+    result = call_tool("spin", {}, tools, cancel=cancel)
+    assert result.cancelled
+    assert result.elapsed < 1.0
+
+
+def test_fast_tools_report_output_and_timing():
+    tools = _tools(Tool("size", "", allocate, SizeArgs))
+    result = call_tool("size", {"size": 3}, tools, timeout=5)
+    assert result.ok and result.output == 3 and result.elapsed >= 0
+    assert execute_tool("size", {"size": 3}, tools) == 3
+    assert execute_tool("size", {}, tools).startswith("Invalid arguments for size")
+
+
+def test_execute_tool_propagates_tool_exceptions():
+    def broken():
+        raise KeyError("missing")
+
+    tools = _tools(Tool("broken", "", broken, NoArgs))
+    assert call_tool("broken", {}, tools).error == "Tool execution failed: 'missing'"
+    with pytest.raises(KeyError):
+        execute_tool("broken", {}, tools)
+
+
+def test_isolated_tool_is_killed_and_limited():
+    tools = _tools(
+        Tool("alloc", "", allocate, SizeArgs, isolation=Isolation(memory_mb=256)),
+        Tool("loop", "", loop_forever, NoArgs, timeout=0.5, isolation=Isolation()),
+    )
+    assert call_tool("alloc", {"size": 10}, tools).output == 10
+    failed = call_tool("alloc", {"size": 2 * 1024 ** 3}, tools)
+    assert failed.error.startswith("Tool execution failed: MemoryError")
+    killed = call_tool("loop", {}, tools)
+    assert killed.timed_out
+    assert killed.elapsed < 5
+
+
+def test_sqlite_query_stops_when_cancelled(tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+    query = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+    assert "interrupted" in run_sqlite_query(str(tmp_path / "db.sqlite"), query, cancel)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from modules.agents import ToTAgent
+
+
+class SlowClient:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat(self, messages, stream=False):
+        prompt = messages[0]["content"]
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if "箇条書き" in prompt:
+            tail = prompt.split("これまでの思考:\n")[1].split("\n")[0]
+            return f"- {tail}A\n- {tail}B"
+        return "最終的な答え: done"
+
+
+def _evaluate(history: str) -> float:
+    time.sleep(0.01)
+    return history.count("B") / (len(history) or 1)
+
+
+def _run(workers):
+    client = SlowClient()
+    agent = ToTAgent(
+        client, max_depth=3, breadth=3, evaluator=_evaluate, max_workers=workers
+    )
+    return list(agent.run_iter("q")), client.peak
+
+
+def test_parallel_matches_sequential_selection():
+    sequential, seq_peak = _run(1)
+    parallel, par_peak = _run(4)
+    assert parallel == sequential
+    assert seq_peak == 1
+    assert par_peak > 1
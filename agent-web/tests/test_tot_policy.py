@@ -0,0 +1,97 @@
+from config.constants import TOT_LEVELS
+from modules.agents import ToTAgent
+from modules.agents.tot_search import SearchPolicy
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages, stream=False):
+        self.calls += 1
+        if "箇条書き" in messages[0]["content"]:
+            return "- A\n- B"
+        return "最終的な答え: done"
+
+
+def test_early_stop_on_confident_candidate():
+    client = CountingClient()
+    agent = ToTAgent(
+        client,
+        max_depth=5,
+        breadth=2,
+        evaluator=lambda h: 1.0 if h.endswith("B") else 0.5,
+        policy=SearchPolicy(stop_score=0.9),
+    )
+    steps = list(agent.run_iter("q"))
+    assert steps[-1] == "最終的な答え: done"
+    assert sum(s.startswith("選択") for s in steps) == 1
+    assert client.calls == 2
+
+
+def test_all_pruned_stops_with_best_candidate():
+    client = CountingClient()
+    agent = ToTAgent(
+        client,
+        max_depth=5,
+        breadth=2,
+        evaluator=lambda h: 0.01 if "B" in h else 0.0,
+        policy=SearchPolicy(prune_below=0.1),
+    )
+    assert agent.run("q") == "done"
+    assert client.calls == 2
+
+
+def test_call_budget_is_respected():
+    client = CountingClient()
+    agent = ToTAgent(
+        client,
+        max_depth=5,
+        breadth=2,
+        evaluator=lambda h: 0.5,
+        eval_cache_size=0,
+        policy=SearchPolicy(max_llm_calls=12),
+    )
+    assert agent.run("q") == "done"
+    assert agent.budget.calls <= 12
+    assert client.calls < 1 + 2 + 2 * 4
+
+
+def test_from_level_maps_preset_to_budget():
+    agent = ToTAgent.from_level(CountingClient(), "high")
+    assert (agent.max_depth, agent.breadth) == TOT_LEVELS["HIGH"]
+    assert agent.policy.max_llm_calls is not None
+    assert agent.policy.stop_score is not None
+
+
+def test_from_level_keeps_budget_with_overrides():
+    agent = ToTAgent.from_level(CountingClient(), "EXTREME", max_depth=2, breadth=3)
+    assert (agent.max_depth, agent.breadth) == (2, 3)
+    assert agent.policy == SearchPolicy.for_level("EXTREME")
+
+
+def test_get_agent_uses_level_budget():
+    from modules.agents import get_agent
+
+    agent = get_agent("tot", CountingClient(), [], None, tot_level="HIGH")
+    assert agent.policy == SearchPolicy.for_level("HIGH")
+
+
+def test_exhausted_budget_scores_nothing():
+    agent = ToTAgent(
+        CountingClient(),
+        evaluator=lambda h: 0.5,
+        policy=SearchPolicy(max_llm_calls=1),
+    )
+    agent.budget.calls = 1
+    assert agent._scorable(["A", "B"]) == []
+
+
+def test_cache_hits_are_not_charged():
+    agent = ToTAgent(CountingClient(), evaluator=lambda h: 0.5)
+    agent._score(None, ["A", "B"])
+    charged = (agent.budget.calls, agent.budget.tokens)
+    agent._score(None, ["A", "B"])
+    assert (agent.budget.calls, agent.budget.tokens) == charged
+    agent._score(None, ["A", "C"])
+    assert agent.budget.calls == charged[0] + 1
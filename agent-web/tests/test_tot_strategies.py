@@ -0,0 +1,97 @@
+import re
+
+import pytest
+
+from modules.agents import ToTAgent
+from modules.agents.tot_search import SearchPolicy, ThoughtNode
+
+
+class PathClient:
+    """Proposes A and B everywhere and answers with the chosen path."""
+
+    def __init__(self):
+        self.expanded = []
+
+    def chat(self, messages, stream=False):
+        prompt = messages[0]["content"]
+        if "箇条書き" in prompt:
+            history = re.search(r"これまでの思考:\n(.*)\n\d+個", prompt, re.S).group(1)
+            self.expanded.append(history)
+            return "- A\n- B"
+        path = re.search(r"思考過程:\n(.*)\n最終的な答え:", prompt, re.S).group(1)
+        return "最終的な答え: " + path.replace("\n", "")
+
+
+def share_of_b(history):
+    return history.split("\n").count("B") / 3
+
+
+class BatchedShareOfB:
+    """Scores a whole level in one call like the LLM evaluator."""
+
+    def __call__(self, history):
+        return share_of_b(history)
+
+    def evaluate_many(self, histories):
+        return [share_of_b(h) for h in histories]
+
+
+def make_agent(client, strategy, evaluator=share_of_b, **kwargs):
+    return ToTAgent(
+        client,
+        max_depth=3,
+        breadth=2,
+        evaluator=evaluator,
+        strategy=strategy,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("strategy", ["best_first", "mcts"])
+def test_strategy_finds_best_path_with_fewer_expansions(strategy):
+    beam_client = PathClient()
+    beam = make_agent(beam_client, "beam", policy=SearchPolicy(stop_score=0.9))
+    assert beam.run("q") == "BBB"
+
+    client = PathClient()
+    agent = make_agent(client, strategy, policy=SearchPolicy(stop_score=0.9))
+    assert agent.run("q") == "BBB"
+    assert len(client.expanded) < len(beam_client.expanded)
+    assert agent.budget.calls < beam.budget.calls
+
+
+@pytest.mark.parametrize("strategy", ["best_first", "mcts"])
+def test_strategy_needs_no_more_calls_with_batched_evaluator(strategy):
+    beam_client = PathClient()
+    beam = make_agent(beam_client, "beam", evaluator=BatchedShareOfB())
+    assert beam.run("q") == "BBB"
+
+    client = PathClient()
+    agent = make_agent(client, strategy, evaluator=BatchedShareOfB())
+    assert agent.run("q") == "BBB"
+    assert len(client.expanded) < len(beam_client.expanded)
+    assert agent.budget.calls <= beam.budget.calls
+
+
+@pytest.mark.parametrize("strategy", ["best_first", "mcts"])
+def test_nodes_are_never_expanded_twice(strategy):
+    client = PathClient()
+    agent = make_agent(client, strategy, max_expansions=6)
+    list(agent.run_iter("q"))
+    assert len(client.expanded) == len(set(client.expanded))
+    assert len(client.expanded) <= 6
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ToTAgent(PathClient(), strategy="dfs")
+
+
+def test_backpropagate_updates_ancestors():
+    root = ThoughtNode()
+    child = root.child("A")
+    leaf = child.child("B")
+    assert leaf.history == "A\nB" and leaf.depth == 2
+    leaf.backpropagate(0.5)
+    assert (root.visits, root.value) == (1, 0.5)
+    assert child.mean() == 0.5
@@ -0,0 +1,113 @@
+import numpy as np
+
+from modules.memory.vector_memory import VectorMemory
+
+
+def test_search_ranks_by_similarity():
+    mem = VectorMemory()
+    mem.add("user", "今日は良い天気です")
+    mem.add("assistant", "はい、晴れています")
+    mem.add("user", "昨日は雨でした")
+
+    assert mem.search("天気", top_k=2) == ["今日は良い天気です"]
+
+
+def test_index_follows_direct_edits():
+    mem = VectorMemory()
+    mem.add("user", "apple pie")
+    mem.messages = [{"role": "user", "content": "banana bread"}]
+    assert mem.search("apple") == []
+    assert mem.search("banana") == ["banana bread"]
+
+
+def test_load_rebuilds_index(tmp_path):
+    mem = VectorMemory()
+    mem.add("user", "hello world")
+    mem.add("assistant", "goodbye")
+    file = tmp_path / "vec.json"
+    mem.save(file)
+
+    other = VectorMemory()
+    other.load(file)
+    assert other.search("hello") == ["hello world"]
+    other.clear()
+    assert other.search("hello") == []
+
+
+def test_persisted_index_is_memory_mapped(tmp_path, monkeypatch):
+    mem = VectorMemory()
+    mem.add("user", "今日は良い天気です")
+    mem.add("assistant", "SQLのクエリ")
+    file = tmp_path / "vec.json"
+    mem.save(file)
+    assert (tmp_path / "vec.json.index.json").exists()
+
+    other = VectorMemory()
+    monkeypatch.setattr(
+        other, "_index_message", lambda *a: (_ for _ in ()).throw(AssertionError)
+    )
+    other.load(file)
+    assert other._base is not None
+    assert other.search("天気") == ["今日は良い天気です"]
+    monkeypatch.undo()
+
+    other.add("user", "明日も天気が良い")
+    assert set(other.search("天気", top_k=5)) == {"今日は良い天気です", "明日も天気が良い"}
+    other.save(file)
+    third = VectorMemory()
+    third.load(file)
+    assert third.search("明日") == ["明日も天気が良い"]
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    mem = VectorMemory()
+    mem.add("user", "hello")
+    file = tmp_path / "vec.json"
+    mem.save(file)
+    file.write_text('{"messages": [{"role": "user", "content": "bye"}]}', encoding="utf-8")
+
+    other = VectorMemory()
+    other.load(file)
+    assert other.search("bye") == ["bye"]
+
+
+def test_edit_in_the_middle_invalidates_index(tmp_path):
+    mem = VectorMemory()
+    for text in ["apple", "banana", "cherry"]:
+        mem.add("user", text)
+    file = tmp_path / "vec.json"
+    mem.save(file)
+    data = file.read_text(encoding="utf-8").replace("banana", "durian")
+    file.write_text(data, encoding="utf-8")
+
+    other = VectorMemory()
+    other.load(file)
+    assert other.search("durian") == ["durian"]
+    assert other.search("banana") == []
+
+
+def test_save_load_save_matches_fresh_index(tmp_path):
+    texts = [f"note {i} about topic{i % 7} and item{i % 3}" for i in range(40)]
+    file = tmp_path / "vec.json"
+    mem = VectorMemory()
+    for text in texts[:20]:
+        mem.add("user", text)
+    mem.save(file)
+    loaded = VectorMemory()
+    loaded.load(file)
+    for text in texts[20:]:
+        loaded.add("user", text)
+    loaded.save(file)
+    loaded.save(file)
+
+    again = VectorMemory()
+    again.load(file)
+    fresh = VectorMemory()
+    for text in texts:
+        fresh.add("user", text)
+    segment = again._base
+    assert sorted(segment.terms) == sorted(fresh._postings)
+    for term, postings in fresh._postings.items():
+        docs, tfs = segment.postings(term)
+        assert dict(zip(docs.tolist(), tfs.tolist())) == postings
+    assert np.allclose(segment.norms, fresh._norms)
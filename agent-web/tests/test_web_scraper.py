@@ -1,39 +1,59 @@
-from src.tools import web_scraper
+from modules.tools import web_scraper
 import threading
 import logging
 
+import requests
+
 scrape_website_content = web_scraper.scrape_website_content
 
 
-def test_scrape_local_html(tmp_path, monkeypatch):
-    html = "<html><body><main><p>Hello</p><p>World</p></main></body></html>"
-    file = tmp_path / "index.html"
-    file.write_text(html, encoding="utf-8")
+class Resp:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self._content = content
+
+    def raise_for_status(self):
+        pass
+
+    @property
+    def content(self):
+        return self._content.encode("utf-8")
+
+    @property
+    def text(self):
+        return self._content
+
+    def iter_content(self, chunk_size):
+        data = self.content
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    def close(self):
+        pass
 
-    def mock_get(url, **kwargs):
-        class Resp:
-            status_code = 200
 
-            def __init__(self, content):
-                self._content = content
+def _patch_session(monkeypatch, mock_get):
+    """Serve the engine's pooled session from ``mock_get``."""
 
-            def raise_for_status(self):
-                pass
+    def get(self, url, **kwargs):
+        return mock_get(url, **kwargs)
 
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
+    monkeypatch.setattr(requests.Session, "get", get)
 
-            @property
-            def text(self):
-                return self._content
 
+def test_scrape_local_html(tmp_path, monkeypatch):
+    html = "<html><body><main><p>Hello</p><p>World</p></main></body></html>"
+    file = tmp_path / "index.html"
+    file.write_text(html, encoding="utf-8")
+
+    def mock_get(url, **kwargs):
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp(html)
 
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
     text = scrape_website_content("http://example.com")
@@ -49,29 +69,11 @@ def test_scrape_removes_noise(tmp_path, monkeypatch):
     file.write_text(html, encoding="utf-8")
 
     def mock_get(url, **kwargs):
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp(html)
 
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
     text = scrape_website_content("http://example.com")
@@ -84,31 +86,13 @@ def test_respects_robots(monkeypatch):
     def mock_get(url, **kwargs):
         call_count["n"] += 1
 
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nDisallow: /")
         return Resp("<html><body><main>Hi</main></body></html>")
 
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     text = scrape_website_content("http://example.com/page")
     assert "Disallowed" in text
     # Should only fetch robots since page is disallowed
@@ -121,31 +105,13 @@ def test_caching(monkeypatch):
     def mock_get(url, **kwargs):
         call_count["n"] += 1
 
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp("<html><body><main>Hi</main></body></html>")
 
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     a = scrape_website_content("http://example.com")
     b = scrape_website_content("http://example.com")
     assert a == b == "Hi"
@@ -159,29 +125,11 @@ def test_custom_user_agent(monkeypatch):
     def mock_get(url, **kwargs):
         assert kwargs["headers"]["User-Agent"] == expected
 
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp("<html><body><main>Test</main></body></html>")
 
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     monkeypatch.setenv("WEB_SCRAPER_USER_AGENT", expected)
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
@@ -201,29 +149,11 @@ def test_custom_timeout(monkeypatch):
     def mock_get(url, **kwargs):
         assert kwargs["timeout"] == expected
 
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp("<html><body><main>Hi</main></body></html>")
 
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     monkeypatch.setenv("WEB_SCRAPER_TIMEOUT", str(expected))
     web_scraper._CACHE.clear()
     web_scraper._ROBOTS.clear()
@@ -244,29 +174,11 @@ def test_concurrent_calls(monkeypatch):
     def mock_get(url, **kwargs):
         call_count["n"] += 1
 
-        class Resp:
-            status_code = 200
-
-            def __init__(self, content):
-                self._content = content
-
-            def raise_for_status(self):
-                pass
-
-            @property
-            def content(self):
-                return self._content.encode("utf-8")
-
-            @property
-            def text(self):
-                return self._content
-
         if url.endswith("robots.txt"):
             return Resp("User-agent: *\nAllow: /")
         return Resp(html)
 
-    import requests
-    monkeypatch.setattr(requests, "get", mock_get)
+    _patch_session(monkeypatch, mock_get)
     monkeypatch.setenv("WEB_SCRAPER_DELAY", "0")
     web_scraper.load_settings()
     web_scraper._CACHE.clear()